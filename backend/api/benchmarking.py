@@ -0,0 +1,192 @@
+import itertools
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+
+# Request plan for every named route in api.urls: a list of
+# (method, query string, SQL query budget) per route. Budgets are the most
+# queries one request may run with a cold cache; routes that only answer
+# 405 map to an empty list. A route missing from this table fails the suite.
+# ``{tag}`` in a query string is replaced by the sample article's tag slug.
+ENDPOINTS = {
+    'api-root': [('get', '', 0)],
+    'category-list': [('get', '', 3)],
+    'category-detail': [('get', '', 2)],
+    'category-articles': [('get', '', 6), ('get', '?cursor=', 5)],
+    'author-list': [('get', '', 3)],
+    'author-detail': [('get', '', 2)],
+    'author-articles': [('get', '', 6), ('get', '?cursor=', 5)],
+    'article-list': [('get', '', 4), ('get', '?page=3', 4), ('get', '?cursor=&count=false', 3),
+                     ('get', '?search=court', 4), ('get', '?fields=slug,title,author.name', 3),
+                     ('get', '?tag={tag}', 4)],
+    'article-detail': [('get', '', 3)],
+    'article-related': [('get', '', 3)],
+    'tag-list': [('get', '', 3)],
+    'tag-detail': [('get', '', 2)],
+    'tag-articles': [('get', '', 6), ('get', '?cursor=', 5)],
+    'article-featured': [('get', '', 4)],
+    'article-breaking': [('get', '', 4)],
+    'article-trending': [('get', '?limit=10', 2)],
+    'article-latest': [('get', '', 3)],
+    'trending': [('get', '?limit=10', 2)],
+    'featured': [('get', '', 4)],
+    'breaking': [('get', '', 4)],
+    'latest': [('get', '', 3)],
+    'search': [('get', '?q=court', 4)],
+    'homepage': [('get', '', 12)],
+    'newsletter-list': [('post', '', 5)],  # unique check + get_or_create in a transaction
+    'newsletter-detail': [],
+    'newsletter-subscribers': [],  # staff only
+    'newsletter-unsubscribe': [],  # needs a signed token
+    'contact-list': [('post', '', 1)],
+    'contact-detail': [],
+    'metrics': [],  # staff only
+    'sitemap': [('get', '', 1)],
+    'sitemap-partition': [('get', '', 1)],
+    'feed': [('get', '', 1)],
+    'category-feed': [('get', '', 2)],
+    'author-feed': [('get', '', 2)],
+}
+_post_counter = itertools.count()
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_requests(path, requests=200, threads=1, warmup=5, method='get', name=None):
+    """
+    Issue ``requests`` requests against ``path`` in-process and time each one.
+
+    POSTs send a fresh body from ``post_data(name)`` each time.
+
+    Returns a dict with throughput (req/s) and p50/p95/mean latency in ms.
+    """
+    def worker(count):
+        client = Client(SERVER_NAME='localhost')
+        latencies = []
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                if method == 'post':
+                    response = client.post(path, post_data(name))
+                else:
+                    response = client.get(path)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{path} returned {response.status_code}')
+        finally:
+            if threads > 1:
+                connection.close()
+        return latencies
+
+    worker(warmup)
+    per_thread = [requests // threads + (1 if i < requests % threads else 0) for i in range(threads)]
+    started = time.perf_counter()
+    if threads == 1:
+        latencies = worker(requests)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = [ms for chunk in pool.map(worker, per_thread) for ms in chunk]
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'mean': statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+def format_result(label, result):
+    return (
+        f"{label:<32} {result['requests']:>6} req  {result['throughput']:>9.1f} req/s  "
+        f"p50 {result['p50']:>7.2f} ms  p95 {result['p95']:>7.2f} ms"
+    )
+
+
+def route_names(patterns=None):
+    """Names of every route in api.urls, in declaration order"""
+    if patterns is None:
+        from api import urls
+        patterns = urls.urlpatterns
+    names = []
+    for pattern in patterns:
+        found = route_names(pattern.url_patterns) if isinstance(pattern, URLResolver) else [pattern.name]
+        names.extend(name for name in found if name and name not in names)
+    return names
+
+
+def post_data(name):
+    """A valid, unique request body for a write endpoint"""
+    n = next(_post_counter)
+    if name == 'newsletter-list':
+        return {'email': f'benchmark{n}@example.com'}
+    return {
+        'first_name': 'Bench', 'last_name': 'Mark', 'email': f'benchmark{n}@example.com',
+        'subject': 'general', 'message': 'Endpoint benchmark',
+    }
+
+
+def endpoint_requests(sample):
+    """
+    Expand ENDPOINTS into ``(name, method, path, budget)`` tuples.
+
+    ``sample`` supplies the URL kwargs: a published ``article`` whose
+    category, author and first tag are used for the nested routes.
+    """
+    tag = sample.tags.order_by('pk').values_list('slug', flat=True).first()
+    if tag is None:
+        raise ValueError(f'Sample article {sample.slug!r} has no tags')
+    kwargs = {
+        'category': {'slug': sample.category.slug},
+        'author': {'pk': sample.author_id},
+        'article': {'slug': sample.slug},
+        'tag': {'slug': tag},
+    }
+    # Routes that take more than the sample's slug/pk
+    extra_kwargs = {
+        'sitemap-partition': {'partition': sample.published_date.strftime('%Y-%m')},
+        'feed': {'feed_format': 'rss'},
+        'category-feed': {'feed_format': 'rss'},
+        'author-feed': {'feed_format': 'atom'},
+    }
+    requests = []
+    for name in route_names():
+        if name not in ENDPOINTS:
+            raise KeyError(f'No benchmark plan for route {name!r}; add it to api.benchmarking.ENDPOINTS')
+        if not ENDPOINTS[name]:
+            continue
+        prefix, _, suffix = name.partition('-')
+        url_kwargs = dict(kwargs[prefix]) if suffix in ('detail', 'articles', 'related', 'feed') else {}
+        url_kwargs.update(extra_kwargs.get(name, {}))
+        for method, query, budget in ENDPOINTS[name]:
+            requests.append((name, method, reverse(name, kwargs=url_kwargs) + query.format(tag=tag), budget))
+    return requests
+
+
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def count_queries(client, method, path, name=None, cold=False):
+    """Issue one request and return ``(status_code, queries executed)``"""
+    if cold:
+        cache.clear()
+    data = post_data(name) if method == 'post' else None
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method)(path, data)
+    # Savepoints only appear when the caller is inside a transaction (TestCase), not per request in production
+    return response.status_code, sum(
+        not query['sql'].startswith(SAVEPOINT_STATEMENTS) for query in queries.captured_queries
+    )
@@ -0,0 +1,124 @@
+"""
+Conditional GET (ETag / Last-Modified / 304) for read endpoints.
+
+Validators come from the data, not the rendered body: each source
+queryset contributes its row count and the newest ``updated_at`` of its
+rows and of the related rows it embeds. All sources of a response are
+measured in a single aggregate query, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with 304 before anything is serialized.
+
+ETags are weak: ``views_count`` is not a validator input, so a cached
+body may show a slightly older view count.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+# Timestamps read for article sources: the article and the author/category it embeds
+ARTICLE_TIMESTAMPS = ('updated_at', 'author__updated_at', 'category__updated_at')
+
+
+def _as_datetime(value):
+    # Raw cursors return timestamps as text on SQLite
+    if isinstance(value, str):
+        value = parse_datetime(value) or value
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def collection_state(sources):
+    """
+    Return ``[(count, max, ...), ...]`` for ``(queryset, fields)`` sources.
+
+    Each source becomes a ``COUNT(*)``/``MAX()`` derived table and the
+    tables are cross joined, so the whole state costs one round trip.
+    Sliced querysets are not supported; pass the unsliced collection.
+    """
+    state = [None] * len(sources)
+    tables, params, pending = [], [], []
+    using = None
+    for index, (queryset, fields) in enumerate(sources):
+        using = using or queryset.db
+        columns = {f'v{n}': F(field) for n, field in enumerate(fields)}
+        try:
+            inner, inner_params = queryset.order_by().values(**columns).query.sql_with_params()
+        except EmptyResultSet:
+            state[index] = (0,) + (None,) * len(fields)
+            continue
+        aggregates = ', '.join(['COUNT(*)'] + [f'MAX(s{index}.v{n})' for n in range(len(fields))])
+        tables.append(f'(SELECT {aggregates} FROM ({inner}) s{index}) a{index}')
+        params.extend(inner_params)
+        pending.append((index, len(fields)))
+
+    if tables:
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT * FROM ' + ' CROSS JOIN '.join(tables), params)
+            row = list(cursor.fetchone())
+        for index, width in pending:
+            values, row = row[:width + 1], row[width + 1:]
+            state[index] = (values[0],) + tuple(_as_datetime(value) for value in values[1:])
+    return state
+
+
+def get_validators(request, sources, state=None):
+    """Return ``(etag, last_modified)`` for a response built from ``sources``"""
+    if state is None:
+        state = collection_state(sources)
+    last_modified = max(
+        (value for values in state for value in values[1:] if isinstance(value, datetime)), default=None
+    )
+    # The same data renders differently per format (JSON vs browsable API)
+    media_type = getattr(request, 'accepted_media_type', '')
+    digest = hashlib.md5(repr((media_type, state)).encode()).hexdigest()
+    return f'W/"{digest}"', last_modified
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs from a cheap aggregate before serializing"""
+
+    def conditional_response(self, sources, render):
+        """
+        Return 304 when the client's validators match ``sources``, else ``render()``.
+
+        ``render`` is only called on a miss; successful responses carry
+        ``ETag`` and ``Last-Modified`` headers. The measured state is kept
+        on ``self.conditional_state``.
+        """
+        self.conditional_state = collection_state(sources)
+        etag, last_modified = get_validators(self.request, sources, self.conditional_state)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response.headers['ETag'] = etag
+            if timestamp is not None:
+                response.headers['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class ConditionalListRetrieveMixin(ConditionalGetMixin):
+    """Conditional ``list``/``retrieve`` for read-only model viewsets"""
+    conditional_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        sources = [(self.filter_queryset(self.get_queryset()), self.conditional_fields)]
+        return self.conditional_response(sources, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(
+            [(queryset, self.conditional_fields)], partial(super().retrieve, request, *args, **kwargs)
+        )
@@ -0,0 +1,154 @@
+"""
+Fast-path serialization for article list endpoints.
+
+``FastSerializer`` compiles a DRF serializer (after sparse fieldset
+pruning) into a flat plan of ``values()`` columns and per-field getters,
+then builds plain dicts straight from the rows. Plain column fields get a
+cheap converter; everything else is delegated to the same DRF field
+instances the normal path uses, so the rendered JSON is byte-identical
+(see api.tests.FastSerializerParityTests).
+"""
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db.models.query import get_prefetcher
+from rest_framework import serializers
+
+from .fieldsets import SparseFieldsetMixin
+from .metrics import serializer_timer
+
+
+def _nullable(convert):
+    return lambda value: None if value is None else convert(value)
+
+
+# DRF fields whose to_representation() is a plain type cast
+FAST_CONVERTERS = {
+    serializers.CharField: _nullable(str),
+    serializers.SlugField: _nullable(str),
+    serializers.EmailField: _nullable(str),
+    serializers.URLField: _nullable(str),
+    serializers.IntegerField: _nullable(int),
+    serializers.BooleanField: lambda value: value,
+}
+
+
+class PrefetchedRelation:
+    """Stand-in for a related manager whose rows were fetched in bulk"""
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def all(self):
+        return self
+
+    def __iter__(self):
+        return iter(self.objects)
+
+
+def fast_serialization_enabled():
+    return getattr(settings, 'FAST_ARTICLE_SERIALIZATION', True)
+
+
+class FastSerializer:
+    """
+    Serialize ``values()`` rows the way ``serializer_class(many=True)`` would.
+
+    Usage::
+
+        fast = FastSerializer(ArticleListSerializer, context)
+        rows = fast.prepare(queryset)   # a values() queryset, safe to paginate
+        data = fast.serialize(page)     # list of dicts
+    """
+
+    def __init__(self, serializer_class, context=None):
+        self.template = serializer_class(context=context or {})
+        self.model = self.template.Meta.model
+        self.pk_column = self.model._meta.pk.attname
+        self.columns = {self.pk_column}
+        self.m2m = []
+        self.plan = self._compile(self.template, '')
+
+    def _compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        field_sources = getattr(serializer.Meta, 'field_sources', {})
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                sources = {source: prefix + source for source in field_sources.get(name, ())}
+                self.columns.update(sources.values())
+                plan.append(('method', name, field, sources))
+                continue
+            source = field.source
+            if isinstance(field, serializers.ModelField):
+                # ModelField reads the whole object (source='*'), so hand it the one column it uses
+                attname = field.model_field.attname
+                self.columns.add(prefix + attname)
+                plan.append(('method', name, field, {attname: prefix + attname}))
+                continue
+            if isinstance(field, SparseFieldsetMixin):
+                pk_column = prefix + model._meta.get_field(source).attname
+                self.columns.add(pk_column)
+                plan.append(('nested', name, pk_column, self._compile(field, f'{prefix}{source}__')))
+                continue
+            model_field = model._meta.get_field(source)
+            if model_field.many_to_many:
+                if prefix:
+                    raise ValueError(f'Nested many-to-many field {prefix}{source} is not supported')
+                self.m2m.append(source)
+                plan.append(('m2m', name, field, source))
+                continue
+            column = prefix + model_field.attname
+            self.columns.add(column)
+            convert = FAST_CONVERTERS.get(type(field))
+            if convert is None:
+                convert = _nullable(field.to_representation)
+            plan.append(('value', name, column, convert))
+        return plan
+
+    def prepare(self, queryset, always=()):
+        """
+        Turn a model queryset into the values() rows this plan reads.
+
+        ``always`` lists extra columns the view itself needs (e.g. pagination keys).
+        """
+        columns = sorted(self.columns.union(always))
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        related = {name: self._fetch_related(name, rows) for name in self.m2m} if rows else {}
+        with serializer_timer():
+            return [self._build(self.plan, row, related) for row in rows]
+
+    def _fetch_related(self, name, rows):
+        """
+        Group the objects of a many-to-many field by owner primary key.
+
+        Runs the relation's own prefetch query (so ordering matches
+        ``prefetch_related``) but skips building a manager per row.
+        """
+        instances = [self.model(pk=row[self.pk_column]) for row in rows]
+        prefetcher = get_prefetcher(instances[0], name, name)[0]
+        queryset, rel_obj_attr, _, _, _, _ = prefetcher.get_prefetch_querysets(instances)
+        grouped = {}
+        for obj in queryset:
+            grouped.setdefault(rel_obj_attr(obj), []).append(obj)
+        return grouped
+
+    def _build(self, plan, row, related):
+        data = {}
+        for kind, name, first, second in plan:
+            if kind == 'value':
+                data[name] = second(row[first])
+            elif kind == 'nested':
+                data[name] = None if row[first] is None else self._build(second, row, related)
+            elif kind == 'method':
+                obj = SimpleNamespace(**{source: row[column] for source, column in second.items()})
+                data[name] = first.to_representation(obj)
+            else:
+                objects = related[second].get(row[self.pk_column], [])
+                data[name] = first.to_representation(PrefetchedRelation(objects))
+        return data
@@ -0,0 +1,123 @@
+"""
+Sparse fieldsets for read endpoints.
+
+``?fields=id,title,author.name`` keeps only the listed fields (dotted
+paths select inside nested serializers) and ``?omit=author.bio,tags``
+drops fields. The same selection is pushed into the queryset through
+``only()``/``select_related()``/``prefetch_related()`` so unused columns
+and relations are never read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_field_spec(value):
+    """Parse ``a,b.c,b.d`` into ``{'a': {}, 'b': {'c': {}, 'd': {}}}``"""
+    tree = {}
+    for path in (value or '').split(','):
+        parts = [part.strip() for part in path.split('.') if part.strip()]
+        node = tree
+        for part in parts:
+            node = node.setdefault(part, {})
+    return tree
+
+
+def get_request_fieldset(request):
+    if request is None:
+        return None, None
+    params = request.query_params
+    include = parse_field_spec(params.get(FIELDS_PARAM)) or None
+    omit = parse_field_spec(params.get(OMIT_PARAM)) or None
+    return include, omit
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that prunes ``fields`` from the request's fieldset.
+
+    Only the outermost serializer reads the query string; nested
+    serializers receive their slice of the selection from their parent.
+    Method fields list the model columns they read in
+    ``Meta.field_sources``.
+    """
+
+    @cached_property
+    def fields(self):
+        fields = super().fields
+        include, omit = self.get_fieldset()
+        if include:
+            for name in list(fields):
+                if name not in include:
+                    fields.pop(name)
+        if omit:
+            for name, subtree in omit.items():
+                if not subtree:
+                    fields.pop(name, None)
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, SparseFieldsetMixin):
+                nested._fieldset = ((include or {}).get(name) or None, (omit or {}).get(name) or None)
+        return fields
+
+    def get_fieldset(self):
+        if hasattr(self, '_fieldset'):
+            return self._fieldset
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None, None
+        return get_request_fieldset(self.context.get('request'))
+
+    def get_queryset_plan(self, prefix=''):
+        """Return the (only, select_related, prefetch_related) lookups these fields need"""
+        model = self.Meta.model
+        field_sources = getattr(self.Meta, 'field_sources', {})
+        only, related, prefetch = [], [], []
+        for name, field in self.fields.items():
+            if name in field_sources:
+                only.extend(prefix + source for source in field_sources[name])
+                continue
+            source = field.source
+            if source == '*' or '.' in source:
+                continue
+            if isinstance(field, SparseFieldsetMixin):
+                only.append(prefix + source)
+                related.append(prefix + source)
+                sub_only, sub_related, sub_prefetch = field.get_queryset_plan(f'{prefix}{source}__')
+                only.extend(sub_only)
+                related.extend(sub_related)
+                prefetch.extend(sub_prefetch)
+                continue
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.append(prefix + source)
+            elif model_field.concrete:
+                only.append(prefix + model_field.name)
+        return only, related, prefetch
+
+
+def narrow_queryset(queryset, serializer_class, context, always=()):
+    """
+    Restrict ``queryset`` to the columns and relations the requested fieldset renders.
+
+    Returns the queryset untouched when the request has no ``fields``/``omit``.
+    ``always`` lists extra columns the view itself needs (e.g. pagination keys).
+    """
+    include, omit = get_request_fieldset(context.get('request'))
+    if not include and not omit:
+        return queryset
+    only, related, prefetch = serializer_class(context=context).get_queryset_plan()
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset.only('pk', *only, *always)
@@ -0,0 +1,37 @@
+from django_filters import rest_framework as django_filters
+from rest_framework import filters
+
+from news.models import Article
+from news.search import search_articles
+
+
+class ArticleSearchFilter(filters.SearchFilter):
+    """SearchFilter backed by the ranked full-text index instead of icontains scans"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search_articles(queryset, query)
+
+
+class ArticleOrderingFilter(filters.OrderingFilter):
+    """Keep relevance order for searches unless an explicit ?ordering= is given"""
+
+    def get_default_ordering(self, view):
+        search_param = getattr(filters.SearchFilter, 'search_param', 'search')
+        if view.request.query_params.get(search_param, '').strip():
+            return None
+        return super().get_default_ordering(view)
+
+
+class ArticleFilter(django_filters.FilterSet):
+    tag = django_filters.CharFilter(method='filter_tag', label='Tag slug')
+
+    class Meta:
+        model = Article
+        fields = ['category__slug', 'author__id', 'is_featured', 'is_breaking', 'tag']
+
+    def filter_tag(self, queryset, name, value):
+        # Joins the (tag, article) index of TaggedArticle, not taggit's generic table
+        return queryset.filter(tagged_items__tag__slug=value)
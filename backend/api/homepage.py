@@ -0,0 +1,119 @@
+"""
+Concurrent homepage sections.
+
+The homepage is made of independent sections (featured, breaking and
+the latest articles of each active category), each a sync function
+that queries and serializes its articles. run_sections() starts them
+from an asyncio event loop on a shared thread pool of ``CONCURRENCY``
+threads, so a response takes about as long as its slowest section
+instead of the sum of all of them. Every pool thread keeps its own
+database connection.
+
+A section that fails, or is not done ``SECTION_TIMEOUT`` seconds after
+it was submitted (time spent queued behind other requests counts), is
+replaced by its default and reported as degraded. Its thread finishes
+in the background -- a running query cannot be interrupted -- but no
+longer holds up the response.
+
+Sections run one after another on the calling thread when
+``CONCURRENCY`` is 1, or when the caller is inside a transaction whose
+uncommitted rows other connections could not see. A failing section is
+degraded the same way there; there is no timeout, as a section has
+already run to completion by the time it could be checked.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .metrics import track_queries
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CONCURRENCY': 4,
+    'SECTION_TIMEOUT': 2.0,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'HOMEPAGE', {}))
+    return config
+
+
+def get_executor(threads):
+    executor = _executors.get(threads)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(threads)
+            if executor is None:
+                executor = _executors[threads] = ThreadPoolExecutor(threads, thread_name_prefix='homepage')
+    return executor
+
+
+def _run_in_thread(func):
+    # Pool threads live outside the request cycle, so apply CONN_MAX_AGE / health checks here
+    close_old_connections()
+    try:
+        with track_queries():
+            return func()
+    finally:
+        close_old_connections()
+
+
+async def _gather(sections, config, degraded):
+    loop = asyncio.get_running_loop()
+    executor = get_executor(config['CONCURRENCY'])
+
+    async def run(name, func, default):
+        future = loop.run_in_executor(executor, contextvars.copy_context().run, _run_in_thread, func)
+        try:
+            return await asyncio.wait_for(future, config['SECTION_TIMEOUT'])
+        except asyncio.TimeoutError:
+            logger.warning('Homepage section %s timed out after %ss', name, config['SECTION_TIMEOUT'])
+        except Exception:
+            logger.exception('Homepage section %s failed', name)
+        degraded.append(name)
+        return default
+
+    results = await asyncio.gather(*(run(name, func, default) for name, func, default in sections))
+    return {name: result for (name, _, _), result in zip(sections, results)}
+
+
+def _run_sequentially(sections, degraded):
+    results = {}
+    for name, func, default in sections:
+        try:
+            if connection.in_atomic_block:
+                # A savepoint, so a failed query does not break the caller's transaction
+                with transaction.atomic():
+                    results[name] = func()
+            else:
+                results[name] = func()
+        except Exception:
+            logger.exception('Homepage section %s failed', name)
+            degraded.append(name)
+            results[name] = default
+    return results
+
+
+def run_sections(sections, degraded, config=None):
+    """
+    Run ``[(name, func, default), ...]`` and return ``{name: result}``.
+
+    Names of sections that failed or timed out are appended to
+    ``degraded`` and get their ``default`` as result.
+    """
+    config = config or get_config()
+    if config['CONCURRENCY'] <= 1 or connection.in_atomic_block:
+        return _run_sequentially(sections, degraded)
+    return async_to_sync(_gather)(sections, config, degraded)
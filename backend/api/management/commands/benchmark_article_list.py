@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Length
+from rest_framework import serializers
+
+from news.corpus import generate_corpus
+from news.models import Article
+from api.benchmarking import percentile
+from api.serializers import ArticleListSerializer
+
+
+class LegacyReadTimeSerializer(ArticleListSerializer):
+    """ArticleListSerializer as it was: read_time split the full content per row"""
+    read_time = serializers.SerializerMethodField()
+
+    def get_read_time(self, obj):
+        return max(1, round(len(obj.content.split()) / 200))
+
+
+class Command(BaseCommand):
+    help = 'Compare memory and latency of a list page with and without loading article content'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--paragraphs', type=int, default=80,
+                            help='Body length of synthetic articles seeded when too few exist')
+
+    def measure(self, build_queryset, serializer_class, runs):
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            serializer_class(list(build_queryset()), many=True).data
+            latencies.append((time.perf_counter() - start) * 1000)
+        # Memory is traced in a separate pass so tracing does not skew the timings
+        tracemalloc.start()
+        serializer_class(list(build_queryset()), many=True).data
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return latencies, peak
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        published = Article.objects.filter(status='published')
+        if published.count() < limit:
+            generate_corpus(articles=int(limit * 1.2), paragraphs=options['paragraphs'])
+
+        base = published.select_related('author', 'category').prefetch_related('tags')
+        sizes = list(published.order_by('-published_date').annotate(size=Length('content'))
+                     .values_list('size', flat=True)[:limit])
+        self.stdout.write(f'{len(sizes)} articles, average content {sum(sizes) / len(sizes) / 1024:.1f} KiB')
+
+        cases = (
+            ('full rows + content.split()', lambda: base.order_by('-published_date')[:limit], LegacyReadTimeSerializer),
+            ('stored read_time, no content', lambda: base.for_listing().order_by('-published_date')[:limit],
+             ArticleListSerializer),
+        )
+        for label, build_queryset, serializer_class in cases:
+            latencies, peak = self.measure(build_queryset, serializer_class, options['runs'])
+            self.stdout.write(
+                f'{label:<30} p50 {percentile(latencies, 50):>8.2f} ms  p95 {percentile(latencies, 95):>8.2f} ms  '
+                f'peak {peak / 1024:>9.1f} KiB'
+            )
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from news import digest
+from news.models import Newsletter
+from news.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = 'Compare digest sending strategies against a local SMTP stand-in (nothing is kept or delivered)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=2000)
+        parser.add_argument('--latency', type=float, default=2.0, metavar='MS',
+                            help="Time the stand-in takes per message, like a relay's round trip")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with SMTPSink(latency=options['latency'] / 1000) as sink:
+            email_settings = {
+                'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend', 'EMAIL_HOST': '127.0.0.1',
+                'EMAIL_PORT': sink.port, 'EMAIL_USE_TLS': False, 'EMAIL_USE_SSL': False,
+                'EMAIL_HOST_USER': '', 'EMAIL_HOST_PASSWORD': '',
+            }
+            with override_settings(**email_settings), transaction.atomic():
+                self.run(sink, options)
+                transaction.set_rollback(True)
+
+    def run(self, sink, options):
+        Newsletter.objects.filter(is_active=True).update(is_active=False)
+        Newsletter.objects.bulk_create(
+            [Newsletter(email=f'digest-benchmark{n}@example.com') for n in range(options['subscribers'])],
+            batch_size=1000,
+        )
+        config = dict(digest.get_config(), PERIOD_HOURS=24 * 365 * 100)
+        issue = digest.build_issue(config=config)
+        if issue is None:
+            raise CommandError('No published articles to build a digest from; run seed_corpus first')
+        self.stdout.write(f'{options["subscribers"]} subscribers, {issue.article_count} articles, '
+                          f'{options["latency"]} ms per message')
+
+        # Baseline: the same messages sent one at a time like send_mail(), each on its own connection
+        sample = min(options['subscribers'], 200)
+        message_of = digest.Issue(issue, config).message
+        connections = sink.connections
+        started = time.perf_counter()
+        for n in range(sample):
+            message_of(f'digest-benchmark{n}@example.com').send()
+        self.report('send_mail per message', sample, time.perf_counter() - started, sink.connections - connections)
+
+        for label, workers in (('1 thread, reused connection', 1),
+                               (f'{options["workers"]} threads, reused connections', options['workers'])):
+            issue.status, issue.checkpoint, issue.started_at = 'pending', 0, None
+            connections = sink.connections
+            result = digest.send_issue(issue, config, workers=workers, batch_size=options['batch_size'])
+            self.report(label, result['sent'], result['seconds'], sink.connections - connections)
+
+    def report(self, label, sent, seconds, connections):
+        self.stdout.write(f'{label:<34} {sent:>7} messages  {sent / seconds if seconds else 0:>8.1f} msg/s  '
+                          f'{connections:>5} connections')
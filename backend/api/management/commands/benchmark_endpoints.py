@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from news.corpus import generate_corpus
+from news.models import Article, Contact, Newsletter
+from api.benchmarking import count_queries, endpoint_requests, run_requests
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API route and fail when one exceeds its SQL query budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Timed requests per endpoint (0 to only check budgets)')
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--articles', type=int, default=2000,
+                            help='Seed a corpus when fewer published articles exist')
+        parser.add_argument('--only', action='append', default=[], metavar='ROUTE',
+                            help='Only run this route name (repeatable), e.g. article-list')
+        parser.add_argument('--writes', action='store_true',
+                            help='Also time POST endpoints (benchmark rows are deleted afterwards)')
+
+    def handle(self, *args, **options):
+        published = Article.objects.filter(status='published')
+        if published.count() < options['articles']:
+            generate_corpus(articles=options['articles'] - published.count(), seed=published.count(), stdout=self.stdout)
+        sample = (
+            published.filter(tagged_items__isnull=False).select_related('category').order_by('-published_date').first()
+        )
+
+        requests = endpoint_requests(sample)
+        if options['only']:
+            requests = [request for request in requests if request[0] in options['only']]
+
+        failures = []
+        self.stdout.write(
+            f'{"route":<20} {"path":<44} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8}  queries (cold/warm/budget)'
+        )
+        # Throttling would turn repeated POSTs into 429s; the budgets measure the endpoints themselves
+        with override_settings(ALLOWED_HOSTS=['localhost'], THROTTLING={'ENABLED': False}):
+            client = Client(SERVER_NAME='localhost')
+            try:
+                for name, method, path, budget in requests:
+                    cold_status, cold = count_queries(client, method, path, name, cold=True)
+                    warm_status, warm = count_queries(client, method, path, name)
+                    if max(cold_status, warm_status) >= 400:
+                        failures.append(f'{method.upper()} {path} returned {max(cold_status, warm_status)}')
+                        continue
+                    if max(cold, warm) > budget:
+                        failures.append(f'{method.upper()} {path} ran {max(cold, warm)} queries, budget {budget}')
+
+                    timed = options['requests'] and (method == 'get' or options['writes'])
+                    if timed:
+                        result = run_requests(path, requests=options['requests'], threads=options['threads'],
+                                              method=method, name=name)
+                        timing = f"{result['throughput']:>8.1f} {result['p50']:>8.2f} {result['p95']:>8.2f}"
+                    else:
+                        timing = f'{"-":>8} {"-":>8} {"-":>8}'
+                    flag = '' if max(cold, warm) <= budget else '  OVER BUDGET'
+                    self.stdout.write(
+                        f'{name:<20} {method.upper() + " " + path:<44} {timing}  {cold}/{warm}/{budget}{flag}'
+                    )
+            finally:
+                Newsletter.objects.filter(email__startswith='benchmark', email__endswith='@example.com').delete()
+                Contact.objects.filter(message='Endpoint benchmark').delete()
+
+        if failures:
+            raise CommandError('Endpoint budget check failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'{len(requests)} endpoints within their query budgets.'))
@@ -0,0 +1,119 @@
+import http.client
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from api.benchmarking import format_result, percentile
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Compare sequential and concurrent homepage sections under uvicorn (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--clients', type=int, default=4, help='Concurrent HTTP clients')
+        parser.add_argument('--concurrency', type=int, default=4, help='HOMEPAGE_CONCURRENCY of the concurrent run')
+        parser.add_argument('--db-latency', type=float, default=0.0, metavar='MS',
+                            help='Add this much latency to every SQL query, e.g. 2 to mimic a networked database')
+        parser.add_argument('--timeout', type=float, default=2.0, help='HOMEPAGE_SECTION_TIMEOUT in seconds')
+        parser.add_argument('--conn-max-age', type=int, default=600,
+                            help='CONN_MAX_AGE for the run (production default); 0 reconnects for every section')
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('uvicorn is not installed; pip install uvicorn')
+        from central_report.asgi import application
+
+        latency = options['db_latency'] / 1000
+
+        def add_latency(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def on_connection(sender, connection, **kwargs):
+            connection.execute_wrappers.append(add_latency)
+
+        if latency:
+            connection_created.connect(on_connection, weak=False)
+        for alias in connections:
+            connections.settings[alias]['CONN_MAX_AGE'] = options['conn_max_age']
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=port,
+                                               lifespan='off', log_level='warning'))
+        thread = threading.Thread(target=server.run, daemon=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=['127.0.0.1']):
+                thread.start()
+                while not server.started:
+                    if not thread.is_alive():
+                        raise CommandError('uvicorn failed to start')
+                    time.sleep(0.05)
+
+                self.stdout.write(f'uvicorn on 127.0.0.1:{port}, {options["clients"]} clients, '
+                                  f'+{options["db_latency"]} ms per query')
+                for label, concurrency in (('sequential', 1), (f'concurrent ({options["concurrency"]})',
+                                                               options['concurrency'])):
+                    config = {'CONCURRENCY': concurrency, 'SECTION_TIMEOUT': options['timeout']}
+                    with override_settings(HOMEPAGE=config):
+                        result, degraded = self.run_clients(port, options['requests'], options['clients'])
+                    line = format_result(label, result)
+                    self.stdout.write(line + (f'  {degraded} degraded' if degraded else ''))
+        finally:
+            server.should_exit = True
+            thread.join()
+            if latency:
+                connection_created.disconnect(on_connection)
+
+    def run_clients(self, port, requests, clients):
+        degraded = 0
+        lock = threading.Lock()
+
+        def client(count):
+            nonlocal degraded
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            latencies = []
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    connection.request('GET', '/api/homepage/', headers={'Accept': 'application/json'})
+                    response = connection.getresponse()
+                    response.read()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if response.status != 200:
+                        raise CommandError(f'/api/homepage/ returned {response.status}')
+                    if response.getheader('X-Degraded-Sections'):
+                        with lock:
+                            degraded += 1
+            finally:
+                connection.close()
+            return latencies
+
+        client(3)  # warm up
+        per_client = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = [ms for chunk in pool.map(client, per_client) for ms in chunk]
+        elapsed = time.perf_counter() - started
+        return {
+            'requests': len(latencies),
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'mean': statistics.fmean(latencies) if latencies else 0.0,
+        }, degraded
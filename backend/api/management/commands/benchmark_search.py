@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.corpus import SLUG_PREFIX, WORDS, generate_corpus
+from news.models import Article
+from news.search import legacy_search, search_articles, search_backend
+from api.benchmarking import percentile
+
+
+class Command(BaseCommand):
+    help = 'Compare icontains search with the ranked full-text index on a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=100000,
+                            help='Make sure the synthetic corpus has at least this many articles')
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        existing = Article.objects.filter(slug__startswith=f'{SLUG_PREFIX}-article-').count()
+        if existing < options['articles']:
+            self.stdout.write(f'Seeding {options["articles"] - existing} synthetic articles...')
+            generate_corpus(articles=options['articles'] - existing, seed=existing, stdout=self.stdout)
+
+        self.stdout.write(f'Backend: {search_backend() or "none (icontains fallback)"}, '
+                          f'{Article.objects.count()} articles')
+        queries = [WORDS[0], f'{WORDS[5]} {WORDS[12]}', 'climate', 'court appeal verdict', 'nonexistentterm']
+        base = Article.objects.filter(status='published').select_related('author', 'category')
+        page_size = options['page_size']
+
+        for label, engine in (('icontains scan', legacy_search), ('full-text index', search_articles)):
+            latencies = []
+            for _ in range(options['runs']):
+                for query in queries:
+                    start = time.perf_counter()
+                    results = engine(base, query)
+                    # Mirror the API: one COUNT plus the first page
+                    results.count()
+                    list(results[:page_size])
+                    latencies.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f'{label:<18} p50 {percentile(latencies, 50):>9.2f} ms  p95 {percentile(latencies, 95):>9.2f} ms'
+            )
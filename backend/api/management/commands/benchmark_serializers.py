@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+
+from news.corpus import generate_corpus
+from news.models import Article
+from api.benchmarking import format_result, percentile, run_requests
+from api.fast_serializers import FastSerializer
+from api.serializers import ArticleListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF and fast-path serialization of article list pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Rows per page')
+        parser.add_argument('--runs', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint in the end-to-end pass (0 to skip)')
+
+    def measure(self, serialize, runs):
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            serialize()
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        published = Article.objects.filter(status='published')
+        if published.count() < limit:
+            generate_corpus(articles=int(limit * 1.2))
+
+        request = Request(RequestFactory().get('/api/articles/', SERVER_NAME='localhost'))
+        context = {'request': request}
+        base = published.select_related('author', 'category').prefetch_related('tags').for_listing()
+        base = base.order_by('-published_date')
+        fast = FastSerializer(ArticleListSerializer, context)
+
+        def drf():
+            return ArticleListSerializer(list(base[:limit]), many=True, context=context).data
+
+        def fast_path():
+            return fast.serialize(fast.prepare(base)[:limit])
+
+        if drf() != fast_path():
+            self.stderr.write('Fast path output differs from DRF output')
+        self.stdout.write(f'Serializing {limit} articles per page, {options["runs"]} runs (queries included)')
+        for label, serialize in (('DRF ModelSerializer', drf), ('fast path', fast_path)):
+            latencies = self.measure(serialize, options['runs'])
+            median = percentile(latencies, 50)
+            self.stdout.write(
+                f'{label:<20} p50 {median:>8.2f} ms  p95 {percentile(latencies, 95):>8.2f} ms  '
+                f'{limit / median * 1000:>10.0f} rows/s'
+            )
+
+        if not options['requests']:
+            return
+        with override_settings(ALLOWED_HOSTS=['localhost']):
+            for enabled in (False, True):
+                with override_settings(FAST_ARTICLE_SERIALIZATION=enabled):
+                    for path in (f'/api/articles/?page_size={min(limit, 100)}', '/api/homepage/'):
+                        result = run_requests(path, requests=options['requests'])
+                        label = f'{"fast" if enabled else "drf"} {path}'
+                        self.stdout.write(format_result(label, result))
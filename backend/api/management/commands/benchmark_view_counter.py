@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from news.models import Article
+from news.view_counter import flush_views, get_config
+from api.benchmarking import format_result, run_requests
+
+
+def save_view(article):
+    """The original counting: read-modify-write of the loaded row through save()"""
+    article.views_count += 1
+    article.save(update_fields=['views_count'])
+
+
+class Command(BaseCommand):
+    help = 'Compare article detail throughput with per-request save(), atomic UPDATE and buffered view counting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slug', help='Article to request (defaults to the latest published one)')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **options):
+        if options['slug']:
+            article = Article.objects.filter(slug=options['slug'], status='published').first()
+        else:
+            article = Article.objects.filter(status='published').order_by('-published_date').first()
+        if article is None:
+            raise CommandError('No published article to benchmark.')
+
+        path = f'/api/articles/{article.slug}/'
+        modes = (
+            # Lost updates under concurrency make its "views recorded" lower, not its timing
+            ('save() per view (original)', False, save_view),
+            ('atomic increment_views()', False, None),
+            ('buffered view counter', True, None),
+        )
+        results = {}
+        for label, enabled, counter in modes:
+            before = Article.objects.get(pk=article.pk).views_count
+            config = dict(get_config(), ENABLED=enabled)
+            with override_settings(VIEW_COUNTER=config, ALLOWED_HOSTS=['*']):
+                if counter is None:
+                    results[label] = run_requests(path, options['requests'], options['threads'])
+                else:
+                    with mock.patch('api.views.record_view', counter):
+                        results[label] = run_requests(path, options['requests'], options['threads'])
+            flush_views()
+            self.stdout.write(format_result(label, results[label]))
+            counted = Article.objects.get(pk=article.pk).views_count - before
+            self.stdout.write(f'  views recorded: {counted}')
+
+        original, _, buffered = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f"Buffered counting: {buffered['throughput'] / original['throughput']:.2f}x the original detail throughput"
+        ))
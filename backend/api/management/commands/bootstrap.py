@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from central_report import bootstrap
+
+
+class Command(BaseCommand):
+    help = 'Run the container start-up steps (migrate, ensure a superuser) in this process'
+
+    def handle(self, *args, **options):
+        bootstrap.run(stdout=self.stdout)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Export the read API to a directory of precompressed static JSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', help='Output directory (default: STATIC_SNAPSHOT["DIRECTORY"])')
+        parser.add_argument('--feed-pages', type=int, help='Pages to export per paginated list')
+        parser.add_argument('--base-url', help='Prefix of the rewritten next/previous links, e.g. https://cdn.example.com')
+        parser.add_argument('--path', action='append', default=[], metavar='PATH',
+                            help='Only re-export this API path (repeatable), e.g. /api/homepage/')
+
+    def handle(self, *args, **options):
+        config = snapshots.get_config()
+        for option, key in (('directory', 'DIRECTORY'), ('feed_pages', 'FEED_PAGES'), ('base_url', 'BASE_URL')):
+            if options[option] is not None:
+                config[key] = options[option]
+
+        started = time.perf_counter()
+        if options['path']:
+            changed = snapshots.Exporter(config).export(options['path'])
+        else:
+            changed = snapshots.export_site(config).changed
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot in {config["DIRECTORY"]}: {changed} files changed in {time.perf_counter() - started:.1f}s.'
+        ))
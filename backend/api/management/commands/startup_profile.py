@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under ``python -X importtime``; prints the
+# wall-clock time each phase ended as one JSON line on stdout
+CHILD = r'''
+import json, os, sys, time
+marks = {}
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'central_report.settings')
+from django.conf import settings
+settings.INSTALLED_APPS
+marks['settings'] = time.time()
+import django
+django.setup()
+marks['django.setup'] = time.time()
+from central_report.wsgi import application
+marks['wsgi app'] = time.time()
+from wsgiref.util import setup_testing_defaults
+hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': hosts[0] if hosts else 'localhost',
+           'HTTP_ACCEPT': 'application/json'}
+setup_testing_defaults(environ)
+status = []
+body = b''.join(application(environ, lambda s, headers, exc_info=None: status.append(s)))
+marks['first response'] = time.time()
+print(json.dumps({'marks': marks, 'status': status[0], 'bytes': len(body)}))
+'''
+
+
+def parse_importtime(stderr):
+    """Return ``[(module, self_us, cumulative_us)]`` from ``-X importtime`` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            own, cumulative, name = line[len('import time:'):].split('|', 2)
+            modules.append((name.strip(), int(own), int(cumulative)))
+        except ValueError:
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Profile process start to first response: phase timings and the slowest imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/', help='Path of the first request')
+        parser.add_argument('--top', type=int, default=15, help='How many modules and packages to list')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                     'central_report.settings'))
+        started = time.time()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD, options['path']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if process.returncode:
+            raise CommandError(f'Start-up run failed:\n{process.stderr[-2000:]}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(process.stderr)
+
+        self.stdout.write(f'GET {options["path"]} -> {result["status"]} ({result["bytes"]} bytes)')
+        previous = started
+        for phase, mark in result['marks'].items():
+            self.stdout.write(f'  {phase:<16} {(mark - previous) * 1000:8.1f} ms')
+            previous = mark
+        self.stdout.write(f'  {"total":<16} {(previous - started) * 1000:8.1f} ms  '
+                          f'(process start to first response, {len(modules)} modules imported)')
+
+        packages = defaultdict(int)
+        for name, own, _ in modules:
+            packages[name.split('.')[0]] += own
+        self.stdout.write('\nSlowest packages (self time summed):')
+        for name, own in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {own / 1000:8.1f} ms  {name}')
+        self.stdout.write('\nSlowest modules (self / cumulative):')
+        for name, own, cumulative in sorted(modules, key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {own / 1000:8.1f} / {cumulative / 1000:8.1f} ms  {name}')
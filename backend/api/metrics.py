@@ -0,0 +1,339 @@
+"""
+Per-endpoint request metrics in Prometheus text format.
+
+MetricsMiddleware times every request and labels it with the resolved
+route name and DRF action. For the duration of the request a database
+execute wrapper counts and times its SQL, and the outermost serializers
+add their ``to_representation`` time. Totals are aggregated in memory
+per process.
+
+Under gunicorn every worker also writes its totals to
+``METRICS['DIRECTORY']`` (one JSON file per pid, replaced atomically by
+a daemon thread every ``FLUSH_INTERVAL`` seconds while there is something
+new, and when the worker exits), and ``/api/metrics`` adds up the
+snapshots of all workers. Other workers' numbers can therefore lag by up
+to FLUSH_INTERVAL, even when they have gone idle. Without a directory
+only the answering process is reported.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIRECTORY': '',
+    'FLUSH_INTERVAL': 5,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LABELS = ('view', 'action', 'method', 'status')
+# Summed per label set alongside the latency histogram
+COUNTERS = (
+    ('db_queries_total', 'queries', 'SQL statements executed'),
+    ('db_query_duration_seconds_total', 'query_seconds', 'Time spent executing SQL'),
+    ('serializer_duration_seconds_total', 'serializer_seconds', 'Time spent in serializer to_representation'),
+    ('http_response_bytes_total', 'response_bytes', 'Response body bytes (streaming responses excluded)'),
+)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+class RequestStats:
+    __slots__ = ('queries', 'query_seconds', 'serializer_seconds', '_lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        # Parts of a request may run on other threads (api.homepage)
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.query_seconds += elapsed
+
+    def add_serializer_time(self, seconds):
+        with self._lock:
+            self.serializer_seconds += seconds
+
+
+class MetricsRegistry:
+    """Per-process totals keyed by label values"""
+
+    def __init__(self, buckets, directory='', flush_interval=5, background=False):
+        self.buckets = tuple(sorted(buckets))
+        self.directory = directory
+        self.flush_interval = flush_interval
+        # Flush from a daemon thread; off, the request that finds the snapshot due flushes it
+        self.background = background
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        self._thread = None
+
+    def observe(self, labels, seconds, stats, response_bytes):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = self._empty()
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['buckets'][index] += 1
+                    break
+            series['count'] += 1
+            series['sum'] += seconds
+            series['queries'] += stats.queries
+            series['query_seconds'] += stats.query_seconds
+            series['serializer_seconds'] += stats.serializer_seconds
+            series['response_bytes'] += response_bytes
+            self._dirty = True
+            due = self.directory and time.monotonic() - self._last_flush >= self.flush_interval
+        if not self.directory:
+            return
+        if self.background:
+            self._ensure_thread()
+        elif due:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'series': [
+                    {'labels': list(labels), **series, 'buckets': list(series['buckets'])}
+                    for labels, series in self._series.items()
+                ],
+            }
+
+    def flush(self):
+        """Replace this process's snapshot file; a no-op without a directory"""
+        if not self.directory:
+            return False
+        with self._lock:
+            self._last_flush = time.monotonic()
+            self._dirty = False
+        path = Path(self.directory) / f'{os.getpid()}.json'
+        temp = path.with_suffix('.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp.write_text(json.dumps(self.snapshot()))
+            os.replace(temp, path)
+        except OSError:
+            logger.exception('Failed to write metrics snapshot %s', path)
+            return False
+        return True
+
+    def collect(self):
+        """
+        Merge this process's totals with the snapshots of every other process.
+
+        Snapshots of workers that have exited are kept so counters never go
+        backwards; gunicorn clears the directory when the server starts.
+        """
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = f'{os.getpid()}.json'
+            for path in sorted(Path(self.directory).glob('*.json')):
+                if path.name == own:
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+
+        merged = {}
+        for snapshot in snapshots:
+            # Histograms with different buckets cannot be added up
+            if tuple(snapshot['buckets']) != self.buckets:
+                continue
+            for entry in snapshot['series']:
+                labels = tuple(entry['labels'])
+                series = merged.get(labels)
+                if series is None:
+                    series = merged[labels] = self._empty()
+                series['buckets'] = [a + b for a, b in zip(series['buckets'], entry['buckets'])]
+                for key in ('count', 'sum', 'queries', 'query_seconds', 'serializer_seconds', 'response_bytes'):
+                    series[key] += entry[key]
+        return merged
+
+    def render(self):
+        """Prometheus text exposition of the merged totals"""
+        series = sorted(self.collect().items())
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by route and action',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values['buckets']):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{format_labels(labels, le=bound)}}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{format_labels(labels, le="+Inf")}}} {values["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{format_labels(labels)}}} {values["sum"]!r}')
+            lines.append(f'http_request_duration_seconds_count{{{format_labels(labels)}}} {values["count"]}')
+        for name, key, help_text in COUNTERS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, values in series:
+                lines.append(f'{name}{{{format_labels(labels)}}} {values[key]!r}')
+        return '\n'.join(lines) + '\n'
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def _empty(self):
+        return {
+            'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0, 'queries': 0,
+            'query_seconds': 0.0, 'serializer_seconds': 0.0, 'response_bytes': 0,
+        }
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels, le=None):
+    pairs = list(zip(LABELS, labels))
+    if le is not None:
+        pairs.append(('le', le))
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                config = get_config()
+                _registry = MetricsRegistry(
+                    config['BUCKETS'], directory=config['DIRECTORY'], flush_interval=config['FLUSH_INTERVAL'],
+                    background=True,
+                )
+    return _registry
+
+
+def flush_metrics():
+    """Write this process's snapshot, e.g. from a gunicorn worker_exit hook"""
+    if _registry is None:
+        return False
+    return _registry.flush()
+
+
+def route_labels(request):
+    """``(view, action)`` for the resolved route: the URL name and the DRF action or handler method"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>', ''
+    view = match.view_name or match._func_path
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        return view, actions.get(request.method.lower(), '')
+    return view, request.method.lower()
+
+
+@contextmanager
+def serializer_timer():
+    """Add the time spent inside the block to the current request's serializer time"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_serializer_time(time.perf_counter() - start)
+
+
+@contextmanager
+def track_queries():
+    """Count this thread's SQL towards the current request, for work handed to another thread"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield
+
+
+class SerializerTimingMixin:
+    """Serializer mixin that times the outermost ``to_representation`` calls"""
+
+    def to_representation(self, instance):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None or _current.get() is None:
+            return super().to_representation(instance)
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_config()['ENABLED']
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        size = 0 if response.streaming else len(response.content)
+        view, action = route_labels(request)
+        get_registry().observe((view, action, request.method, str(response.status_code)), elapsed, stats, size)
+        return response
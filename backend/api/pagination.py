@@ -1,12 +1,85 @@
+import base64
+import binascii
+import contextvars
+import hashlib
+import json
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+_fresh_counts = contextvars.ContextVar('fresh_counts', default=False)
+
+
+@contextmanager
+def fresh_counts():
+    """Recount (and re-cache) every total inside the block, e.g. for snapshots that outlive the cache"""
+    token = _fresh_counts.set(True)
+    try:
+        yield
+    finally:
+        _fresh_counts.reset(token)
+
+
+def cached_count(queryset, refresh=False):
+    """
+    Return ``queryset.count()``, cached for PAGINATION_COUNT_CACHE_TIMEOUT seconds.
+
+    The cache key is the SQL of the count itself, so every distinct filter
+    combination gets its own entry. ``refresh`` (or a fresh_counts() block)
+    forces a recount.
+    """
+    refresh = refresh or _fresh_counts.get()
+    timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+    if not timeout:
+        return queryset.count()
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = 'pagination-count:' + hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+    count = None if refresh else cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return cached_count(self.object_list)
+        return super().count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not hasattr(self.object_list, 'query'):
+                raise
+            # A stale cached total must not hide pages published since
+            self.__dict__['count'] = cached_count(self.object_list, refresh=True)
+            self.__dict__.pop('num_pages', None)
+            return super().validate_number(number)
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
-    
+    django_paginator_class = CachedCountPaginator
+
     def get_paginated_response(self, data):
         return Response({
             'count': self.page.paginator.count,
@@ -15,4 +88,119 @@ class CustomPagination(PageNumberPagination):
             'results': data,
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
-        }) 
\ No newline at end of file
+        })
+
+
+class ArticlePagination(CustomPagination):
+    """
+    Page-number pagination with an opt-in keyset mode for article feeds.
+
+    Passing ``?cursor=`` (empty for the first page) switches to keyset
+    paging on ``(published_date, id)``: each page is an index range scan
+    no matter how deep it is, and the ``next``/``previous`` links carry
+    opaque cursors. ``?count=false`` drops the (cached) total.
+
+    Keyset pages are always newest first, so ``?ordering=`` and ``?search=``
+    (relevance order) are rejected with a 400 in this mode. Articles without
+    a ``published_date`` have no position in that order and are left out of
+    both the pages and the count.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    keyset_fields = ('published_date', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        conflicting = [
+            param for param in (api_settings.ORDERING_PARAM, api_settings.SEARCH_PARAM)
+            if request.query_params.get(param, '').strip()
+        ]
+        if conflicting:
+            raise ValidationError({
+                param: f'Cannot be combined with ?{self.cursor_query_param}=, which is ordered by newest first'
+                for param in conflicting
+            })
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request.query_params[self.cursor_query_param])
+        date_field, id_field = self.keyset_fields
+        queryset = queryset.filter(**{f'{date_field}__isnull': False})
+        self.total = None
+        if request.query_params.get(self.count_query_param, '').lower() not in ('0', 'false', 'no'):
+            self.total = cached_count(queryset)
+
+        if position is not None:
+            date, pk = position
+            if reverse:
+                # The redundant bound keeps the range usable by the published_date indexes
+                queryset = queryset.filter(
+                    Q(**{f'{date_field}__gt': date}) | Q(**{date_field: date, f'{id_field}__gt': pk}),
+                    **{f'{date_field}__gte': date}
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{date_field}__lt': date}) | Q(**{date_field: date, f'{id_field}__lt': pk}),
+                    **{f'{date_field}__lte': date}
+                )
+        if reverse:
+            queryset = queryset.order_by(date_field, id_field)
+        else:
+            queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not getattr(self, 'keyset', False):
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.total,
+            'next': self.get_keyset_link(self.rows[-1], reverse=False) if self.has_next and self.rows else None,
+            'previous': self.get_keyset_link(self.rows[0], reverse=True) if self.has_previous and self.rows else None,
+            'results': data,
+        })
+
+    def get_keyset_link(self, row, reverse):
+        date_field, id_field = self.keyset_fields
+        # Rows are model instances, or dicts when the view paginates a values() queryset
+        values = row if isinstance(row, dict) else {field: getattr(row, field) for field in self.keyset_fields}
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(values[date_field], values[id_field], reverse),
+        )
+
+    def encode_cursor(self, date, pk, reverse):
+        payload = {'d': date.isoformat(), 'i': pk}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return ((published_date, id) or None, reverse) for a cursor string"""
+        if not cursor:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            date = parse_datetime(payload['d'])
+            pk = int(payload['i'])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound('Invalid cursor')
+        if date is None:
+            raise NotFound('Invalid cursor')
+        return (date, pk), bool(payload.get('r'))
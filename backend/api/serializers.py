@@ -1,96 +1,124 @@
 from rest_framework import serializers
 from news.models import Category, Author, Article, Newsletter, Contact
+from taggit.models import Tag
 from taggit.serializers import TagListSerializerField
+from .fieldsets import SparseFieldsetMixin
+from .metrics import SerializerTimingMixin
 
 
-class CategorySerializer(serializers.ModelSerializer):
-    article_count = serializers.SerializerMethodField()
+def image_url(image, variants):
+    """Original image URL stored at save time (news.media); built from the field for rows saved before"""
+    if not image:
+        return None
+    if variants:
+        return variants['url']
+    url = str(image)
+    return url if url.startswith('http') else image.url
+
+
+def image_variants(image, variants):
+    """``{'src', 'srcset'}`` ready for an <img>, or None without an image"""
+    if not image or not variants:
+        return None
+    return {'src': variants['src'], 'srcset': variants['srcset']}
+
+
+class CategorySerializer(SerializerTimingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    article_count = serializers.IntegerField(source='published_article_count', read_only=True)
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'color', 'order', 'is_active', 'article_count', 'created_at']
 
-    def get_article_count(self, obj):
-        return obj.articles.filter(status='published').count()
-
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(SerializerTimingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Author
-        fields = ['id', 'name', 'bio', 'avatar', 'twitter_handle', 'is_active']
+        fields = ['id', 'name', 'bio', 'avatar', 'avatar_variants', 'twitter_handle', 'is_active']
+        field_sources = {'avatar': ['avatar', 'avatar_variants'], 'avatar_variants': ['avatar', 'avatar_variants']}
 
     def get_avatar(self, obj):
-        request = self.context.get('request')
-        if obj.avatar:
-            url = str(obj.avatar)
-            if url.startswith('http'):
-                return url
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+        return image_url(obj.avatar, obj.avatar_variants)
+
+    def get_avatar_variants(self, obj):
+        return image_variants(obj.avatar, obj.avatar_variants)
 
 
-class ArticleListSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializerTimingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    # Annotated from TagStats by TagViewSet
+    article_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'slug', 'article_count']
+
+
+class ArticleListSerializer(SerializerTimingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     featured_image = serializers.SerializerMethodField()
+    featured_image_variants = serializers.SerializerMethodField()
     published_date = serializers.SerializerMethodField()
     tags = TagListSerializerField()
 
     class Meta:
         model = Article
-        fields = ['id', 'title', 'slug', 'excerpt', 'featured_image', 'author', 'category', 'tags', 
-                 'is_featured', 'is_breaking', 'published_date', 'read_time', 'views_count', 'created_at']
+        fields = ['id', 'title', 'slug', 'excerpt', 'featured_image', 'featured_image_variants', 'author', 'category',
+                  'tags', 'is_featured', 'is_breaking', 'published_date', 'read_time', 'views_count', 'created_at']
+        field_sources = {
+            'featured_image': ['featured_image', 'featured_image_variants'],
+            'featured_image_variants': ['featured_image', 'featured_image_variants'],
+            'published_date': ['published_date', 'created_at'],
+        }
 
     def get_featured_image(self, obj):
-        request = self.context.get('request')
-        if obj.featured_image:
-            url = str(obj.featured_image)
-            if url.startswith('http'):
-                return url
-            if request:
-                return request.build_absolute_uri(obj.featured_image.url)
-            return obj.featured_image.url
-        return None
+        return image_url(obj.featured_image, obj.featured_image_variants)
+
+    def get_featured_image_variants(self, obj):
+        return image_variants(obj.featured_image, obj.featured_image_variants)
 
     def get_published_date(self, obj):
         # Return published_date if set, otherwise return created_at
         return obj.published_date or obj.created_at
 
 
-class ArticleDetailSerializer(serializers.ModelSerializer):
+class ArticleDetailSerializer(SerializerTimingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
+    # The body as processed on save (news.richtext), not the editor's source
+    content = serializers.CharField(source='content_html', read_only=True)
+    outline = serializers.JSONField(source='content_outline', read_only=True)
     featured_image = serializers.SerializerMethodField()
+    featured_image_variants = serializers.SerializerMethodField()
     published_date = serializers.SerializerMethodField()
     tags = TagListSerializerField()
 
     class Meta:
         model = Article
-        fields = ['id', 'title', 'slug', 'excerpt', 'content', 'featured_image', 'author', 'category', 'tags',
-                 'is_featured', 'is_breaking', 'published_date', 'read_time', 'views_count', 
-                 'meta_title', 'meta_description', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'slug', 'excerpt', 'content', 'outline', 'featured_image', 'featured_image_variants',
+                  'author', 'category', 'tags', 'is_featured', 'is_breaking', 'published_date', 'read_time', 'views_count',
+                  'meta_title', 'meta_description', 'created_at', 'updated_at']
+        field_sources = {
+            'featured_image': ['featured_image', 'featured_image_variants'],
+            'featured_image_variants': ['featured_image', 'featured_image_variants'],
+            'published_date': ['published_date', 'created_at'],
+        }
 
     def get_featured_image(self, obj):
-        request = self.context.get('request')
-        if obj.featured_image:
-            url = str(obj.featured_image)
-            if url.startswith('http'):
-                return url
-            if request:
-                return request.build_absolute_uri(obj.featured_image.url)
-            return obj.featured_image.url
-        return None
+        return image_url(obj.featured_image, obj.featured_image_variants)
+
+    def get_featured_image_variants(self, obj):
+        return image_variants(obj.featured_image, obj.featured_image_variants)
 
     def get_published_date(self, obj):
         # Return published_date if set, otherwise return created_at
         return obj.published_date or obj.created_at
 
 
-class NewsletterSerializer(serializers.ModelSerializer):
+class NewsletterSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Newsletter
         fields = ['email']
@@ -108,13 +136,13 @@ class NewsletterSerializer(serializers.ModelSerializer):
         return newsletter
 
 
-class ContactSerializer(serializers.ModelSerializer):
+class ContactSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Contact
         fields = ['first_name', 'last_name', 'email', 'subject', 'message']
 
 
-class ArticleSearchSerializer(serializers.ModelSerializer):
+class ArticleSearchSerializer(SerializerTimingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     
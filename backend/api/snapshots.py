@@ -0,0 +1,285 @@
+"""
+Static JSON snapshot of the read API.
+
+export_site() renders the homepage, the category and author lists and
+details, the article feeds (first ``FEED_PAGES`` pages of every
+paginated list) and every published article into ``DIRECTORY``, laid
+out so a CDN or static file server can answer the same paths::
+
+    /api/articles/                 api/articles/index.json
+    /api/articles/?page=2          api/articles/page/2/index.json
+    /api/articles/<slug>/          api/articles/<slug>/index.json
+
+Each file is written next to a gzip (and, when the ``brotli`` package is
+installed, a brotli) precompressed copy. Bodies are rendered by the live
+views and serializers, so they have the live shapes; only ``next`` and
+``previous`` links are rewritten to snapshot paths (``BASE_URL`` +
+path), or to the live query-string URL for pages past ``FEED_PAGES``.
+Files whose bytes did not change are left alone, so their mtimes and
+the CDN's copies stay valid.
+
+With ``ENABLED`` the receivers in ``news.signals`` call schedule() for
+saved, published, unpublished and deleted articles, categories and
+authors; once the transaction commits only the affected article files,
+their category and author feeds and the site-wide lists are exported
+again.
+"""
+import gzip
+import io
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit, urlencode
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import resolve, reverse
+
+try:
+    import brotli
+except ImportError:  # optional: gzip copies only
+    brotli = None
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIRECTORY': str(Path(settings.BASE_DIR) / 'snapshot'),
+    'FEED_PAGES': 5,
+    'BASE_URL': '',
+}
+
+# Site-wide lists that change whenever any article does
+SITE_ROUTES = ('homepage', 'article-list', 'featured', 'breaking', 'latest', 'category-list', 'author-list')
+DETAIL_BATCH_SIZE = 200
+
+_pending = threading.local()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'STATIC_SNAPSHOT', {}))
+    return config
+
+
+class Exporter:
+    """Render API paths into ``directory``; ``changed`` counts the files written or removed"""
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.directory = Path(self.config['DIRECTORY'])
+        from rest_framework.renderers import JSONRenderer
+
+        self.renderer = JSONRenderer()
+        self.written = set()
+        self.changed = 0
+        hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+        self.host = hosts[0] if hosts else 'localhost'
+
+    def request(self, path, **params):
+        """A GET request for ``path`` as the views would get it from a client"""
+        return WSGIRequest({
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(params),
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        })
+
+    def file_for(self, path, page=1):
+        folder = self.directory / path.strip('/')
+        if page > 1:
+            folder = folder / 'page' / str(page)
+        return folder / 'index.json'
+
+    def snapshot_url(self, path, page):
+        if page > self.config['FEED_PAGES']:
+            return f'{self.config["BASE_URL"]}{path}?{urlencode({"page": page})}'
+        return f'{self.config["BASE_URL"]}{path}' + (f'page/{page}/' if page > 1 else '')
+
+    def rewrite_link(self, path, link):
+        if not link:
+            return link
+        page = parse_qs(urlsplit(link).query).get('page', ['1'])[0]
+        return self.snapshot_url(path, int(page) if page.isdigit() else 1)
+
+    def write(self, file, content):
+        variants = {file: content, file.with_name(file.name + '.gz'): gzip.compress(content, 9, mtime=0)}
+        if brotli is not None:
+            variants[file.with_name(file.name + '.br')] = brotli.compress(content)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        for target, data in variants.items():
+            self.written.add(target)
+            if target.exists() and target.read_bytes() == data:
+                continue
+            temporary = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+            temporary.write_bytes(data)
+            os.replace(temporary, target)
+            self.changed += 1
+
+    def remove(self, folder):
+        if folder.is_dir():
+            self.changed += sum(1 for item in folder.rglob('*') if item.is_file())
+            shutil.rmtree(folder)
+
+    def export_view(self, path):
+        """Export every page of ``path`` up to FEED_PAGES; a 404 removes its files"""
+        match = resolve(path)
+        page = 1
+        while True:
+            params = {'page': page} if page > 1 else {}
+            response = match.func(self.request(path, **params), *match.args, **match.kwargs)
+            if response.status_code == 404:
+                self.remove(self.file_for(path).parent)
+                return
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} answered {response.status_code}')
+            data = response.data
+            paginated = isinstance(data, dict) and 'results' in data and 'next' in data
+            if paginated:
+                data = dict(data, next=self.rewrite_link(path, data['next']),
+                            previous=self.rewrite_link(path, data['previous']))
+            self.write(self.file_for(path, page), self.renderer.render(data))
+            if not paginated or not response.data['next'] or page >= self.config['FEED_PAGES']:
+                break
+            page += 1
+        # Drop pages a shrinking feed no longer has
+        pages = self.file_for(path).parent / 'page'
+        if pages.is_dir():
+            for folder in pages.iterdir():
+                if not folder.name.isdigit() or int(folder.name) > page:
+                    self.remove(folder)
+
+    def export_articles(self, slugs):
+        """Export article details in batches; slugs that are no longer published lose their files"""
+        from rest_framework.request import Request
+        from news.models import Article
+        from .serializers import ArticleDetailSerializer
+
+        slugs = sorted(set(slugs))
+        context = {'request': Request(self.request(reverse('article-list')))}
+        for start in range(0, len(slugs), DETAIL_BATCH_SIZE):
+            chunk = slugs[start:start + DETAIL_BATCH_SIZE]
+            articles = (
+                Article.objects.filter(status='published', slug__in=chunk)
+                .select_related('author', 'category').prefetch_related('tags').for_detail()
+            )
+            found = set()
+            for data in ArticleDetailSerializer(articles, many=True, context=context).data:
+                found.add(data['slug'])
+                self.write(self.file_for(reverse('article-detail', kwargs={'slug': data['slug']})),
+                           self.renderer.render(data))
+            for slug in set(chunk) - found:
+                self.remove(self.file_for(reverse('article-detail', kwargs={'slug': slug})).parent)
+
+    def export(self, paths=(), article_slugs=()):
+        """Export API ``paths`` and article details; returns the number of files changed so far"""
+        from .pagination import fresh_counts
+
+        slugs = list(article_slugs)
+        # Snapshot totals must not come from the live API's count cache
+        with fresh_counts():
+            for path in sorted(set(paths)):
+                match = resolve(path)
+                if match.url_name == 'article-detail':
+                    # Rendered from the serializer in batches; the view would also count a page view
+                    slugs.append(match.kwargs['slug'])
+                else:
+                    self.export_view(path)
+        self.export_articles(slugs)
+        return self.changed
+
+    def prune(self):
+        """Delete files not written by this exporter (after a full export)"""
+        if not self.directory.is_dir():
+            return
+        for item in sorted(self.directory.rglob('*'), reverse=True):
+            if item.is_file() and item not in self.written:
+                item.unlink()
+                self.changed += 1
+            elif item.is_dir() and not any(item.iterdir()):
+                item.rmdir()
+
+
+def category_paths(slugs):
+    for slug in slugs:
+        yield reverse('category-detail', kwargs={'slug': slug})
+        yield reverse('category-articles', kwargs={'slug': slug})
+
+
+def author_paths(pks):
+    for pk in pks:
+        yield reverse('author-detail', kwargs={'pk': pk})
+        yield reverse('author-articles', kwargs={'pk': pk})
+
+
+def export_site(config=None):
+    """Export the whole read API and remove files of anything no longer published; returns the exporter"""
+    from news.models import Article, Author, Category
+
+    exporter = Exporter(config)
+    paths = [reverse(name) for name in SITE_ROUTES]
+    paths += category_paths(Category.objects.filter(is_active=True).values_list('slug', flat=True))
+    paths += author_paths(Author.objects.filter(is_active=True).values_list('pk', flat=True))
+    slugs = Article.objects.filter(status='published').values_list('slug', flat=True)
+    exporter.export(paths, slugs)
+    exporter.prune()
+    return exporter
+
+
+def export_changes(article_ids=(), category_ids=(), author_ids=(), paths=(), config=None):
+    """Export the files that depend on the given articles, categories and authors; returns files changed"""
+    from news.models import Article, Category
+
+    category_ids, author_ids = set(category_ids), set(author_ids)
+    slugs = []
+    for slug, category_id, author_id in Article.objects.filter(pk__in=set(article_ids)).values_list(
+        'slug', 'category_id', 'author_id'
+    ):
+        slugs.append(slug)
+        category_ids.add(category_id)
+        author_ids.add(author_id)
+    category_slugs = Category.objects.filter(pk__in=category_ids).values_list('slug', flat=True)
+
+    targets = set(paths)
+    targets.update(reverse(name) for name in SITE_ROUTES)
+    targets.update(category_paths(category_slugs))
+    targets.update(author_paths(author_ids - {None}))
+    return Exporter(config).export(targets, slugs)
+
+
+def schedule(article_ids=(), category_ids=(), author_ids=(), paths=()):
+    """Queue an incremental export for when the current transaction commits"""
+    if not get_config()['ENABLED']:
+        return
+    pending = getattr(_pending, 'changes', None)
+    if pending is None:
+        pending = _pending.changes = {'article_ids': set(), 'category_ids': set(), 'author_ids': set(),
+                                      'paths': set()}
+    pending['article_ids'].update(article_ids)
+    pending['category_ids'].update(category_ids)
+    pending['author_ids'].update(author_ids)
+    pending['paths'].update(paths)
+    # Every call registers a flush; the first one to run after commit exports everything queued.
+    # Changes of a rolled-back transaction are exported with the next commit, which is harmless
+    transaction.on_commit(flush, robust=True)
+
+
+def flush():
+    changes = getattr(_pending, 'changes', None)
+    _pending.changes = None
+    if changes:
+        export_changes(**changes)
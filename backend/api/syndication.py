@@ -0,0 +1,225 @@
+"""
+Sitemaps and RSS/Atom feeds, rendered from the database and cached per partition.
+
+The sitemap index lists one partition for the site's pages, categories
+and authors and one per calendar month (UTC) of published articles.
+Each partition is rendered by streaming its rows with ``iterator()``,
+so memory stays flat however large a month grows, and is cached as
+bytes under its own key together with its ETag. Feeds (global, per
+category, per author) list the newest ``FEED_ITEMS`` articles and are
+cached the same way.
+
+Nothing is rebuilt on a timer: the receivers in ``news.signals`` call
+schedule_invalidation() with the months, categories and authors a
+publish or edit touched, and only those entries (plus the index and the
+global feeds) are dropped once the transaction commits.
+``CACHE_TIMEOUT`` bounds how long a per-process cache (the default
+LocMemCache) can lag behind changes made through another worker.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import feedgenerator
+
+DEFAULTS = {
+    'SITE_URL': 'https://centralsreport.com',
+    'SITE_NAME': 'The Central Report',
+    'CACHE_TIMEOUT': 3600,
+    'FEED_ITEMS': 50,
+    # Frontend pages listed in the pages partition, relative to SITE_URL
+    'STATIC_PAGES': ('/', '/about', '/contact', '/privacy', '/terms', '/careers'),
+    'CHUNK_SIZE': 2000,
+}
+
+KEY_PREFIX = 'syndication:'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SITEMAP_CONTENT_TYPE = 'application/xml; charset=utf-8'
+FEED_FORMATS = {
+    'rss': feedgenerator.Rss201rev2Feed,
+    'atom': feedgenerator.Atom1Feed,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SYNDICATION', {}))
+    return config
+
+
+def site_url(path, config):
+    return config['SITE_URL'].rstrip('/') + path
+
+
+def month_of(published_date):
+    """Sitemap partition (``YYYY-MM``) of a publication date, or None"""
+    if published_date is None:
+        return None
+    return published_date.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def month_range(year, month):
+    start = datetime(year, month, 1, tzinfo=dt_timezone.utc)
+    return start, datetime(year + month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _w3c(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def _cached(key, build, config):
+    """Return ``(content, etag)`` for ``key``, rendering ``build()``'s chunks on a miss"""
+    entry = cache.get(KEY_PREFIX + key)
+    if entry is None:
+        content = ''.join(build()).encode()
+        entry = (content, '"%s"' % hashlib.md5(content).hexdigest())
+        cache.set(KEY_PREFIX + key, entry, config['CACHE_TIMEOUT'])
+    return entry
+
+
+def _entry(tag, location, lastmod=None):
+    lastmod = f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else ''
+    return f'<{tag}><loc>{escape(location)}</loc>{lastmod}</{tag}>\n'
+
+
+def sitemap_index(config=None):
+    from django.db.models import Max
+    from django.db.models.functions import TruncMonth
+    from news.models import Article
+
+    config = config or get_config()
+
+    def build():
+        months = (
+            Article.objects.filter(status='published', published_date__isnull=False)
+            .annotate(month=TruncMonth('published_date', tzinfo=dt_timezone.utc))
+            .values('month').annotate(lastmod=Max('updated_at')).order_by('month')
+        )
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        yield _entry('sitemap', site_url('/sitemaps/pages.xml', config))
+        for row in months.iterator():
+            yield _entry('sitemap', site_url(f'/sitemaps/{month_of(row["month"])}.xml', config), row['lastmod'])
+        yield '</sitemapindex>\n'
+
+    return _cached('sitemap:index', build, config)
+
+
+def pages_sitemap(config=None):
+    from news.models import Author, Category
+
+    config = config or get_config()
+
+    def build():
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        for path in config['STATIC_PAGES']:
+            yield _entry('url', site_url(path, config))
+        categories = Category.objects.filter(is_active=True).order_by('order', 'pk')
+        for slug, updated_at in categories.values_list('slug', 'updated_at').iterator():
+            yield _entry('url', site_url(f'/category/{slug}', config), updated_at)
+        for pk, updated_at in Author.objects.filter(is_active=True).order_by('pk').values_list(
+            'pk', 'updated_at'
+        ).iterator():
+            yield _entry('url', site_url(f'/author/{pk}', config), updated_at)
+        yield '</urlset>\n'
+
+    return _cached('sitemap:pages', build, config)
+
+
+def month_sitemap(year, month, config=None):
+    from news.models import Article
+
+    config = config or get_config()
+    start, end = month_range(year, month)
+
+    def build():
+        articles = (
+            Article.objects.filter(status='published', published_date__gte=start, published_date__lt=end)
+            .order_by('published_date', 'pk').values_list('slug', 'updated_at')
+        )
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        for slug, updated_at in articles.iterator(chunk_size=config['CHUNK_SIZE']):
+            yield _entry('url', site_url(f'/article/{slug}', config), updated_at)
+        yield '</urlset>\n'
+
+    return _cached(f'sitemap:{year:04d}-{month:02d}', build, config)
+
+
+def feed(feed_format, category=None, author=None, config=None):
+    """``(content, etag)`` of the global feed, or of one category's or author's"""
+    from news.models import Article
+
+    config = config or get_config()
+    articles = Article.objects.filter(status='published', published_date__isnull=False)
+    if category is not None:
+        scope, articles = f'category:{category.pk}', articles.filter(category=category)
+        title, link, description = category.name, f'/category/{category.slug}', category.description
+        feed_path = f'/feeds/category/{category.slug}/{feed_format}.xml'
+    elif author is not None:
+        scope, articles = f'author:{author.pk}', articles.filter(author=author)
+        title, link, description = author.name, f'/author/{author.pk}', author.bio
+        feed_path = f'/feeds/author/{author.pk}/{feed_format}.xml'
+    else:
+        scope, title, link, description = 'all', None, '/', ''
+        feed_path = f'/feeds/{feed_format}.xml'
+
+    def build():
+        generator = FEED_FORMATS[feed_format](
+            title=f'{title} - {config["SITE_NAME"]}' if title else config['SITE_NAME'],
+            link=site_url(link, config),
+            description=description or f'Latest news from {config["SITE_NAME"]}',
+            feed_url=site_url(feed_path, config),
+            language='en',
+        )
+        rows = articles.order_by('-published_date', '-pk').values_list(
+            'title', 'slug', 'excerpt', 'published_date', 'updated_at', 'author__name', 'category__name'
+        )[:config['FEED_ITEMS']]
+        for title_, slug, excerpt, published, updated, author_name, category_name in rows.iterator():
+            url = site_url(f'/article/{slug}', config)
+            generator.add_item(
+                title=title_, link=url, description=excerpt, unique_id=url, pubdate=published,
+                updateddate=updated, author_name=author_name, categories=[category_name],
+            )
+        yield generator.writeString('utf-8')
+
+    return _cached(f'feed:{feed_format}:{scope}', build, config)
+
+
+def invalidate(months=(), category_ids=(), author_ids=(), pages=False):
+    """Drop the cached partitions and feeds that depend on the given months, categories and authors"""
+    keys = ['sitemap:index'] + [f'sitemap:{month}' for month in set(months) if month]
+    if pages:
+        keys.append('sitemap:pages')
+    for feed_format in FEED_FORMATS:
+        keys.append(f'feed:{feed_format}:all')
+        keys += [f'feed:{feed_format}:category:{pk}' for pk in set(category_ids) if pk]
+        keys += [f'feed:{feed_format}:author:{pk}' for pk in set(author_ids) if pk]
+    cache.delete_many([KEY_PREFIX + key for key in keys])
+
+
+def invalidate_articles(article_ids):
+    """Invalidate everything a batch of articles appears in (news.publishing batches)"""
+    from news.models import Article
+
+    months, category_ids, author_ids = set(), set(), set()
+    for published_date, category_id, author_id in Article.objects.filter(pk__in=list(article_ids)).values_list(
+        'published_date', 'category_id', 'author_id'
+    ):
+        months.add(month_of(published_date))
+        category_ids.add(category_id)
+        author_ids.add(author_id)
+    invalidate(months, category_ids, author_ids)
+
+
+def schedule_invalidation(months=(), category_ids=(), author_ids=(), pages=False):
+    """Invalidate once the current transaction commits, so no request re-caches the old rows"""
+    transaction.on_commit(
+        partial(invalidate, list(months), list(category_ids), list(author_ids), pages), robust=True
+    )
+
+
+def schedule_article_invalidation(article_ids):
+    transaction.on_commit(partial(invalidate_articles, list(article_ids)), robust=True)
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from news.corpus import generate_corpus
+from news.tests import create_author, create_author_and_category
+from news import publishing, related, trending
+from news.models import Article, Author, Category, Newsletter
+from news.view_counter import flush_views
+from . import syndication, throttling
+from .homepage import run_sections
+from .metrics import MetricsRegistry, RequestStats
+from .benchmarking import ENDPOINTS, count_queries, endpoint_requests, route_names
+from .pagination import ArticlePagination
+
+
+class ArticleSearchTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_author_and_category('Science')
+
+    def make_article(self, title, excerpt='Excerpt', content='<p>Body</p>', status='published'):
+        return Article.objects.create(
+            title=title, excerpt=excerpt, content=content, status=status,
+            author=self.author, category=self.category,
+        )
+
+    def search(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [item['slug'] for item in response.json()['results']]
+
+    def test_results_are_rank_ordered(self):
+        self.make_article('Weather report', content='<p>A short note on <b>glaciers</b>.</p>')
+        self.make_article('Glaciers are melting', excerpt='Glaciers retreat')
+        self.make_article('Unrelated story')
+        self.make_article('Glaciers draft', status='draft')
+        self.assertEqual(self.search('/api/search/?q=glacier'), ['glaciers-are-melting', 'weather-report'])
+
+    def test_html_is_not_indexed(self):
+        self.make_article('Styled story', content='<p style="color:red">Plain words</p>')
+        self.assertEqual(self.search('/api/search/?q=color'), [])
+        self.assertEqual(self.search('/api/search/?q=plain words'), ['styled-story'])
+
+    def test_tags_and_edits_are_indexed(self):
+        article = self.make_article('Budget vote')
+        article.tags.add('parliament')
+        self.assertEqual(self.search('/api/search/?q=parliament'), ['budget-vote'])
+        article.title = 'Budget passes'
+        article.save()
+        self.assertEqual(self.search('/api/search/?q=passes'), ['budget-vote'])
+        article.delete()
+        self.assertEqual(self.search('/api/search/?q=parliament'), [])
+
+    def test_article_list_search_filter(self):
+        self.make_article('Solar power record')
+        self.make_article('Wind farm', excerpt='Solar and wind')
+        self.assertEqual(self.search('/api/articles/?search=solar'), ['solar-power-record', 'wind-farm'])
+
+    def test_list_endpoints_do_not_read_content(self):
+        self.make_article('Solar power record')
+        for path in ('/api/articles/', '/api/latest/', '/api/homepage/', '/api/search/?q=solar'):
+            with self.subTest(path=path), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(path).status_code, 200)
+            selects = [q['sql'] for q in queries.captured_queries if 'FROM "news_article"' in q['sql']]
+            self.assertTrue(selects)
+            for sql in selects:
+                self.assertNotIn('"news_article"."content"', sql)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author, category = create_author_and_category('Science')
+        now = timezone.now()
+        for index in range(25):
+            Article.objects.create(
+                title=f'Story {index}', excerpt='Excerpt', content='<p>Body</p>', status='published',
+                author=author, category=category,
+                # Pairs of articles share a timestamp so the id tie-breaker matters
+                published_date=now - timezone.timedelta(hours=index // 2),
+            )
+        self.expected = list(
+            Article.objects.order_by('-published_date', '-id').values_list('slug', flat=True)
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_walk_forward_and_back(self):
+        data = self.get('/api/articles/?cursor=&page_size=10')
+        self.assertEqual(data['count'], 25)
+        self.assertIsNone(data['previous'])
+        pages = [data]
+        while data['next']:
+            data = self.get(data['next'])
+            pages.append(data)
+        slugs = [item['slug'] for page in pages for item in page['results']]
+        self.assertEqual(slugs, self.expected)
+
+        back = self.get(pages[-1]['previous'])
+        self.assertEqual(back['results'], pages[-2]['results'])
+        self.assertEqual(self.get(back['previous'])['results'], pages[0]['results'])
+
+    def test_count_can_be_skipped(self):
+        with self.assertNumQueries(3):  # ETag aggregate + page rows + tags prefetch, no COUNT(*)
+            data = self.get('/api/articles/?cursor=&count=false')
+        self.assertIsNone(data['count'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/articles/?cursor=not-a-cursor').status_code, 404)
+
+    def test_cursor_rejects_ordering_and_search(self):
+        for query in ('ordering=title', 'search=story', 'ordering=-views_count&search=story'):
+            response = self.client.get(f'/api/articles/?cursor=&{query}')
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(self.client.get('/api/articles/?cursor=&ordering=').status_code, 200)
+
+    def test_undated_articles_are_left_out_of_pages_and_count(self):
+        Article.objects.filter(slug=self.expected[0]).update(published_date=None)
+        data = self.get('/api/articles/?cursor=&page_size=30')
+        self.assertEqual(data['count'], 24)
+        self.assertEqual([item['slug'] for item in data['results']], self.expected[1:])
+
+    def test_page_number_mode_is_unchanged(self):
+        data = self.get('/api/articles/?page=2&page_size=10')
+        self.assertEqual(data['current_page'], 2)
+        self.assertEqual(data['total_pages'], 3)
+
+
+class QueryPlanTests(TestCase):
+    """Every public endpoint must reach news_article through an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_corpus(articles=300, categories=4, authors=6, tags=10, paragraphs=2)
+        article = Article.objects.filter(status='published').first()
+        cursor = ArticlePagination().encode_cursor(article.published_date, article.pk, reverse=False)
+        cls.paths = [
+            '/api/articles/',
+            '/api/articles/?page=3',
+            f'/api/articles/?cursor={cursor}',
+            f'/api/categories/{article.category.slug}/articles/?cursor={cursor}&count=false',
+            f'/api/articles/?category__slug={article.category.slug}',
+            f'/api/articles/?author__id={article.author_id}',
+            '/api/articles/?is_featured=true',
+            '/api/articles/?is_breaking=true',
+            '/api/articles/?search=court',
+            f'/api/articles/?tag={article.tags.first().slug}',
+            f'/api/tags/{article.tags.first().slug}/articles/',
+            f'/api/articles/{article.slug}/',
+            f'/api/articles/{article.slug}/related/',
+            '/api/featured/',
+            '/api/breaking/',
+            '/api/trending/',
+            '/api/latest/',
+            f'/api/categories/{article.category.slug}/articles/',
+            f'/api/authors/{article.author_id}/articles/',
+            '/api/homepage/',
+            '/api/search/?q=court',
+        ]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables always favour a seq scan; ask whether an index *can* be used
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def is_sequential_scan(self, line):
+        if connection.vendor == 'postgresql':
+            return 'Seq Scan on news_article ' in line
+        return bool(re.match(r'SCAN news_article\b(?! USING)', line.strip()))
+
+    def test_article_queries_use_indexes(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                for query in queries.captured_queries:
+                    if not query['sql'].startswith('SELECT') or '"news_article"' not in query['sql']:
+                        continue
+                    plan = self.explain(query['sql'])
+                    scans = [line for line in plan if self.is_sequential_scan(line)]
+                    self.assertFalse(scans, f"{query['sql']}\n" + '\n'.join(plan))
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Science', description='All about science')
+        self.author = create_author(bio='A very long biography')
+        self.article = Article.objects.create(
+            title='Solar power record', excerpt='Excerpt', content='<p>Body</p>', status='published',
+            author=self.author, category=self.category,
+        )
+        self.article.tags.add('energy')
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def test_fields_prune_payload_and_columns(self):
+        data, queries = self.get('/api/articles/?fields=slug,title,author.name')
+        self.assertEqual(data['results'], [{'slug': 'solar-power-record', 'title': 'Solar power record',
+                                            'author': {'name': 'Alice'}}])
+        select = next(sql for sql in queries if 'FROM "news_article"' in sql and 'COUNT' not in sql)
+        self.assertIn('"news_author"."name"', select)
+        self.assertNotIn('"news_author"."bio"', select)
+        self.assertNotIn('"news_article"."excerpt"', select)
+        self.assertNotIn('news_category', select)
+        self.assertFalse([sql for sql in queries if 'taggit' in sql])
+
+    def test_omit_nested_and_top_level(self):
+        data, queries = self.get('/api/articles/?omit=author.bio,category,tags')
+        item = data['results'][0]
+        self.assertNotIn('category', item)
+        self.assertNotIn('tags', item)
+        self.assertNotIn('bio', item['author'])
+        self.assertEqual(item['author']['name'], 'Alice')
+        self.assertFalse([sql for sql in queries if '"news_author"."bio"' in sql])
+
+    def test_detail_category_and_author_endpoints(self):
+        data, _ = self.get(f'/api/articles/{self.article.slug}/?fields=title,content')
+        self.assertEqual(data, {'title': 'Solar power record', 'content': '<p>Body</p>'})
+        data, queries = self.get('/api/categories/?fields=slug,article_count')
+        self.assertEqual(data['results'], [{'slug': 'science', 'article_count': 1}])
+        self.assertFalse([sql for sql in queries if '"news_category"."description"' in sql])
+        data, _ = self.get(f'/api/authors/{self.author.pk}/articles/?fields=slug&cursor=')
+        self.assertEqual(data['results'], [{'slug': 'solar-power-record'}])
+
+    def test_detail_serves_processed_body(self):
+        self.article.content = '<h2 style="color: red">Lede</h2>\n<p>&nbsp;</p>\n<p>Body <script>x()</script></p>'
+        self.article.save()
+        data, queries = self.get(f'/api/articles/{self.article.slug}/')
+        self.assertEqual(data['content'], '<h2 id="lede">Lede</h2><p>Body</p>')
+        self.assertEqual(data['outline'], [{'level': 2, 'text': 'Lede', 'id': 'lede'}])
+        select = next(sql for sql in queries if 'FROM "news_article"' in sql and '"content_html"' in sql)
+        self.assertNotIn('"news_article"."content",', select)
+        self.assertNotIn('"news_article"."content_text"', select)
+
+    def test_default_output_unchanged(self):
+        data, _ = self.get('/api/articles/')
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'title', 'slug', 'excerpt', 'featured_image', 'featured_image_variants', 'author', 'category', 'tags',
+            'is_featured', 'is_breaking', 'published_date', 'read_time', 'views_count', 'created_at',
+        })
+
+
+class FastSerializerParityTests(TestCase):
+    def setUp(self):
+        import cloudinary
+
+        # The fixtures have Cloudinary images, whose URLs need a cloud name
+        cloudinary.reset_config()
+        self.addCleanup(cloudinary.reset_config)
+        cloudinary.config(cloud_name='demo')
+        cache.clear()
+        science = Category.objects.create(name='Science', description='All about science')
+        Category.objects.create(name='Empty')
+        alice = create_author(bio='Bio', avatar='authors/alice')
+        bob = create_author('Bob', twitter_handle='bob')
+        now = timezone.now()
+        for index in range(7):
+            article = Article.objects.create(
+                title=f'Solar story {index}', excerpt=f'Excerpt {index}', content='<p>Solar body</p>',
+                status='published', author=alice if index % 2 else bob, category=science,
+                is_featured=index % 3 == 0, is_breaking=index == 4,
+                featured_image=['', 'articles/solar', 'https://example.com/solar.jpg'][index % 3],
+                published_date=now - timezone.timedelta(hours=index),
+            )
+            article.tags.add(*['energy', 'climate', 'Zebra', 'alpha'][:index % 4])
+        Article.objects.create(title='Draft', excerpt='', content='', status='draft', author=bob, category=science)
+
+    def assertSameBytes(self, path):
+        with override_settings(FAST_ARTICLE_SERIALIZATION=False):
+            expected = self.client.get(path)
+        actual = self.client.get(path)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+
+    def test_list_endpoints_render_identically(self):
+        author = Author.objects.get(name='Alice')
+        for path in (
+            '/api/articles/', '/api/articles/?page_size=3&page=2', '/api/articles/?cursor=&page_size=3',
+            '/api/articles/?ordering=title', '/api/articles/?search=solar', '/api/articles/?is_featured=true',
+            '/api/articles/featured/', '/api/articles/breaking/', '/api/trending/', '/api/latest/',
+            '/api/homepage/', '/api/search/?q=solar', '/api/search/?q=',
+            '/api/categories/science/articles/', f'/api/authors/{author.pk}/articles/?cursor=',
+            '/api/articles/?fields=slug,tags,author.avatar', '/api/articles/?omit=category,author.bio',
+            '/api/search/?q=solar&fields=id,featured_image',
+        ):
+            with self.subTest(path=path):
+                self.assertSameBytes(path)
+
+    def test_cursor_links_from_values_rows(self):
+        data = self.client.get('/api/articles/?cursor=&page_size=2&fields=slug').json()
+        self.assertEqual([item['slug'] for item in data['results']], ['solar-story-0', 'solar-story-1'])
+        self.assertEqual(
+            [item['slug'] for item in self.client.get(data['next']).json()['results']],
+            ['solar-story-2', 'solar-story-3'],
+        )
+
+    def test_fast_path_query_count(self):
+        with self.assertNumQueries(3):  # ETag aggregate + page rows (author/category joined) + tags
+            self.client.get('/api/articles/?cursor=&count=false')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.category = create_author_and_category('Science')
+        self.article = Article.objects.create(
+            title='Solar power record', excerpt='Excerpt', content='<p>Body</p>', status='published',
+            author=self.author, category=self.category,
+        )
+
+    def revalidate(self, path):
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', first)
+        return first['ETag']
+
+    def assertNotModified(self, path, etag):
+        with self.assertNumQueries(1):  # the validator aggregate, no serialization
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_unchanged_collections_return_304(self):
+        for path in ('/api/articles/', '/api/articles/?page_size=5&fields=slug', '/api/latest/',
+                     '/api/categories/', f'/api/categories/{self.category.slug}/',
+                     f'/api/authors/{self.author.pk}/', '/api/homepage/'):
+            with self.subTest(path=path):
+                self.assertNotModified(path, self.revalidate(path))
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/articles/')['Last-Modified']
+        response = self.client.get('/api/articles/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etags(self):
+        paths = ('/api/articles/', '/api/homepage/', '/api/categories/')
+        etags = {path: self.revalidate(path) for path in paths}
+
+        def assertChanged(label, *paths_changed):
+            for path in paths_changed:
+                with self.subTest(change=label, path=path):
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etags[path])
+                    self.assertEqual(response.status_code, 200)
+                    etags[path] = response['ETag']
+
+        self.article.title = 'Solar power record broken'
+        self.article.save()
+        assertChanged('edit', '/api/articles/', '/api/homepage/')
+        self.article.tags.add('energy')
+        assertChanged('tags', '/api/articles/', '/api/homepage/')
+        Author.objects.filter(pk=self.author.pk).update(name='Alicia', updated_at=timezone.now())
+        assertChanged('author', '/api/articles/', '/api/homepage/')
+        Article.objects.create(
+            title='Second', excerpt='', content='', status='published', author=self.author, category=self.category,
+        )
+        assertChanged('publish', *paths)
+        self.article.delete()
+        assertChanged('delete', *paths)
+
+    @override_settings(VIEW_COUNTER={'ENABLED': False})
+    def test_detail_304_still_counts_the_view(self):
+        path = f'/api/articles/{self.article.slug}/'
+        etag = self.revalidate(path)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views_count, 2)
+        self.assertEqual(self.client.get('/api/articles/missing/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+class TrendingEndpointTests(TestCase):
+    def setUp(self):
+        self.politics = Category.objects.create(name='Politics')
+        author, sports = create_author_and_category('Sports')
+        self.articles = [
+            Article.objects.create(
+                title=f'Story {index}', excerpt='', content='', status='published', author=author,
+                category=self.politics if index % 2 else sports, views_count=1000 - index,
+            )
+            for index in range(6)
+        ]
+        Article.objects.filter(pk=self.articles[5].pk).update(status='draft')
+        trending.record_views({article.pk: index + 1 for index, article in enumerate(self.articles)})
+
+    def slugs(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [item['slug'] for item in response.json()]
+
+    def test_ranked_by_decayed_score_with_limit(self):
+        self.assertEqual(self.slugs('/api/trending/?limit=3'), ['story-4', 'story-3', 'story-2'])
+        self.assertEqual(len(self.slugs('/api/trending/')), 5)
+        self.assertEqual(len(self.slugs('/api/trending/?limit=nonsense')), 5)
+        with override_settings(TRENDING={'MAX_LIMIT': 2}):
+            self.assertEqual(len(self.slugs('/api/trending/?limit=100')), 2)
+
+    def test_category_leaderboard(self):
+        self.assertEqual(self.slugs('/api/trending/?category=politics'), ['story-3', 'story-1'])
+
+    def test_unpublished_articles_leave_the_leaderboard(self):
+        article = Article.objects.get(slug='story-4')
+        article.status = 'draft'
+        article.save()
+        self.assertEqual(self.slugs('/api/trending/?limit=2'), ['story-3', 'story-2'])
+
+    def test_read_walks_the_rank_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/trending/?limit=3')
+        sql = next(query['sql'] for query in queries.captured_queries if 'news_trendingscore' in query['sql'])
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                self.skipTest('Plan shape is only asserted on SQLite')
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING INDEX trending_rank_idx', plan)
+        self.assertNotIn('SCAN news_article', plan)
+
+
+# Budgets assume production's buffered view counting; flushed by the test itself, never from a thread
+@override_settings(VIEW_COUNTER={'ENABLED': True, 'BACKGROUND': False, 'FLUSH_INTERVAL': 3600, 'MAX_PENDING': 10000})
+class EndpointBudgetTests(TestCase):
+    """Every route in api.urls has a benchmark plan and stays within its SQL query budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_corpus(articles=60, categories=3, authors=4, tags=8, paragraphs=2)
+        cls.sample = Article.objects.filter(status='published', tagged_items__isnull=False).select_related('category').first()
+
+    def tearDown(self):
+        flush_views()
+
+    def test_every_route_has_a_plan(self):
+        self.assertEqual(sorted(route_names()), sorted(ENDPOINTS))
+
+    def test_query_budgets(self):
+        for name, method, path, budget in endpoint_requests(self.sample):
+            for cold in (True, False):
+                with self.subTest(path=path, method=method, cold=cold):
+                    status, queries = count_queries(self.client, method, path, name, cold=cold)
+                    self.assertLess(status, 400)
+                    self.assertLessEqual(queries, budget)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        author, category = create_author_and_category('Politics')
+        Article.objects.create(title='Story', excerpt='', content='', status='published',
+                               author=author, category=category)
+        self.staff = get_user_model().objects.create_user('editor', password='secret', is_staff=True)
+
+    def sample(self, text, name, **labels):
+        selector = ','.join(f'{key}="{value}"' for key, value in labels.items())
+        match = re.search(rf'^{name}\{{{re.escape(selector)}\}} (\S+)$', text, re.M)
+        return float(match.group(1)) if match else 0.0
+
+    def scrape(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/metrics')
+        self.client.logout()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+        user = get_user_model().objects.create_user('reader', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+    def test_records_latency_sql_serializer_time_and_bytes_per_action(self):
+        labels = {'view': 'article-list', 'action': 'list', 'method': 'GET', 'status': '200'}
+        before = self.scrape()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/articles/')
+        executed = len(queries)
+        after = self.scrape()
+
+        delta = lambda name: self.sample(after, name, **labels) - self.sample(before, name, **labels)
+        self.assertEqual(delta('http_request_duration_seconds_count'), 1)
+        self.assertEqual(delta('db_queries_total'), executed)
+        self.assertGreater(delta('db_query_duration_seconds_total'), 0)
+        self.assertGreater(delta('serializer_duration_seconds_total'), 0)
+        self.assertEqual(delta('http_response_bytes_total'), len(response.content))
+        self.assertEqual(
+            self.sample(after, 'http_request_duration_seconds_bucket', **labels, le='+Inf'),
+            self.sample(after, 'http_request_duration_seconds_count', **labels),
+        )
+
+        self.client.get('/api/trending/')
+        self.assertIn('view="trending",action="trending",method="GET",status="200"', self.scrape())
+
+    def test_merges_snapshots_of_other_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            labels = ('article-list', 'list', 'GET', '200')
+            worker = MetricsRegistry([0.1, 1.0], directory=directory)
+            stats = RequestStats()
+            stats.queries = 3
+            worker.observe(labels, 0.05, stats, 100)
+            self.assertTrue(worker.flush())
+            # Pretend the snapshot came from another worker
+            os.replace(Path(directory) / f'{os.getpid()}.json', Path(directory) / '1.json')
+
+            registry = MetricsRegistry([0.1, 1.0], directory=directory)
+            registry.observe(labels, 0.5, stats, 50)
+            merged = registry.collect()[labels]
+            self.assertEqual(merged['buckets'], [1, 1])
+            self.assertEqual((merged['count'], merged['queries'], merged['response_bytes']), (2, 6, 150))
+
+            (Path(directory) / '2.json').write_text(json.dumps({'buckets': [1.0], 'series': []}))
+            self.assertEqual(registry.collect()[labels]['count'], 2)
+
+    def test_idle_worker_snapshot_is_flushed_on_a_timer(self):
+        import time
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / f'{os.getpid()}.json'
+            registry = MetricsRegistry([0.1, 1.0], directory=directory, flush_interval=0.05, background=True)
+            registry.observe(('article-list', 'list', 'GET', '200'), 0.05, RequestStats(), 100)
+            deadline = time.monotonic() + 5
+            while not path.exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(json.loads(path.read_text())['series'][0]['count'], 1)
+            # Nothing new since: the flusher leaves the snapshot alone
+            path.unlink()
+            time.sleep(0.2)
+            self.assertFalse(path.exists())
+
+
+class TagEndpointTests(TestCase):
+    def setUp(self):
+        author, category = create_author_and_category('Politics')
+        self.articles = [
+            Article.objects.create(
+                title=f'Story {index}', excerpt='', content='', status='draft' if index == 3 else 'published',
+                author=author, category=category, published_date=timezone.now() - timezone.timedelta(hours=index),
+            )
+            for index in range(4)
+        ]
+        for article in self.articles:
+            article.tags.add('election')
+        self.articles[0].tags.add('economy')
+
+    def slugs(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [item['slug'] for item in response.json()['results']]
+
+    def test_tag_list_counts_published_articles(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(
+            [(tag['slug'], tag['article_count']) for tag in response.json()['results']],
+            [('election', 3), ('economy', 1)],
+        )
+        self.assertEqual(self.client.get('/api/tags/economy/').json()['article_count'], 1)
+
+    def test_tag_feeds(self):
+        self.assertEqual(self.slugs('/api/tags/election/articles/'), ['story-0', 'story-1', 'story-2'])
+        self.assertEqual(self.slugs('/api/articles/?tag=economy'), ['story-0'])
+        self.assertEqual(self.slugs('/api/articles/?tag=missing'), [])
+
+    def test_tag_list_etag_follows_counts(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        self.assertEqual(self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.articles[1].tags.add('economy')
+        self.assertEqual(self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_feed_skips_the_generic_tag_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/articles/?tag=election')
+        self.assertFalse([query for query in queries.captured_queries if 'taggit_taggeditem' in query['sql']])
+
+
+class RelatedEndpointTests(TestCase):
+    def setUp(self):
+        author, category = create_author_and_category('World')
+        self.articles = {
+            title: Article.objects.create(title=title, excerpt='', content=content, status='published',
+                                          author=author, category=category)
+            for title, content in [
+                ('Volcano erupts', '<p>Lava and ash from the volcano.</p>'),
+                ('Volcano ash cloud', '<p>Ash from the volcano grounds flights.</p>'),
+                ('Lava reaches the sea', '<p>Lava flows on.</p>'),
+                ('Budget vote', '<p>Taxes rise.</p>'),
+            ]
+        }
+        related.rebuild()
+
+    def test_related_lists_neighbours_in_rank_order(self):
+        response = self.client.get('/api/articles/volcano-erupts/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['slug'] for item in response.json()], ['volcano-ash-cloud', 'lava-reaches-the-sea'])
+        self.assertEqual(self.client.get('/api/articles/budget-vote/related/').json(), [])
+
+    def test_unknown_or_unpublished_article_is_404(self):
+        Article.objects.filter(slug='budget-vote').update(status='draft')
+        for slug in ('no-such-article', 'budget-vote'):
+            self.assertEqual(self.client.get(f'/api/articles/{slug}/related/').status_code, 404)
+
+    def test_unpublished_neighbours_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.get(slug='volcano-ash-cloud').delete()
+        response = self.client.get('/api/articles/volcano-erupts/related/')
+        self.assertEqual([item['slug'] for item in response.json()], ['lava-reaches-the-sea'])
+
+
+class HomepageSectionsTests(TransactionTestCase):
+    """Concurrent sections use their own connections, so the data must be committed"""
+
+    def setUp(self):
+        author = create_author()
+        for name in ('Politics', 'Sports'):
+            category = Category.objects.create(name=name)
+            for index in range(2):
+                Article.objects.create(
+                    title=f'{name} story {index}', excerpt='', content='<p>Body</p>', status='published',
+                    author=author, category=category, is_featured=index == 0, is_breaking=index == 1,
+                )
+
+    def test_concurrent_sections_match_sequential_output(self):
+        with override_settings(HOMEPAGE={'CONCURRENCY': 1}):
+            sequential = self.client.get('/api/homepage/')
+        with override_settings(HOMEPAGE={'CONCURRENCY': 4, 'SECTION_TIMEOUT': 10}):
+            concurrent = self.client.get('/api/homepage/')
+        self.assertEqual(concurrent.json(), sequential.json())
+        self.assertEqual(list(concurrent.json()['category_articles']), ['politics', 'sports'])
+        self.assertEqual(concurrent['ETag'], sequential['ETag'])
+        self.assertNotIn('X-Degraded-Sections', concurrent)
+
+    def test_timed_out_sections_degrade(self):
+        with override_settings(HOMEPAGE={'CONCURRENCY': 4, 'SECTION_TIMEOUT': 0}), self.assertLogs('api.homepage'):
+            response = self.client.get('/api/homepage/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'featured_articles': [], 'breaking_news': [], 'category_articles': {}})
+        self.assertEqual(response['X-Degraded-Sections'], 'featured_articles,breaking_news,categories')
+        self.assertNotIn('ETag', response)
+
+    def test_failing_section_is_replaced_by_its_default(self):
+        def broken():
+            raise RuntimeError('database unavailable')
+
+        for concurrency in (2, 1):
+            with self.subTest(concurrency=concurrency):
+                degraded = []
+                with self.assertLogs('api.homepage', 'ERROR'):
+                    results = run_sections([('ok', lambda: [1], []), ('broken', broken, [])], degraded,
+                                           {'CONCURRENCY': concurrency, 'SECTION_TIMEOUT': 10})
+                self.assertEqual((results, degraded), ({'ok': [1], 'broken': []}, ['broken']))
+
+    def test_failing_query_in_a_transaction_degrades_only_its_section(self):
+        from django.db import transaction
+
+        def broken():
+            return list(Article.objects.raw('SELECT * FROM missing_table'))
+
+        degraded = []
+        with transaction.atomic(), self.assertLogs('api.homepage', 'ERROR'):
+            results = run_sections([('broken', broken, []), ('ok', lambda: Article.objects.count(), 0)], degraded)
+            self.assertEqual(Article.objects.count(), 4)
+        self.assertEqual((results, degraded), ({'broken': [], 'ok': 4}, ['broken']))
+
+
+class StartupTests(TestCase):
+    def test_sentry_is_not_initialised_without_dsn(self):
+        from central_report import integrations
+
+        with override_settings(SENTRY={'DSN': ''}):
+            self.assertFalse(integrations.init_sentry())
+
+    def test_settings_do_not_import_third_party_services(self):
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        code = ('import sys; from central_report import settings; '
+                'print(",".join(name for name in ("sentry_sdk", "cloudinary") if name in sys.modules))')
+        env = dict(os.environ, GLITCHTIP_DSN='')
+        output = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+    def test_news_app_does_not_import_api_or_test_tools(self):
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        code = ('import sys, django; django.setup(); '
+                'print(",".join(name for name in ("api.snapshots", "api.syndication", "django.test") '
+                'if name in sys.modules))')
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='central_report.settings', GLITCHTIP_DSN='')
+        output = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+    def test_preloaded_gunicorn_workers_share_the_metrics_directory(self):
+        import socket
+        import subprocess
+        import sys
+        import time
+        import urllib.request
+        from django.conf import settings
+
+        with tempfile.TemporaryDirectory() as directory:
+            with socket.socket() as probe:
+                probe.bind(('127.0.0.1', 0))
+                port = probe.getsockname()[1]
+            env = {key: value for key, value in os.environ.items() if key != 'METRICS_DIR'}
+            env.update(
+                DJANGO_BOOTSTRAP='1', TMPDIR=directory, GLITCHTIP_DSN='', METRICS_FLUSH_INTERVAL='0.1',
+                DATABASE_URL=f'sqlite:///{directory}/db.sqlite3',
+            )
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', 'central_report.wsgi:application',
+                 '--bind', f'127.0.0.1:{port}', '--workers', '2'],
+                cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                snapshots = []
+                deadline = time.monotonic() + 60
+                while not snapshots and time.monotonic() < deadline:
+                    try:
+                        urllib.request.urlopen(f'http://127.0.0.1:{port}/api/categories/', timeout=5).read()
+                    except OSError:
+                        pass
+                    time.sleep(0.2)
+                    snapshots = list(Path(directory).glob('central-report-metrics-*/*.json'))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            self.assertTrue(snapshots)
+            self.assertEqual(len({path.parent for path in snapshots}), 1)
+
+    def test_log_file_is_created_on_first_record(self):
+        import logging
+        from central_report.log_handlers import LazyFileHandler
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'logs' / 'django.log'
+            handler = LazyFileHandler(path)
+            self.assertFalse(path.parent.exists())
+            handler.emit(logging.makeLogRecord({'msg': 'hello'}))
+            handler.close()
+            self.assertEqual(path.read_text().strip(), 'hello')
+
+    def test_bootstrap_creates_one_superuser(self):
+        from io import StringIO
+        from central_report.bootstrap import ensure_superuser
+
+        self.assertTrue(ensure_superuser(StringIO()))
+        self.assertFalse(ensure_superuser(StringIO()))
+        self.assertEqual(get_user_model().objects.filter(is_superuser=True).count(), 1)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = Path(self.directory.name)
+        self.config = {'ENABLED': True, 'DIRECTORY': self.directory.name, 'FEED_PAGES': 2, 'BASE_URL': ''}
+        self.author, self.world = create_author_and_category('World')
+        self.sports = Category.objects.create(name='Sports')
+        for index in range(25):
+            Article.objects.create(title=f'World story {index}', excerpt='', content='<p>Body</p>',
+                                   status='published', author=self.author, category=self.world)
+        self.draft = Article.objects.create(title='Sports draft', excerpt='', content='<p>Body</p>',
+                                            status='draft', author=self.author, category=self.sports)
+
+    def read(self, path):
+        return json.loads((self.root / path / 'index.json').read_text())
+
+    def test_site_export_matches_live_responses(self):
+        from . import snapshots
+
+        snapshots.export_site(self.config)
+        detail = self.read('api/articles/world-story-3')
+        self.assertEqual(detail, self.client.get('/api/articles/world-story-3/').json() | {
+            'views_count': detail['views_count']
+        })
+        self.assertEqual(self.read('api/homepage'), self.client.get('/api/homepage/').json())
+        self.assertTrue((self.root / 'api/articles/world-story-3/index.json.gz').exists())
+        self.assertFalse((self.root / 'api/articles/sports-draft').exists())
+
+        feed = self.read('api/articles')
+        self.assertEqual((feed['count'], feed['next'], feed['previous']), (25, '/api/articles/page/2/', None))
+        self.assertEqual(self.read('api/articles/page/2')['previous'], '/api/articles/')
+        self.assertEqual(len(self.read('api/categories/world/articles/page/2')['results']), 5)
+
+    def test_saves_re_export_only_affected_files(self):
+        from . import snapshots
+
+        snapshots.export_site(self.config)
+        untouched = self.root / 'api/articles/world-story-3/index.json'
+        mtime = untouched.stat().st_mtime_ns
+
+        with override_settings(STATIC_SNAPSHOT=self.config):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.draft.status = 'published'
+                self.draft.save()
+        self.assertEqual(self.read('api/articles/sports-draft')['title'], 'Sports draft')
+        self.assertEqual(self.read('api/categories/sports/articles')['count'], 1)
+        self.assertEqual(self.read('api/articles')['results'][0]['slug'], 'sports-draft')
+        self.assertEqual(untouched.stat().st_mtime_ns, mtime)
+
+        with override_settings(STATIC_SNAPSHOT=self.config):
+            with self.captureOnCommitCallbacks(execute=True):
+                publishing.unpublish(Article.objects.filter(category=self.sports))
+        self.assertFalse((self.root / 'api/articles/sports-draft').exists())
+        self.assertEqual(self.read('api/categories/sports/articles')['count'], 0)
+
+    def test_disabled_snapshot_is_not_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.status = 'published'
+            self.draft.save()
+        self.assertFalse(any(self.root.iterdir()))
+
+
+class SyndicationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.category = create_author_and_category('World')
+        for title, published in [('March story', '2025-03-10'), ('April story', '2025-04-02')]:
+            Article.objects.create(
+                title=title, excerpt='Excerpt & more', content='<p>Body</p>', status='published',
+                author=self.author, category=self.category,
+                published_date=timezone.make_aware(timezone.datetime.fromisoformat(published)),
+            )
+        Article.objects.create(title='Draft story', excerpt='', content='<p>Body</p>', status='draft',
+                               author=self.author, category=self.category)
+
+    def test_sitemap_index_lists_monthly_partitions(self):
+        index = self.client.get('/api/sitemap.xml').content.decode()
+        self.assertIn('/sitemaps/pages.xml', index)
+        self.assertIn('/sitemaps/2025-03.xml', index)
+        self.assertIn('/sitemaps/2025-04.xml', index)
+
+        march = self.client.get('/api/sitemaps/2025-03.xml').content.decode()
+        self.assertIn('/article/march-story</loc>', march)
+        self.assertNotIn('april-story', march)
+        self.assertIn('/category/world</loc>', self.client.get('/api/sitemaps/pages.xml').content.decode())
+        for partition in ('2025-13', '2025-00', '0000-01', '9999-12'):
+            self.assertEqual(self.client.get(f'/api/sitemaps/{partition}.xml').status_code, 404, partition)
+
+    def test_partitions_are_cached_and_revalidated(self):
+        response = self.client.get('/api/sitemaps/2025-03.xml')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/sitemaps/2025-03.xml').content, response.content)
+            self.assertEqual(len(queries), 0)
+        revalidated = self.client.get('/api/sitemaps/2025-03.xml', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_publish_invalidates_only_touched_partitions(self):
+        for path in ('/api/sitemap.xml', '/api/sitemaps/2025-03.xml', '/api/sitemaps/2025-04.xml'):
+            self.client.get(path)
+        with self.captureOnCommitCallbacks(execute=True):
+            article = Article.objects.get(slug='april-story')
+            article.title = 'April story, updated'
+            article.save()
+        self.assertIsNotNone(cache.get(syndication.KEY_PREFIX + 'sitemap:2025-03'))
+        self.assertIsNone(cache.get(syndication.KEY_PREFIX + 'sitemap:2025-04'))
+        self.assertIsNone(cache.get(syndication.KEY_PREFIX + 'sitemap:index'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publishing.publish(Article.objects.filter(slug='draft-story'))
+        month = syndication.month_of(Article.objects.get(slug='draft-story').published_date)
+        self.assertIn(f'/sitemaps/{month}.xml', self.client.get('/api/sitemap.xml').content.decode())
+
+    def test_feeds(self):
+        rss = self.client.get('/api/feeds/rss.xml', HTTP_ACCEPT='application/rss+xml')
+        self.assertEqual(rss.status_code, 200)
+        self.assertEqual(rss['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertIn('<title>April story</title>', rss.content.decode())
+        self.assertIn('Excerpt &amp; more', rss.content.decode())
+        self.assertNotIn('Draft story', rss.content.decode())
+
+        atom = self.client.get('/api/feeds/category/world/atom.xml').content.decode()
+        self.assertIn('<title>World - The Central Report</title>', atom)
+        self.assertIn('march-story', atom)
+        self.assertIn('april-story', self.client.get(f'/api/feeds/author/{self.author.pk}/rss.xml').content.decode())
+        self.assertEqual(self.client.get('/api/feeds/category/missing/rss.xml').status_code, 404)
+
+
+class SubscriberTransferTests(TestCase):
+    url = '/api/newsletter/subscribers.csv'
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user('editor', password='secret', is_staff=True)
+        Newsletter.objects.create(email='gone@example.com', is_active=False, unsubscribed_at=timezone.now())
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.post(self.url, 'a@example.com', content_type='text/csv').status_code, 403)
+
+    def test_import_body_and_upload(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(self.url, 'email\nnew@example.com\ngone@example.com\nbroken\n',
+                                    content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['reactivated'], 1)
+        self.assertEqual(response.json()['invalid'], 1)
+
+        upload = SimpleUploadedFile('list.ndjson', b'{"email": "upload@example.com"}\n')
+        response = self.client.post('/api/newsletter/subscribers.ndjson', {'file': upload})
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(Newsletter.objects.filter(is_active=True).count(), 3)
+        self.assertEqual(self.client.post(self.url, '', content_type='text/csv').status_code, 400)
+
+    def test_export_streams(self):
+        self.client.force_login(self.staff)
+        Newsletter.objects.create(email='active@example.com')
+        response = self.client.get(self.url + '?active=true', HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('active@example.com,true,'))
+
+
+class PublicFormTests(TestCase):
+    """Newsletter and contact forms are posted by anonymous readers"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_reader_can_subscribe_and_send_a_message(self):
+        response = self.client.post('/api/newsletter/', {'email': 'reader@example.com'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Newsletter.objects.filter(email='reader@example.com').exists())
+        response = self.client.post('/api/contact/', {
+            'first_name': 'Ada', 'last_name': 'Reader', 'email': 'reader@example.com',
+            'subject': 'story-tip', 'message': 'A question about a story',
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def test_forms_stay_write_only(self):
+        for path in ('/api/newsletter/', '/api/contact/'):
+            self.assertEqual(self.client.get(path).status_code, 405, path)
+
+
+class BrokenCache(LocMemCache):
+    def get(self, *args, **kwargs):
+        raise ConnectionError('cache is down')
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttling._local.clear()
+        self.addCleanup(setattr, throttling, '_fallback_until', 0.0)
+
+    def subscribe(self, email, ip='10.0.0.1'):
+        return self.client.post('/api/newsletter/', {'email': email}, REMOTE_ADDR=ip)
+
+    def test_token_bucket_refills(self):
+        config = dict(throttling.get_config(), RATES={'contact.ip': ('1/min', 2)})
+        self.assertEqual([throttling.take('contact.ip', 'a', config, now=0) for _ in range(3)], [0, 0, 60])
+        self.assertEqual(throttling.take('contact.ip', 'b', config, now=0), 0)
+        self.assertEqual(throttling.take('contact.ip', 'a', config, now=30), 30)
+        self.assertEqual(throttling.take('contact.ip', 'a', config, now=60), 0)
+
+    @override_settings(THROTTLING={'RATES': {'newsletter.ip': ('1/hour', 2), 'writes': ('1/hour', 4)}})
+    def test_per_ip_limit_does_not_drain_shared_bucket(self):
+        statuses = [self.subscribe(f'reader{n}@example.com').status_code for n in range(5)]
+        self.assertEqual(statuses, [201, 201, 429, 429, 429])
+        response = self.subscribe('other@example.com', ip='10.0.0.2')
+        self.assertEqual(response.status_code, 201)
+        # The three throttled requests took nothing from the four shared tokens
+        self.assertEqual(self.subscribe('third@example.com', ip='10.0.0.3').status_code, 201)
+        response = self.subscribe('fourth@example.com', ip='10.0.0.4')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+
+    @override_settings(THROTTLING={'RATES': {'newsletter.email': ('1/hour', 1)}})
+    def test_per_email_limit_across_ips(self):
+        self.assertEqual(self.subscribe('target@example.com').status_code, 201)
+        self.assertEqual(self.subscribe(' Target@Example.com', ip='10.0.0.9').status_code, 429)
+
+    def slots_taken(self, slots):
+        return sum(cache.get(f'{throttling.SLOT_KEY}{index}') is not None for index in range(slots))
+
+    @override_settings(THROTTLING={'MAX_CONCURRENT_WRITES': 2})
+    def test_sheds_load_over_concurrency_cap(self):
+        config = throttling.get_config()
+        first = throttling.acquire_write_slot(config)
+        self.assertIsNotNone(throttling.acquire_write_slot(config))
+        response = self.client.post('/api/contact/', {'email': 'x@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        throttling.release_write_slot(first, config)
+        # An invalid form still gives its slot back
+        self.assertEqual(self.client.post('/api/contact/', {'email': 'x@example.com'}).status_code, 400)
+        self.assertEqual(self.slots_taken(2), 1)
+
+    @override_settings(THROTTLING={
+        'MAX_CONCURRENT_WRITES': 2, 'SLOT_TIMEOUT': 1,
+        'RATES': {'contact.ip': ('100/second', 100), 'contact.email': ('100/second', 100)},
+    })
+    def test_leaked_slot_expires_under_steady_traffic(self):
+        import time
+
+        config = throttling.get_config()
+        throttling.acquire_write_slot(config)  # a worker killed before releasing it
+        started = time.monotonic()
+        # Writes keep using the other slot; they must not keep the leaked one alive
+        while time.monotonic() - started < 1.2:
+            self.assertEqual(self.client.post('/api/contact/', {'email': 'x@example.com'}).status_code, 400)
+            time.sleep(0.1)
+        self.assertEqual(self.slots_taken(2), 0)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'broken': {'BACKEND': 'api.tests.BrokenCache'}},
+        THROTTLING={'CACHE': 'broken', 'RATES': {'newsletter.ip': ('1/hour', 1)}},
+    )
+    def test_falls_back_to_per_process_limits(self):
+        with self.assertLogs('api.throttling', 'WARNING'):
+            self.assertEqual(self.subscribe('one@example.com').status_code, 201)
+        self.assertEqual(self.subscribe('two@example.com').status_code, 429)
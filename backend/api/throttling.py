@@ -0,0 +1,218 @@
+"""
+Throttling and load shedding for the public write endpoints.
+
+Newsletter sign-ups and contact messages need no login, so every
+request is an INSERT a bot can repeat. Three token buckets guard them,
+as DRF throttle classes on the views:
+
+- ``<scope>.ip``: per client address (DRF's ``get_ident``, so set
+  ``NUM_PROXIES`` when behind a proxy)
+- ``<scope>.email``: per submitted address, however many IPs it comes from
+- ``writes``: all public writes of all workers together
+
+Each bucket holds ``burst`` tokens and refills at ``rate``. It is kept
+as a single "theoretical arrival time" (GCRA), so checking one costs a
+cache get and a set. On top, WriteLoadSheddingMixin caps the writes in
+flight across workers at ``MAX_CONCURRENT_WRITES``: a write claims one
+of that many slot keys with ``add()`` and deletes it when done. Each
+slot expires on its own after ``SLOT_TIMEOUT``, so a slot held by a
+worker that was killed mid-request comes back however busy the other
+slots are. All of them answer 429 with a Retry-After header.
+
+State lives in the ``CACHE`` alias so every gunicorn worker shares it.
+Two workers updating one bucket at the same moment can both take its
+last token, which only lets the odd extra request through. When that
+cache is a DummyCache, or raises (e.g. Redis is down), a per-process
+LocMemCache is used instead, so limits still hold per worker.
+"""
+import hashlib
+import logging
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    # Bucket: (rate, burst)
+    'RATES': {
+        'newsletter.ip': ('20/hour', 5),
+        'newsletter.email': ('3/hour', 2),
+        'contact.ip': ('10/hour', 3),
+        'contact.email': ('5/hour', 2),
+        'writes': ('50/second', 100),
+    },
+    'MAX_CONCURRENT_WRITES': 8,
+    # Retry-After of a request shed for the concurrency cap
+    'RETRY_AFTER': 1,
+    # Seconds a worker that died mid-request can hold a write slot
+    'SLOT_TIMEOUT': 60,
+    # Seconds to use the per-process fallback after the shared cache failed
+    'FALLBACK_SECONDS': 30,
+}
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+KEY_PREFIX = 'throttle:'
+SLOT_KEY = KEY_PREFIX + 'slot:'
+
+_local = LocMemCache('api-throttling', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+_fallback_until = 0.0
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'THROTTLING', {}))
+    config['RATES'] = dict(DEFAULTS['RATES'], **config['RATES'])
+    return config
+
+
+def parse_rate(rate):
+    """Seconds per token of a DRF-style rate such as ``'20/hour'``"""
+    count, _, period = rate.partition('/')
+    return PERIODS[period[0]] / int(count)
+
+
+def _store(config):
+    shared = caches[config['CACHE']]
+    if isinstance(shared, DummyCache) or time.monotonic() < _fallback_until:
+        return _local
+    return shared
+
+
+def _call(config, method, *args, **kwargs):
+    """Run a cache operation on the shared cache, falling back to the per-process one if it fails"""
+    global _fallback_until
+    store = _store(config)
+    try:
+        return getattr(store, method)(*args, **kwargs)
+    except ValueError:
+        raise
+    except Exception:
+        if store is _local:
+            raise
+        logger.warning('Throttling cache unavailable; using per-process limits for %ss',
+                       config['FALLBACK_SECONDS'], exc_info=True)
+        _fallback_until = time.monotonic() + config['FALLBACK_SECONDS']
+        return getattr(_local, method)(*args, **kwargs)
+
+
+def take(bucket, key, config=None, now=None):
+    """Take a token from ``bucket`` for ``key``; returns 0 when allowed, else the seconds to wait"""
+    config = config or get_config()
+    rate, burst = config['RATES'][bucket]
+    interval = parse_rate(rate)
+    now = time.time() if now is None else now
+    cache_key = f'{KEY_PREFIX}{bucket}:{key}'
+    arrival = max(_call(config, 'get', cache_key) or now, now) + interval
+    wait = arrival - burst * interval - now
+    if wait > 0:
+        return wait
+    _call(config, 'set', cache_key, arrival, timeout=int(arrival - now) + 1)
+    return 0
+
+
+def acquire_write_slot(config=None):
+    """Claim a free write slot; returns it for release_write_slot(), or None when all are taken"""
+    config = config or get_config()
+    slots = config['MAX_CONCURRENT_WRITES']
+    token = uuid.uuid4().hex
+    # Start at a random slot so concurrent writers rarely try the same keys in turn
+    start = random.randrange(slots)
+    for offset in range(slots):
+        key = f'{SLOT_KEY}{(start + offset) % slots}'
+        if _call(config, 'add', key, token, timeout=config['SLOT_TIMEOUT']):
+            return key, token
+    return None
+
+
+def release_write_slot(slot, config=None):
+    """Free ``slot``, unless it expired and another write has claimed it since"""
+    config = config or get_config()
+    key, token = slot
+    if _call(config, 'get', key) == token:
+        _call(config, 'delete', key)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class: subclasses name a ``bucket`` (relative to the view's ``throttle_scope``) and a key"""
+    bucket = None
+
+    def get_bucket(self, view):
+        return f'{view.throttle_scope}.{self.bucket}' if getattr(view, 'throttle_scope', None) else self.bucket
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        config = get_config()
+        if not config['ENABLED'] or request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        self.delay = take(self.get_bucket(view), key, config)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class ClientIPThrottle(TokenBucketThrottle):
+    bucket = 'ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailThrottle(TokenBucketThrottle):
+    bucket = 'email'
+
+    def get_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None  # the serializer rejects it
+        return hashlib.md5(email.strip().lower().encode()).hexdigest()
+
+
+class WriteRateThrottle(TokenBucketThrottle):
+    """The ``writes`` bucket, shared by every public write endpoint"""
+
+    def get_bucket(self, view):
+        return 'writes'
+
+    def get_key(self, request, view):
+        return 'all'
+
+
+class WriteLoadSheddingMixin:
+    """Views whose writes count towards MAX_CONCURRENT_WRITES; a full house answers 429"""
+    throttle_classes = [ClientIPThrottle, EmailThrottle, WriteRateThrottle]
+    write_slot = None
+
+    def check_throttles(self, request):
+        # Stop at the first empty bucket: a throttled client must not drain the shared ones
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        config = get_config()
+        if config['ENABLED'] and request.method == 'POST':
+            self.write_slot = acquire_write_slot(config)
+            if self.write_slot is None:
+                raise Throttled(wait=config['RETRY_AFTER'])
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.write_slot is not None:
+            slot, self.write_slot = self.write_slot, None
+            release_write_slot(slot)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,18 +1,25 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    CategoryViewSet, AuthorViewSet, ArticleViewSet, 
-    NewsletterViewSet, ContactViewSet, SearchAPIView, HomepageAPIView
+    CategoryViewSet, AuthorViewSet, ArticleViewSet, TagViewSet,
+    NewsletterViewSet, ContactViewSet, SearchAPIView, HomepageAPIView, MetricsAPIView,
+    SitemapIndexView, SitemapView, FeedView, SubscriberTransferView,
+    UnsubscribeView
 )
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
 router.register(r'authors', AuthorViewSet)
 router.register(r'articles', ArticleViewSet)
+router.register(r'tags', TagViewSet)
 router.register(r'newsletter', NewsletterViewSet)
 router.register(r'contact', ContactViewSet)
 
 urlpatterns = [
+    # Before the router, whose newsletter/<pk>.<format> route would match these paths
+    re_path(r'^newsletter/subscribers\.(?P<file_format>csv|ndjson)$', SubscriberTransferView.as_view(),
+            name='newsletter-subscribers'),
+    path('newsletter/unsubscribe/', UnsubscribeView.as_view(), name='newsletter-unsubscribe'),
     path('', include(router.urls)),
     path('search/', SearchAPIView.as_view(), name='search'),
     path('homepage/', HomepageAPIView.as_view(), name='homepage'),
@@ -20,4 +27,11 @@ urlpatterns = [
     path('breaking/', ArticleViewSet.as_view({'get': 'breaking'}), name='breaking'),
     path('featured/', ArticleViewSet.as_view({'get': 'featured'}), name='featured'),
     path('latest/', ArticleViewSet.as_view({'get': 'latest'}), name='latest'),
+    path('metrics', MetricsAPIView.as_view(), name='metrics'),
+    path('sitemap.xml', SitemapIndexView.as_view(), name='sitemap'),
+    re_path(r'^sitemaps/(?P<partition>pages|\d{4}-\d{2})\.xml$', SitemapView.as_view(), name='sitemap-partition'),
+    re_path(r'^feeds/(?P<feed_format>rss|atom)\.xml$', FeedView.as_view(), name='feed'),
+    re_path(r'^feeds/category/(?P<slug>[-\w]+)/(?P<feed_format>rss|atom)\.xml$', FeedView.as_view(),
+            name='category-feed'),
+    re_path(r'^feeds/author/(?P<pk>\d+)/(?P<feed_format>rss|atom)\.xml$', FeedView.as_view(), name='author-feed'),
 ] 
\ No newline at end of file
@@ -1,23 +1,80 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count
-from django.utils import timezone
-from datetime import timedelta
+from django.db.models import F
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import get_conditional_response
+from django.views import View
+from datetime import MAXYEAR, MINYEAR
+from functools import partial
+import codecs
 
 from news.models import Category, Author, Article, Newsletter, Contact
+from taggit.models import Tag
+from news.view_counter import record_view
+from news.search import search_articles
+from news import related, subscribers, trending
 from .serializers import (
     CategorySerializer, AuthorSerializer, ArticleListSerializer, 
     ArticleDetailSerializer, NewsletterSerializer, ContactSerializer,
-    ArticleSearchSerializer
+    ArticleSearchSerializer, TagSerializer
 )
 from .permissions import IsAdminOrReadOnly
-from .pagination import CustomPagination
+from .pagination import CustomPagination, ArticlePagination
+from .filters import ArticleFilter, ArticleSearchFilter, ArticleOrderingFilter
+from .fieldsets import narrow_queryset
+from .fast_serializers import FastSerializer, fast_serialization_enabled
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, get_registry
+from .conditional import ARTICLE_TIMESTAMPS, ConditionalGetMixin, ConditionalListRetrieveMixin
+from .homepage import run_sections
+from .throttling import WriteLoadSheddingMixin
+from . import syndication
 
+# Columns article views read themselves, whatever fieldset was requested
+ARTICLE_VIEW_FIELDS = ('published_date', 'views_count')
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+
+class ArticleListingMixin(ConditionalGetMixin):
+    """Render article lists through the values()-based fast path when it is enabled"""
+
+    def listing_response(self, queryset, serializer_class=None, context=None, limit=None, conditional=True):
+        """
+        Serialize an article list, answering conditional GETs from ``queryset`` first.
+
+        Pass ``conditional=False`` for lists whose order depends on more than
+        the validators cover (e.g. view counts).
+        """
+        serializer_class = serializer_class or self.get_serializer_class()
+        context = context if context is not None else self.get_serializer_context()
+
+        def render():
+            rows = queryset
+            if fast_serialization_enabled():
+                fast = FastSerializer(serializer_class, context)
+                rows = fast.prepare(rows, always=ArticlePagination.keyset_fields)
+                serialize = fast.serialize
+            else:
+                def serialize(rows):
+                    return serializer_class(rows, many=True, context=context).data
+
+            if limit is not None:
+                return Response(serialize(rows[:limit]))
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(serialize(page))
+            return Response(serialize(rows))
+
+        if not conditional:
+            return render()
+        return self.conditional_response([(queryset, ARTICLE_TIMESTAMPS)], render)
+
+
+class CategoryViewSet(ArticleListingMixin, ConditionalListRetrieveMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -28,25 +85,23 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
+
+    def get_queryset(self):
+        return narrow_queryset(super().get_queryset(), self.get_serializer_class(), self.get_serializer_context())
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], pagination_class=ArticlePagination)
     def articles(self, request, slug=None):
         category = self.get_object()
         articles = Article.objects.filter(
             category=category, 
             status='published'
-        ).select_related('author', 'category').prefetch_related('tags')
-        
-        page = self.paginate_queryset(articles)
-        if page is not None:
-            serializer = ArticleListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = ArticleListSerializer(articles, many=True)
-        return Response(serializer.data)
+        ).select_related('author', 'category').prefetch_related('tags').for_listing()
+        context = self.get_serializer_context()
+        articles = narrow_queryset(articles, ArticleListSerializer, context, always=ARTICLE_VIEW_FIELDS)
+        return self.listing_response(articles, ArticleListSerializer, context)
 
 
-class AuthorViewSet(viewsets.ReadOnlyModelViewSet):
+class AuthorViewSet(ArticleListingMixin, ConditionalListRetrieveMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Author.objects.filter(is_active=True)
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -56,32 +111,61 @@ class AuthorViewSet(viewsets.ReadOnlyModelViewSet):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
+
+    def get_queryset(self):
+        return narrow_queryset(super().get_queryset(), self.get_serializer_class(), self.get_serializer_context())
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], pagination_class=ArticlePagination)
     def articles(self, request, pk=None):
         author = self.get_object()
         articles = Article.objects.filter(
             author=author, 
             status='published'
-        ).select_related('author', 'category').prefetch_related('tags')
-        
-        page = self.paginate_queryset(articles)
-        if page is not None:
-            serializer = ArticleListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = ArticleListSerializer(articles, many=True)
-        return Response(serializer.data)
+        ).select_related('author', 'category').prefetch_related('tags').for_listing()
+        context = self.get_serializer_context()
+        articles = narrow_queryset(articles, ArticleListSerializer, context, always=ARTICLE_VIEW_FIELDS)
+        return self.listing_response(articles, ArticleListSerializer, context)
+
 
+class TagViewSet(ArticleListingMixin, ConditionalListRetrieveMixin, viewsets.ReadOnlyModelViewSet):
+    # Tags with published articles, most used first; counts come from TagStats
+    queryset = Tag.objects.filter(stats__published_article_count__gt=0).annotate(
+        article_count=F('stats__published_article_count')
+    ).order_by('-article_count', 'name')
+    serializer_class = TagSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CustomPagination
+    lookup_field = 'slug'
+    conditional_fields = ('stats__updated_at',)
 
-class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['request'] = self.request
+        return context
+
+    def get_queryset(self):
+        return narrow_queryset(super().get_queryset(), self.get_serializer_class(), self.get_serializer_context())
+
+    @action(detail=True, methods=['get'], pagination_class=ArticlePagination)
+    def articles(self, request, slug=None):
+        tag = self.get_object()
+        articles = Article.objects.filter(
+            tagged_items__tag=tag,
+            status='published'
+        ).select_related('author', 'category').prefetch_related('tags').for_listing()
+        context = self.get_serializer_context()
+        articles = narrow_queryset(articles, ArticleListSerializer, context, always=ARTICLE_VIEW_FIELDS)
+        return self.listing_response(articles, ArticleListSerializer, context)
+
+
+class ArticleViewSet(ArticleListingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Article.objects.filter(status='published').select_related(
         'author', 'category'
     ).prefetch_related('tags')
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category__slug', 'author__id', 'is_featured', 'is_breaking']
+    pagination_class = ArticlePagination
+    filter_backends = [DjangoFilterBackend, ArticleSearchFilter, ArticleOrderingFilter]
+    filterset_class = ArticleFilter
     search_fields = ['title', 'excerpt', 'content', 'author__name', 'category__name']
     ordering_fields = ['published_date', 'created_at', 'views_count', 'title']
     ordering = ['-published_date']
@@ -92,58 +176,72 @@ class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
         context['request'] = self.request
         return context
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        queryset = queryset.for_detail() if self.action == 'retrieve' else queryset.for_listing()
+        return narrow_queryset(
+            queryset, self.get_serializer_class(), self.get_serializer_context(), always=ARTICLE_VIEW_FIELDS
+        )
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ArticleDetailSerializer
         return ArticleListSerializer
+
+    def list(self, request, *args, **kwargs):
+        return self.listing_response(self.filter_queryset(self.get_queryset()))
     
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        instance.increment_views()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        def render():
+            instance = self.get_object()
+            record_view(instance)
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
+
+        queryset = self.get_queryset().filter(slug=kwargs[self.lookup_field])
+        response = self.conditional_response([(queryset, ARTICLE_TIMESTAMPS + ('id',))], render)
+        pk = self.conditional_state[0][-1]
+        if response.status_code == 304 and pk is not None:
+            # A revalidated page is still a page view
+            record_view(Article(pk=pk))
+        return response
     
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        articles = self.queryset.filter(is_featured=True)
-        page = self.paginate_queryset(articles)
-        if page is not None:
-            serializer = ArticleListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = ArticleListSerializer(articles, many=True)
-        return Response(serializer.data)
+        articles = self.get_queryset().filter(is_featured=True)
+        return self.listing_response(articles)
     
     @action(detail=False, methods=['get'])
     def breaking(self, request):
-        articles = self.queryset.filter(is_breaking=True)
-        page = self.paginate_queryset(articles)
-        if page is not None:
-            serializer = ArticleListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = ArticleListSerializer(articles, many=True)
-        return Response(serializer.data)
+        articles = self.get_queryset().filter(is_breaking=True)
+        return self.listing_response(articles)
     
     @action(detail=False, methods=['get'])
     def trending(self, request):
-        # Get articles from last 7 days with highest views
-        week_ago = timezone.now() - timedelta(days=7)
-        articles = self.queryset.filter(
-            published_date__gte=week_ago
-        ).order_by('-views_count')[:10]
-        serializer = ArticleListSerializer(articles, many=True)
-        return Response(serializer.data)
+        # Top of the precomputed, time-decayed leaderboard (global or ?category=<slug>)
+        limit = trending.parse_limit(request.query_params.get('limit'))
+        articles = trending.trending_articles(self.get_queryset(), limit, request.query_params.get('category'))
+        return self.listing_response(articles, limit=limit, conditional=False)
+    
+    @action(detail=True, methods=['get'], url_path='related', url_name='related')
+    def related_articles(self, request, slug=None):
+        article = get_object_or_404(Article.objects.filter(status='published').only('pk'), slug=slug)
+        # Precomputed neighbours (news.related): one lookup on the neighbour table's (article, rank) index
+        articles = self.get_queryset().filter(related_from__article=article).order_by('related_from__rank')
+        return self.listing_response(articles, limit=related.get_config()['TOP_K'], conditional=False)
     
     @action(detail=False, methods=['get'])
     def latest(self, request):
-        articles = self.queryset.order_by('-published_date')[:10]
-        serializer = ArticleListSerializer(articles, many=True)
-        return Response(serializer.data)
+        articles = self.get_queryset().order_by('-published_date')
+        return self.listing_response(articles, limit=10)
 
 
-class NewsletterViewSet(viewsets.ModelViewSet):
+class NewsletterViewSet(WriteLoadSheddingMixin, viewsets.ModelViewSet):
     queryset = Newsletter.objects.all()
     serializer_class = NewsletterSerializer
+    throttle_scope = 'newsletter'
     http_method_names = ['post']  # Only allow POST for subscription
+    permission_classes = [AllowAny]  # Public form; the global default rejects anonymous POSTs
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -156,10 +254,12 @@ class NewsletterViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(WriteLoadSheddingMixin, viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
+    throttle_scope = 'contact'
     http_method_names = ['post']  # Only allow POST for contact form
+    permission_classes = [AllowAny]  # Public form; the global default rejects anonymous POSTs
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -177,7 +277,7 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 
 
-class SearchAPIView(ListAPIView):
+class SearchAPIView(ArticleListingMixin, ListAPIView):
     serializer_class = ArticleSearchSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = CustomPagination
@@ -185,46 +285,174 @@ class SearchAPIView(ListAPIView):
     def get_queryset(self):
         query = self.request.query_params.get('q', '')
         if query:
-            return Article.objects.filter(
-                Q(title__icontains=query) |
-                Q(excerpt__icontains=query) |
-                Q(content__icontains=query) |
-                Q(author__name__icontains=query) |
-                Q(category__name__icontains=query),
+            articles = Article.objects.filter(
                 status='published'
-            ).select_related('author', 'category').prefetch_related('tags')
+            ).select_related('author', 'category').prefetch_related('tags').for_listing()
+            articles = narrow_queryset(articles, self.get_serializer_class(), self.get_serializer_context())
+            return search_articles(articles, query)
         return Article.objects.none()
 
+    def list(self, request, *args, **kwargs):
+        return self.listing_response(self.filter_queryset(self.get_queryset()))
 
-class HomepageAPIView(APIView):
+
+class HomepageAPIView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     def get(self, request):
-        # Featured articles
-        featured_articles = Article.objects.filter(
-            is_featured=True, 
-            status='published'
-        ).select_related('author', 'category').prefetch_related('tags')[:6]
-        
-        # Breaking news
-        breaking_news = Article.objects.filter(
-            is_breaking=True, 
-            status='published'
-        ).select_related('author', 'category').prefetch_related('tags')[:5]
-        
-        # Latest articles by category
-        categories = Category.objects.filter(is_active=True)[:3]
-        category_articles = {}
-        
-        for category in categories:
-            articles = Article.objects.filter(
-                category=category, 
-                status='published'
-            ).select_related('author', 'category').prefetch_related('tags')[:3]
-            category_articles[category.slug] = ArticleListSerializer(articles, many=True).data
+        sources = [
+            (Article.objects.filter(status='published'), ARTICLE_TIMESTAMPS),
+            (Category.objects.filter(is_active=True), ('updated_at',)),
+        ]
+        self.degraded_sections = []
+        response = self.conditional_response(sources, partial(self.render_homepage, request))
+        if self.degraded_sections:
+            # A partial page must not be revalidated as if it were complete
+            del response.headers['ETag']
+            response.headers.pop('Last-Modified', None)
+            response.headers['X-Degraded-Sections'] = ','.join(self.degraded_sections)
+        return response
+
+    def render_homepage(self, request):
+        context = {'request': request}
+
+        def listing(queryset, limit):
+            queryset = queryset.select_related('author', 'category').prefetch_related('tags').for_listing()
+            queryset = narrow_queryset(queryset, ArticleListSerializer, context)
+            if fast_serialization_enabled():
+                fast = FastSerializer(ArticleListSerializer, context)
+                return fast.serialize(fast.prepare(queryset)[:limit])
+            return ArticleListSerializer(queryset[:limit], many=True, context=context).data
+
+        def categories():
+            return list(Category.objects.filter(is_active=True).values_list('pk', 'slug')[:3])
+
+        published = Article.objects.filter(status='published')
+        # Independent sections run concurrently (api.homepage); category feeds need the category list first
+        sections = run_sections([
+            ('featured_articles', partial(listing, published.filter(is_featured=True), 6), []),
+            ('breaking_news', partial(listing, published.filter(is_breaking=True), 5), []),
+            ('categories', categories, []),
+        ], self.degraded_sections)
+        category_articles = run_sections([
+            (slug, partial(listing, published.filter(category_id=pk), 3), [])
+            for pk, slug in sections['categories']
+        ], self.degraded_sections)
         
         return Response({
-            'featured_articles': ArticleListSerializer(featured_articles, many=True).data,
-            'breaking_news': ArticleListSerializer(breaking_news, many=True).data,
+            'featured_articles': sections['featured_articles'],
+            'breaking_news': sections['breaking_news'],
             'category_articles': category_articles,
         })
+
+
+class SubscriberTransferView(APIView):
+    """
+    Staff bulk transfer of newsletter subscribers (news.subscribers).
+
+    GET streams every subscriber (``?active=true`` for active ones only);
+    POST imports a CSV or NDJSON body, or a multipart ``file`` upload,
+    and answers with the counts.
+    """
+    permission_classes = [IsAdminUser]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Clients asking for text/csv get the stream, not a 406 from the JSON-only renderers
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, file_format):
+        queryset = Newsletter.objects.all()
+        if request.query_params.get('active') in ('1', 'true'):
+            queryset = queryset.filter(is_active=True)
+        response = StreamingHttpResponse(
+            subscribers.export_subscribers(queryset, file_format), content_type=subscribers.FORMATS[file_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="subscribers.{file_format}"'
+        return response
+
+    def post(self, request, file_format):
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            lines = iter(upload) if upload is not None else None
+        else:
+            lines = iter(request.stream.readline, b'') if request.stream is not None else None
+        if lines is None:
+            return Response({'detail': 'Send the subscribers as the request body or as a "file" upload.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        stream = codecs.iterdecode(lines, 'utf-8-sig', errors='replace')
+        result = subscribers.import_subscribers(stream, file_format)
+        return Response(result.as_dict())
+
+
+class MetricsAPIView(APIView):
+    """Request metrics of every worker in Prometheus text format (staff only)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(get_registry().render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class UnsubscribeView(View):
+    """
+    Unsubscribe link of newsletter emails (news.subscribers tokens).
+
+    GET only shows a confirmation form, so link scanners cannot
+    unsubscribe anyone; POST unsubscribes, including the RFC 8058
+    one-click POSTs mail clients send to the List-Unsubscribe URL.
+    The signed token is the credential, hence no CSRF check.
+    """
+    http_method_names = ['get', 'post']
+
+    def get(self, request):
+        token = request.GET.get('token', '')
+        if not token:
+            return HttpResponse(status=400)
+        return render(request, 'news/unsubscribe.html', {'token': token, 'done': False})
+
+    def post(self, request):
+        token = request.POST.get('token') or request.GET.get('token', '')
+        if not subscribers.unsubscribe(token):
+            return render(request, 'news/unsubscribe.html', {'invalid': True}, status=400)
+        return render(request, 'news/unsubscribe.html', {'done': True})
+
+
+class SyndicationView(View):
+    """
+    Cached sitemap and feed XML (api.syndication).
+
+    Plain Django views: feed readers send Accept headers DRF's JSON-only
+    content negotiation would answer with 406.
+    """
+    http_method_names = ['get', 'head']
+    content_type = syndication.SITEMAP_CONTENT_TYPE
+
+    def xml_response(self, request, entry):
+        content, etag = entry
+        response = get_conditional_response(request, etag=etag) or HttpResponse(content, content_type=self.content_type)
+        response['ETag'] = etag
+        return response
+
+
+class SitemapIndexView(SyndicationView):
+    def get(self, request):
+        return self.xml_response(request, syndication.sitemap_index())
+
+
+class SitemapView(SyndicationView):
+    def get(self, request, partition):
+        if partition == 'pages':
+            return self.xml_response(request, syndication.pages_sitemap())
+        year, month = map(int, partition.split('-'))
+        # The month's range ends on the first of the next one, which must still be a valid date
+        if not (1 <= month <= 12 and MINYEAR <= year < MAXYEAR):
+            raise Http404('No such sitemap')
+        return self.xml_response(request, syndication.month_sitemap(year, month))
+
+
+class FeedView(SyndicationView):
+    def get(self, request, feed_format, slug=None, pk=None):
+        self.content_type = f'application/{feed_format}+xml; charset=utf-8'
+        category = get_object_or_404(Category, slug=slug, is_active=True) if slug else None
+        author = get_object_or_404(Author, pk=pk, is_active=True) if pk else None
+        return self.xml_response(request, syndication.feed(feed_format, category, author))
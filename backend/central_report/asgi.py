@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'central_report.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Error reporting for serving processes only; management commands skip the import
+from central_report.integrations import init_sentry  # noqa: E402
+
+init_sentry()
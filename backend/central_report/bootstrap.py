@@ -0,0 +1,47 @@
+"""
+Container start-up steps run inside one Python process.
+
+The entrypoint used to start three interpreters before gunicorn
+(``migrate``, a ``shell -c`` superuser check, then gunicorn itself), each
+importing Django and every app again. ``run()`` does the same work in
+whichever process calls it: the ``bootstrap`` management command, or the
+gunicorn master when ``DJANGO_BOOTSTRAP=1`` (see gunicorn.conf.py), whose
+already-loaded modules the workers then inherit on fork.
+"""
+import os
+import sys
+
+
+def migrate(stdout=None):
+    from django.core.management import call_command
+
+    call_command('migrate', interactive=False, verbosity=1, stdout=stdout or sys.stdout)
+
+
+def ensure_superuser(stdout=None):
+    """Create the superuser from DJANGO_SUPERUSER_* unless one exists; returns True when created"""
+    from django.contrib.auth import get_user_model
+
+    stdout = stdout or sys.stdout
+    User = get_user_model()
+    if User.objects.filter(is_superuser=True).exists():
+        stdout.write('Superuser already exists.\n')
+        return False
+    User.objects.create_superuser(
+        username=os.environ.get('DJANGO_SUPERUSER_USERNAME', 'admin'),
+        email=os.environ.get('DJANGO_SUPERUSER_EMAIL', 'admin@centralreport.com'),
+        password=os.environ.get('DJANGO_SUPERUSER_PASSWORD', 'admin123'),
+    )
+    stdout.write('Superuser created successfully!\n')
+    return True
+
+
+def run(stdout=None):
+    """Migrate and ensure a superuser, then close the connections so forked workers open their own"""
+    from django.db import connections
+
+    try:
+        migrate(stdout)
+        ensure_superuser(stdout)
+    finally:
+        connections.close_all()
@@ -0,0 +1,38 @@
+"""
+Third-party services initialised on first use rather than at settings import.
+
+Importing and initialising sentry_sdk takes about 100 ms, which every
+process used to pay, including ``migrate`` and cron commands. Sentry is
+now set up by the WSGI/ASGI entry points, and only when a DSN is
+configured. Cloudinary reads the ``CLOUDINARY`` setting itself when the
+``cloudinary`` package is first imported by the models.
+"""
+import threading
+
+from django.conf import settings
+
+_sentry_lock = threading.Lock()
+_sentry_initialised = False
+
+
+def init_sentry():
+    """Initialise Sentry/GlitchTip once per process; a no-op without ``SENTRY['DSN']``"""
+    global _sentry_initialised
+    config = getattr(settings, 'SENTRY', {})
+    if _sentry_initialised or not config.get('DSN'):
+        return False
+    with _sentry_lock:
+        if _sentry_initialised:
+            return False
+        import sentry_sdk
+        from sentry_sdk.integrations.django import DjangoIntegration
+
+        sentry_sdk.init(
+            dsn=config['DSN'],
+            integrations=[DjangoIntegration()],
+            traces_sample_rate=config.get('TRACES_SAMPLE_RATE', 1.0),
+            send_default_pii=True,
+            environment=config.get('ENVIRONMENT', 'development'),
+        )
+        _sentry_initialised = True
+    return True
@@ -0,0 +1,13 @@
+import logging
+from pathlib import Path
+
+
+class LazyFileHandler(logging.FileHandler):
+    """FileHandler that creates its directory and opens the file when the first record is written"""
+
+    def __init__(self, filename, mode='a', encoding=None, errors=None):
+        super().__init__(filename, mode=mode, encoding=encoding, delay=True, errors=errors)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
@@ -6,23 +6,20 @@ Django settings for central_report project.
 import os
 from pathlib import Path
 import environ
-import sentry_sdk
-from sentry_sdk.integrations.django import DjangoIntegration
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Initialise environment variables
 env = environ.Env()
-environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
-
-# Glitchtip Configuration
-sentry_sdk.init(
-    dsn=env('GLITCHTIP_DSN', default=''),
-    integrations=[DjangoIntegration()],
-    traces_sample_rate=env.float('SENTRY_TRACES_SAMPLE_RATE', default=1.0),
-    send_default_pii=True,
-    environment=env('ENVIRONMENT', default='development'),
-)
+if (BASE_DIR / '.env').exists():
+    environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
+
+# Glitchtip Configuration: initialised by the WSGI/ASGI entry points (central_report.integrations)
+SENTRY = {
+    'DSN': env('GLITCHTIP_DSN', default=''),
+    'TRACES_SAMPLE_RATE': env.float('SENTRY_TRACES_SAMPLE_RATE', default=1.0),
+    'ENVIRONMENT': env('ENVIRONMENT', default='development'),
+}
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = env('SECRET_KEY', default='django-insecure-change-this-in-production')
@@ -57,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -144,6 +142,9 @@ STATIC_ROOT = BASE_DIR / env('STATIC_ROOT', default='staticfiles')
 MEDIA_URL = env('MEDIA_URL', default='/media/')
 MEDIA_ROOT = BASE_DIR / env('MEDIA_ROOT', default='media')
 
+# Turns off per-process background work (the view counter buffer) for the suite
+TEST_RUNNER = 'central_report.test_runner.TestRunner'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -173,8 +174,29 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
+    # Proxies in front of the app, so throttles key on the client's address in X-Forwarded-For
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=None),
+}
+
+# Shared cache, e.g. redis://host:6379/0, so every worker sees the same
+# throttling buckets and cached counts; the default is per process
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Token buckets and the concurrency cap of the public write endpoints (see api.throttling).
+# RATES maps a bucket to (rate, burst), e.g. {'newsletter.ip': ('20/hour', 5)}
+THROTTLING = {
+    'ENABLED': env.bool('THROTTLING_ENABLED', default=True),
+    'MAX_CONCURRENT_WRITES': env.int('THROTTLING_MAX_CONCURRENT_WRITES', default=8),
 }
 
+# Seconds to cache exact COUNT(*) totals for paginated feeds (0 disables)
+PAGINATION_COUNT_CACHE_TIMEOUT = env.int('PAGINATION_COUNT_CACHE_TIMEOUT', default=60)
+
+# Article lists are serialized from values() rows instead of model instances
+FAST_ARTICLE_SERIALIZATION = env.bool('FAST_ARTICLE_SERIALIZATION', default=True)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=['http://localhost:3000', 'http://127.0.0.1:3000'])
 CORS_ALLOW_CREDENTIALS = True
@@ -224,20 +246,98 @@ EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
 EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 
-# Cloudinary Configuration (for image uploads)
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-
-cloudinary.config(
-    cloud_name=env('CLOUDINARY_CLOUD_NAME'),
-    api_key=env('CLOUDINARY_API_KEY'),
-    api_secret=env('CLOUDINARY_API_SECRET'),
-    secure=True
-)
+# Cloudinary Configuration (for image uploads); the cloudinary package reads
+# this dict itself when it is first imported, so settings do not import it
+CLOUDINARY = {
+    'cloud_name': env('CLOUDINARY_CLOUD_NAME', default=''),
+    'api_key': env('CLOUDINARY_API_KEY', default=''),
+    'api_secret': env('CLOUDINARY_API_SECRET', default=''),
+    'secure': True,
+}
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Responsive image widths stored with every article and author image (see news.media);
+# run backfill_image_variants after changing them
+MEDIA_VARIANTS = {
+    'ARTICLE_WIDTHS': (320, 640, 960, 1280, 1920),
+    'AVATAR_WIDTHS': (64, 128, 256),
+}
+
+# Article bodies are sanitized and minified on save (see news.richtext); the
+# defaults allow what the CKEditor toolbars produce. Run backfill_processed_content
+# after changing them
+ARTICLE_CONTENT = {
+    'IFRAME_HOSTS': ('www.youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com'),
+}
+
+# Article view counting: views are buffered per worker and flushed in bulk
+VIEW_COUNTER = {
+    'ENABLED': env.bool('VIEW_COUNTER_ENABLED', default=True),
+    'FLUSH_INTERVAL': env.int('VIEW_COUNTER_FLUSH_INTERVAL', default=10),
+    'MAX_PENDING': env.int('VIEW_COUNTER_MAX_PENDING', default=500),
+}
+
+# Trending leaderboard: views decay with a half-life (see news.trending)
+TRENDING = {
+    'HALF_LIFE_HOURS': env.float('TRENDING_HALF_LIFE_HOURS', default=12),
+    'BUCKET_MINUTES': env.int('TRENDING_BUCKET_MINUTES', default=60),
+    'WINDOW_DAYS': env.int('TRENDING_WINDOW_DAYS', default=7),
+    'DEFAULT_LIMIT': env.int('TRENDING_DEFAULT_LIMIT', default=10),
+    'MAX_LIMIT': env.int('TRENDING_MAX_LIMIT', default=50),
+}
+
+# Related articles: precomputed neighbour lists (see news.related)
+RELATED = {
+    'ENABLED': env.bool('RELATED_ENABLED', default=True),
+    'TOP_K': env.int('RELATED_TOP_K', default=6),
+    'TEXT_WEIGHT': env.float('RELATED_TEXT_WEIGHT', default=0.6),
+    'TAG_WEIGHT': env.float('RELATED_TAG_WEIGHT', default=0.4),
+    'BATCH_REFRESH_LIMIT': env.int('RELATED_BATCH_REFRESH_LIMIT', default=50),
+}
+
+# Homepage sections are fetched concurrently, each on its own connection (see api.homepage).
+# CONCURRENCY=1 renders them one after another
+HOMEPAGE = {
+    'CONCURRENCY': env.int('HOMEPAGE_CONCURRENCY', default=4),
+    'SECTION_TIMEOUT': env.float('HOMEPAGE_SECTION_TIMEOUT', default=2.0),
+}
+
+# Static JSON snapshot of the read API for serving from a CDN (see api.snapshots).
+# `manage.py export_snapshot` writes the whole site; with ENABLED, saves re-export what they affect
+STATIC_SNAPSHOT = {
+    'ENABLED': env.bool('STATIC_SNAPSHOT_ENABLED', default=False),
+    'DIRECTORY': env('STATIC_SNAPSHOT_DIR', default=str(BASE_DIR / 'snapshot')),
+    'FEED_PAGES': env.int('STATIC_SNAPSHOT_FEED_PAGES', default=5),
+    'BASE_URL': env('STATIC_SNAPSHOT_BASE_URL', default=''),
+}
+
+# Sitemaps and RSS/Atom feeds, cached per partition and invalidated on publish/edit (see api.syndication).
+# Links point at the frontend, which proxies /sitemap.xml, /sitemaps/ and /feeds/ to the API
+SYNDICATION = {
+    'SITE_URL': env('SITE_URL', default='https://centralsreport.com'),
+    'CACHE_TIMEOUT': env.int('SYNDICATION_CACHE_TIMEOUT', default=3600),
+    'FEED_ITEMS': env.int('SYNDICATION_FEED_ITEMS', default=50),
+}
+
+# Newsletter digests (see news.digest and the send_digest command); emails go out
+# through the EMAIL_* backend above
+NEWSLETTER_DIGEST = {
+    'SITE_URL': env('SITE_URL', default='https://centralsreport.com'),
+    'FROM_EMAIL': env('NEWSLETTER_FROM_EMAIL', default='The Central Report <newsletter@centralsreport.com>'),
+    'MAX_ARTICLES': env.int('NEWSLETTER_DIGEST_MAX_ARTICLES', default=20),
+    'BATCH_SIZE': env.int('NEWSLETTER_DIGEST_BATCH_SIZE', default=100),
+    'WORKERS': env.int('NEWSLETTER_DIGEST_WORKERS', default=4),
+}
+
+# Per-endpoint request metrics served at /api/metrics (see api.metrics).
+# gunicorn.conf.py points METRICS_DIR at a fresh directory so workers share totals
+METRICS = {
+    'ENABLED': env.bool('METRICS_ENABLED', default=True),
+    'DIRECTORY': env('METRICS_DIR', default=''),
+    'FLUSH_INTERVAL': env.float('METRICS_FLUSH_INTERVAL', default=5),
+}
+
 # Security Settings (for production)
 if not DEBUG:
     SECURE_SSL_REDIRECT = env.bool('SECURE_SSL_REDIRECT', default=True)
@@ -264,7 +364,8 @@ LOGGING = {
     'handlers': {
         'file': {
             'level': env('LOG_LEVEL', default='INFO'),
-            'class': 'logging.FileHandler',
+            # Creates logs/ and opens the file on the first record
+            'class': 'central_report.log_handlers.LazyFileHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
             'formatter': 'verbose',
         },
@@ -286,7 +387,3 @@ LOGGING = {
         },
     },
 }
-
-# Create logs directory if it doesn't exist
-LOGS_DIR = BASE_DIR / 'logs'
-LOGS_DIR.mkdir(exist_ok=True)
@@ -0,0 +1,23 @@
+"""
+Test runner for ``manage.py test`` (``TEST_RUNNER``).
+
+Runs the suite with the per-process view counter buffer off. Its
+background flusher and interpreter-exit flush would otherwise write to
+whatever database is configured when they fire, which after the run is
+the development one, not the test database. Tests of the buffer build
+their own ViewCountBuffer.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(VIEW_COUNTER=dict(settings.VIEW_COUNTER, ENABLED=False))
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,28 +1,10 @@
 #!/bin/bash
 set -e
 
-# Run migrations
-echo "Running migrations..."
-python manage.py migrate --noinput
-
-# Create superuser if it doesn't exist
-echo "Checking for superuser..."
-python manage.py shell -c "
-import os
-from django.contrib.auth import get_user_model
-User = get_user_model()
-if not User.objects.filter(is_superuser=True).exists():
-    print('Creating superuser...')
-    User.objects.create_superuser(
-        username=os.environ.get('DJANGO_SUPERUSER_USERNAME', 'admin'),
-        email=os.environ.get('DJANGO_SUPERUSER_EMAIL', 'admin@centralreport.com'),
-        password=os.environ.get('DJANGO_SUPERUSER_PASSWORD', 'admin123')
-    )
-    print('Superuser created successfully!')
-else:
-    print('Superuser already exists.')
-"
-
-# Start the application
+# Migrations and the superuser check run inside the gunicorn master
+# (central_report.bootstrap via gunicorn.conf.py), so Django is loaded once
+# and the workers inherit it instead of three interpreters starting in turn.
+# Run `python manage.py bootstrap` to do the same steps on their own.
 echo "Starting Django application..."
-exec gunicorn central_report.wsgi:application --bind 0.0.0.0:$PORT --workers 2 --timeout 120 --access-logfile - 
\ No newline at end of file
+export DJANGO_BOOTSTRAP=1
+exec gunicorn central_report.wsgi:application --bind 0.0.0.0:$PORT --workers 2 --timeout 120 --access-logfile -
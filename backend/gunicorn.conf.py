@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration picked up automatically from the working directory.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+# With DJANGO_BOOTSTRAP=1 (entrypoint.sh) the master loads Django once, runs the
+# start-up steps in on_starting and the workers inherit everything on fork
+preload_app = os.environ.get('DJANGO_BOOTSTRAP') == '1'
+
+# Workers share request metrics through per-process snapshot files (api.metrics);
+# every server run starts from an empty directory. Set here rather than in a hook:
+# with preload_app the settings are imported before on_starting runs
+metrics_dir = Path(os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='central-report-metrics-')))
+for snapshot in metrics_dir.glob('*.json'):
+    snapshot.unlink(missing_ok=True)
+
+
+def on_starting(server):
+    if preload_app:
+        from central_report import bootstrap
+
+        bootstrap.run()
+
+
+def worker_exit(server, worker):
+    # Write any buffered article views before the worker goes away
+    from news.view_counter import flush_views
+    from api.metrics import flush_metrics
+
+    flushed = flush_views()
+    if flushed:
+        server.log.info('Flushed buffered views for %d articles', flushed)
+    flush_metrics()
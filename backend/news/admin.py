@@ -1,8 +1,21 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Category, Author, Article, Newsletter, Contact
+from .models import Category, Author, Article, Newsletter, NewsletterDigest, Contact
+from . import publishing, subscribers
+
+
+class ArticleChangeList(ChangeList):
+    """Article rows without the columns no changelist cell shows (the body above all)"""
+    deferred_fields = (
+        'content', 'content_html', 'content_text', 'content_outline', 'excerpt', 'featured_image_variants',
+        'meta_title', 'meta_description',
+    )
+
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).defer(*self.deferred_fields)
 
 
 @admin.register(Category)
@@ -12,10 +25,12 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     ordering = ['order', 'name']
+    show_full_result_count = False
     
     def article_count(self, obj):
-        return obj.articles.filter(status='published').count()
+        return obj.published_article_count
     article_count.short_description = 'Articles'
+    article_count.admin_order_field = 'published_article_count'
 
 
 @admin.register(Author)
@@ -24,30 +39,41 @@ class AuthorAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'email', 'bio']
     readonly_fields = ['created_at', 'updated_at']
+    show_full_result_count = False
     
     def avatar_display(self, obj):
-        try:
-            if obj.avatar and hasattr(obj.avatar, 'url'):
-                return format_html('<img src="{}" width="50" height="50" style="border-radius: 50%;" />', obj.avatar.url)
-        except Exception:
-            pass
+        # The URL stored at save time (news.media) rather than one built per row
+        src = (obj.avatar_variants or {}).get('src')
+        if not src:
+            try:
+                src = obj.avatar.url if obj.avatar else None
+            except Exception:
+                src = None
+        if src:
+            return format_html('<img src="{}" width="50" height="50" style="border-radius: 50%;" />', src)
         return "No Avatar"
     avatar_display.short_description = 'Avatar'
     
     def article_count(self, obj):
-        return obj.articles.filter(status='published').count()
+        return obj.published_article_count
     article_count.short_description = 'Articles'
+    article_count.admin_order_field = 'published_article_count'
 
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author', 'category', 'status', 'is_featured', 'is_breaking', 'published_date', 'views_count', 'read_time_display']
-    list_filter = ['status', 'is_featured', 'is_breaking', 'category', 'author', 'published_date', 'created_at']
-    search_fields = ['title', 'excerpt', 'content', 'author__name', 'category__name']
+    list_display = ['title', 'author_link', 'category', 'status', 'is_featured', 'is_breaking', 'published_date', 'views_count', 'read_time_display']
+    # No author filter: its sidebar would list every author; the author column links to the filtered list instead
+    list_filter = ['status', 'is_featured', 'is_breaking', 'category', 'published_date', 'created_at']
+    # Fallback only: get_search_results() uses the full-text index (news.search) where there is one
+    search_fields = ['title', 'author__name', 'category__name']
+    autocomplete_fields = ['author', 'category']
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ['created_at', 'updated_at', 'views_count', 'read_time_display']
     date_hierarchy = 'published_date'
     ordering = ['-published_date', '-created_at']
+    list_select_related = ['author', 'category']
+    show_full_result_count = False
     
     fieldsets = (
         ('Content', {
@@ -76,42 +102,49 @@ class ArticleAdmin(admin.ModelAdmin):
     def read_time_display(self, obj):
         return f"{obj.read_time} min"
     read_time_display.short_description = 'Read Time'
+
+    def author_link(self, obj):
+        return format_html('<a href="?author__id__exact={}">{}</a>', obj.author_id, obj.author)
+    author_link.short_description = 'Author'
+    author_link.admin_order_field = 'author__name'
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('author', 'category')
+
+    def get_changelist(self, request, **kwargs):
+        return ArticleChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        from .search import search_articles, search_backend
+
+        if not search_term.strip() or search_backend() is None:
+            return super().get_search_results(request, queryset, search_term)
+        # Matching ids from the FTS index / GIN-indexed tsvector instead of icontains over every body
+        matches = search_articles(Article.objects.all(), search_term).values('pk')
+        return queryset.filter(pk__in=matches), False
     
     actions = ['make_published', 'make_draft', 'make_featured', 'remove_featured', 'fix_published_dates']
     
     def make_published(self, request, queryset):
-        from django.utils import timezone
-        now = timezone.now()
-        for article in queryset:
-            if not article.published_date:
-                article.published_date = now
-            article.status = 'published'
-            article.save()
+        published = publishing.publish(queryset)
+        self.message_user(request, f"Published {published} articles.")
     make_published.short_description = "Mark selected articles as published"
     
     def make_draft(self, request, queryset):
-        queryset.update(status='draft')
+        drafted = publishing.unpublish(queryset)
+        self.message_user(request, f"Moved {drafted} articles to draft.")
     make_draft.short_description = "Mark selected articles as draft"
     
     def make_featured(self, request, queryset):
-        queryset.update(is_featured=True)
+        publishing.feature(queryset)
     make_featured.short_description = "Mark selected articles as featured"
     
     def remove_featured(self, request, queryset):
-        queryset.update(is_featured=False)
+        publishing.feature(queryset, featured=False)
     remove_featured.short_description = "Remove featured status from selected articles"
     
     def fix_published_dates(self, request, queryset):
-        from django.utils import timezone
-        fixed_count = 0
-        for article in queryset:
-            if article.status == 'published' and not article.published_date:
-                article.published_date = article.created_at or timezone.now()
-                article.save()
-                fixed_count += 1
+        fixed_count = publishing.fix_published_dates(queryset)
         self.message_user(request, f"Fixed published_date for {fixed_count} articles.")
     fix_published_dates.short_description = "Fix published_date for published articles"
 
@@ -130,7 +163,7 @@ class NewsletterAdmin(admin.ModelAdmin):
     readonly_fields = ['subscribed_at']
     ordering = ['-subscribed_at']
     
-    actions = ['activate_subscribers', 'deactivate_subscribers']
+    actions = ['activate_subscribers', 'deactivate_subscribers', 'export_subscribers']
     
     def activate_subscribers(self, request, queryset):
         queryset.update(is_active=True, unsubscribed_at=None)
@@ -141,6 +174,26 @@ class NewsletterAdmin(admin.ModelAdmin):
         queryset.update(is_active=False, unsubscribed_at=timezone.now())
     deactivate_subscribers.short_description = "Deactivate selected subscribers"
 
+    def export_subscribers(self, request, queryset):
+        # Streamed like the staff API export (news.subscribers), so large selections stay in constant memory
+        from django.http import StreamingHttpResponse
+        response = StreamingHttpResponse(subscribers.export_subscribers(queryset), content_type=subscribers.FORMATS['csv'])
+        response['Content-Disposition'] = 'attachment; filename="subscribers.csv"'
+        return response
+    export_subscribers.short_description = "Export selected subscribers as CSV"
+
+
+@admin.register(NewsletterDigest)
+class NewsletterDigestAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'article_count', 'sent_count', 'failed_count', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['subject', 'html_body', 'text_body', 'article_count', 'period_start', 'period_end', 'status',
+                       'checkpoint', 'sent_count', 'failed_count', 'created_at', 'started_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        # Issues are built and sent by the send_digest command
+        return False
+
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
@@ -0,0 +1,160 @@
+"""
+Synthetic news corpus for benchmarks and local load testing.
+
+Rows are written with ``bulk_create`` (so per-article signals do not fire)
+and the derived data -- published and tag counts, search documents, the
+trending leaderboard and related articles -- is rebuilt in bulk afterwards.
+"""
+import random
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+from taggit.models import Tag
+
+from .counts import rebuild_published_counts, rebuild_tag_counts
+from .models import Article, Author, Category, TaggedArticle
+from .text import count_words, read_time_minutes
+from . import related, richtext, search, trending
+
+CATEGORY_NAMES = [
+    'Politics', 'Business', 'Technology', 'Science', 'Health', 'Sports',
+    'Entertainment', 'World', 'Opinion', 'Culture', 'Travel', 'Education',
+]
+WORDS = (
+    'government election market economy policy court climate energy research '
+    'hospital vaccine player season league film music festival border trade '
+    'minister president council budget inflation growth startup software data '
+    'security network privacy student school university report investigation '
+    'community city region river storm drought harvest museum artist novel '
+    'championship coach transfer stadium final record rally protest treaty '
+    'summit agreement deficit interest bank currency export import industry '
+    'factory worker union strike wage tax reform justice police crime trial '
+    'verdict appeal senate parliament vote campaign candidate poll debate'
+).split()
+SLUG_PREFIX = 'corpus'
+
+
+def _sentence(rng, length):
+    words = rng.choices(WORDS, k=length)
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(3, 6)))
+
+
+def article_content(rng, paragraphs):
+    """Build CKEditor-style HTML roughly ``paragraphs`` blocks long"""
+    blocks = []
+    for index in range(paragraphs):
+        if index and index % 5 == 0:
+            blocks.append(f'<h2>{_sentence(rng, 5)[:-1]}</h2>')
+        blocks.append(f'<p style="text-align:justify">{_paragraph(rng)}</p>')
+        if index % 7 == 3:
+            blocks.append('<p>&nbsp;</p>')
+    return '\n'.join(blocks)
+
+
+@transaction.atomic
+def generate_corpus(articles=1000, categories=8, authors=20, tags=50, paragraphs=12,
+                    seed=0, batch_size=1000, stdout=None):
+    """
+    Create a realistic synthetic corpus and return the created article count.
+
+    About 90% of articles are published over the last year; a few are
+    featured or breaking.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    category_objs = []
+    for index in range(categories):
+        base = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+        name = base if index < len(CATEGORY_NAMES) else f'{base} {index // len(CATEGORY_NAMES) + 1}'
+        category, _ = Category.objects.get_or_create(
+            slug=f'{SLUG_PREFIX}-{index}',
+            defaults={'name': f'{name} ({SLUG_PREFIX})', 'order': index},
+        )
+        category_objs.append(category)
+
+    author_objs = []
+    for index in range(authors):
+        author = Author.objects.filter(email=f'author{index}@{SLUG_PREFIX}.example.com').first()
+        if author is None:
+            author = Author.objects.create(
+                name=f'Corpus Author {index}',
+                bio=_paragraph(rng),
+                email=f'author{index}@{SLUG_PREFIX}.example.com',
+            )
+        author_objs.append(author)
+
+    tag_objs = []
+    for index in range(tags):
+        tag, _ = Tag.objects.get_or_create(
+            slug=f'{SLUG_PREFIX}-tag-{index}',
+            defaults={'name': f'{rng.choice(WORDS)} {index}'},
+        )
+        tag_objs.append(tag)
+
+    offset = Article.objects.filter(slug__startswith=f'{SLUG_PREFIX}-article-').count()
+    created = 0
+    while created < articles:
+        chunk = []
+        for index in range(offset + created, offset + min(articles, created + batch_size)):
+            title = _sentence(rng, rng.randint(5, 11))[:-1]
+            excerpt = _sentence(rng, rng.randint(18, 30))
+            status = 'published' if rng.random() < 0.9 else rng.choice(['draft', 'archived'])
+            published_date = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)) if status == 'published' else None
+            content = article_content(rng, paragraphs)
+            word_count = count_words(content)
+            processed = richtext.process(content)
+            chunk.append(Article(
+                title=title,
+                slug=f'{SLUG_PREFIX}-article-{index}',
+                excerpt=excerpt,
+                content=content,
+                content_html=processed.html,
+                content_text=processed.text,
+                content_outline=processed.outline,
+                word_count=word_count,
+                read_time=read_time_minutes(word_count),
+                author=rng.choice(author_objs),
+                category=rng.choice(category_objs),
+                status=status,
+                is_featured=rng.random() < 0.05,
+                is_breaking=rng.random() < 0.02,
+                published_date=published_date,
+                meta_title=title[:60],
+                meta_description=excerpt[:160],
+                views_count=int(rng.paretovariate(1.2) * 10),
+            ))
+        Article.objects.bulk_create(chunk, batch_size=batch_size)
+        # bulk_create only returns primary keys on some backends
+        saved = Article.objects.filter(slug__in=[article.slug for article in chunk]).values_list('pk', flat=True)
+        TaggedArticle.objects.bulk_create([
+            TaggedArticle(content_object_id=pk, tag=tag)
+            for pk in saved
+            for tag in rng.sample(tag_objs, k=min(len(tag_objs), rng.randint(1, 4)))
+        ], batch_size=batch_size)
+        created += len(chunk)
+        log(f'  created {created}/{articles} articles')
+
+    rebuild_published_counts()
+    rebuild_tag_counts()
+    log('  rebuilding search index')
+    search.rebuild_index(Article.objects.filter(slug__startswith=f'{SLUG_PREFIX}-article-'))
+    trending.seed_from_lifetime_views()
+    trending.rebuild()
+    log('  rebuilding related articles')
+    related.rebuild()
+    if connection.vendor in ('sqlite', 'postgresql'):
+        # Fresh planner statistics; without them SQLite drives full-text
+        # searches from the status index and re-runs MATCH for every row
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return created
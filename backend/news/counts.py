@@ -0,0 +1,113 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+from .models import Article, Author, Category, TaggedArticle, TagStats
+
+
+def adjust_published_count(model, pk, delta):
+    """
+    Atomically shift the stored published_article_count of one row.
+
+    ``updated_at`` is bumped too: the count is part of the API payload, so
+    it must invalidate ETags like any other change to the row.
+    """
+    if not pk or not delta:
+        return
+    if delta > 0:
+        model.objects.filter(pk=pk).update(
+            published_article_count=F('published_article_count') + delta, updated_at=Now()
+        )
+    else:
+        # Never let a stale counter go negative on a PositiveIntegerField
+        model.objects.filter(pk=pk, published_article_count__gte=-delta).update(
+            published_article_count=F('published_article_count') + delta, updated_at=Now()
+        )
+
+
+def _published_count_subquery(fk_name):
+    published = (
+        Article.objects.filter(status='published', **{fk_name: OuterRef('pk')})
+        .order_by()
+        .values(fk_name)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(published), 0)
+
+
+def rebuild_published_counts(category_ids=None, author_ids=None):
+    """
+    Recompute stored published_article_count columns from the articles table.
+
+    Passing ``None`` rebuilds every row; passing an iterable of ids limits
+    the rebuild to those rows. Returns the number of (categories, authors)
+    updated.
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=list(category_ids))
+    authors = Author.objects.all()
+    if author_ids is not None:
+        authors = authors.filter(pk__in=list(author_ids))
+
+    updated_categories = categories.update(
+        published_article_count=_published_count_subquery('category'), updated_at=Now()
+    )
+    updated_authors = authors.update(
+        published_article_count=_published_count_subquery('author'), updated_at=Now()
+    )
+    return updated_categories, updated_authors
+
+
+def adjust_tag_counts(tag_ids, delta):
+    """Shift the published counts of several tags at once, creating missing stats rows"""
+    tag_ids = [pk for pk in tag_ids if pk]
+    if not tag_ids or not delta:
+        return
+    stats = TagStats.objects.filter(pk__in=tag_ids)
+    if delta > 0:
+        TagStats.objects.bulk_create([TagStats(tag_id=pk) for pk in tag_ids], ignore_conflicts=True)
+    else:
+        stats = stats.filter(published_article_count__gte=-delta)
+    stats.update(published_article_count=F('published_article_count') + delta, updated_at=Now())
+
+
+def rebuild_tag_counts(tag_ids=None):
+    """
+    Recompute TagStats from the tag assignments of published articles.
+
+    Passing ``None`` rebuilds every tag, creating missing stats rows.
+    Returns the number of tags updated.
+    """
+    from taggit.models import Tag
+
+    tags = Tag.objects.all()
+    if tag_ids is not None:
+        tags = tags.filter(pk__in=list(tag_ids))
+    TagStats.objects.bulk_create(
+        [TagStats(tag_id=pk) for pk in tags.values_list('pk', flat=True)], batch_size=1000, ignore_conflicts=True
+    )
+    published = (
+        TaggedArticle.objects.filter(tag=OuterRef('pk'), content_object__status='published')
+        .order_by()
+        .values('tag')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return TagStats.objects.filter(pk__in=tags.values('pk')).update(
+        published_article_count=Coalesce(Subquery(published), 0), updated_at=Now()
+    )
+
+
+def rebuild_counts_for_articles(queryset):
+    """Rebuild counts for the categories, authors and tags touched by a queryset"""
+    rows = list(queryset.order_by().values_list('category_id', 'author_id').distinct())
+    if not rows:
+        return 0, 0, 0
+    category_ids = {category_id for category_id, _ in rows}
+    author_ids = {author_id for _, author_id in rows}
+    tag_ids = set(
+        TaggedArticle.objects.filter(content_object__in=queryset.order_by().values('pk'))
+        .values_list('tag_id', flat=True)
+    )
+    return (*rebuild_published_counts(category_ids, author_ids), rebuild_tag_counts(tag_ids))
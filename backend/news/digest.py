@@ -0,0 +1,257 @@
+"""
+Newsletter digest: build an issue once, send it to every active subscriber.
+
+build_issue() collects the articles published since the previous issue
+(or the last ``PERIOD_HOURS``), renders ``news/digest.html`` and
+``news/digest.txt`` once and stores the result as a NewsletterDigest.
+The only per-recipient part, the unsubscribe link, is left as a
+placeholder and filled in with a string join per message.
+
+send_issue() reads the active subscribers in pk order, ``BATCH_SIZE``
+at a time, and hands the batches to a pool of ``WORKERS`` threads. Each
+thread opens one connection of the configured email backend and reuses
+it for every batch it sends, so SMTP connects once per thread instead
+of once per message. At most twice as many batches as threads are
+queued at a time, whatever the list size.
+
+As batches finish, ``checkpoint`` advances to the last subscriber of
+the longest run of completed batches and is saved, so a run that is
+interrupted, or stops on a connection error, resumes after it. The
+batches that completed beyond the checkpoint are sent again on resume:
+delivery is at least once.
+"""
+import smtplib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from itertools import islice
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import F
+
+from . import subscribers
+
+DEFAULTS = {
+    'SITE_URL': 'https://centralsreport.com',
+    'SITE_NAME': 'The Central Report',
+    'FROM_EMAIL': None,  # DEFAULT_FROM_EMAIL
+    'SUBJECT': '{site_name} digest, {date:%d %B %Y}',
+    # Used for the first issue; later issues start where the previous one ended
+    'PERIOD_HOURS': 24,
+    'MAX_ARTICLES': 20,
+    'UNSUBSCRIBE_URL': '{site_url}/newsletter/unsubscribe?token={token}',
+    'BATCH_SIZE': 100,
+    'WORKERS': 4,
+}
+
+UNSUBSCRIBE_PLACEHOLDER = '%%UNSUBSCRIBE_URL%%'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'NEWSLETTER_DIGEST', {}))
+    return config
+
+
+def build_issue(now=None, config=None):
+    """Render and store the next issue; None when no article was published since the last one"""
+    from django.template.loader import render_to_string
+    from django.utils import timezone
+    from .models import Article, NewsletterDigest
+
+    config = config or get_config()
+    now = now or timezone.now()
+    start = NewsletterDigest.objects.order_by('-period_end').values_list('period_end', flat=True).first()
+    start = start or now - timedelta(hours=config['PERIOD_HOURS'])
+    articles = list(
+        Article.objects.filter(status='published', published_date__gt=start, published_date__lte=now)
+        .order_by('-is_featured', '-published_date')
+        .values('title', 'slug', 'excerpt', 'published_date', 'featured_image_variants',
+                'category__name', 'author__name')[:config['MAX_ARTICLES']]
+    )
+    if not articles:
+        return None
+    site_url = config['SITE_URL'].rstrip('/')
+    for article in articles:
+        article['url'] = f'{site_url}/article/{article["slug"]}'
+        article['image'] = (article['featured_image_variants'] or {}).get('src')
+    context = {
+        'articles': articles,
+        'site_url': site_url,
+        'site_name': config['SITE_NAME'],
+        'date': now,
+        'unsubscribe_url': UNSUBSCRIBE_PLACEHOLDER,
+    }
+    return NewsletterDigest.objects.create(
+        subject=config['SUBJECT'].format(site_name=config['SITE_NAME'], date=now),
+        html_body=render_to_string('news/digest.html', context),
+        text_body=render_to_string('news/digest.txt', context),
+        article_count=len(articles),
+        period_start=start,
+        period_end=now,
+    )
+
+
+class Issue:
+    """A digest's bodies split around the unsubscribe placeholder, ready to be filled per recipient"""
+
+    def __init__(self, digest, config):
+        self.config = config
+        self.subject = digest.subject
+        self.from_email = config['FROM_EMAIL'] or settings.DEFAULT_FROM_EMAIL
+        self.html = digest.html_body.split(UNSUBSCRIBE_PLACEHOLDER)
+        self.text = digest.text_body.split(UNSUBSCRIBE_PLACEHOLDER)
+
+    def message(self, email, connection=None):
+        from django.core.mail import EmailMultiAlternatives
+        from django.utils.html import escape
+
+        url = self.config['UNSUBSCRIBE_URL'].format(
+            site_url=self.config['SITE_URL'].rstrip('/'), token=quote(subscribers.unsubscribe_token(email))
+        )
+        message = EmailMultiAlternatives(
+            self.subject, url.join(self.text), self.from_email, [email], connection=connection,
+            headers={'List-Unsubscribe': f'<{url}>', 'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click'},
+        )
+        message.attach_alternative(escape(url).join(self.html), 'text/html')
+        return message
+
+
+def _dropped(error):
+    """Whether a send error means the connection is gone, rather than that the relay refused one message"""
+    # SMTPException is an OSError; other OSErrors are socket failures
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+
+class Sender:
+    """Sends batches on one reused backend connection per pool thread"""
+
+    def __init__(self, issue):
+        self.issue = issue
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        from django.core.mail import get_connection
+
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = get_connection(fail_silently=False)
+            connection.open()
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def send_batch(self, batch):
+        """Send ``[(pk, email), ...]``; returns ``(last pk, sent, failed)``"""
+        connection = self.connection()
+        sent = failed = 0
+        for _, email in batch:
+            try:
+                sent += connection.send_messages([self.issue.message(email, connection)])
+            except OSError as error:
+                if not _dropped(error):
+                    # Refused recipient, sender or data (e.g. a 554): this message fails, the run goes on
+                    failed += 1
+                    continue
+                # The relay dropped the connection: reconnect once, then give up on the run
+                connection.close()
+                connection.open()
+                sent += connection.send_messages([self.issue.message(email, connection)])
+        return batch[-1][0], sent, failed
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+def _batches(digest, batch_size):
+    from .models import Newsletter
+
+    rows = (
+        Newsletter.objects.filter(is_active=True, pk__gt=digest.checkpoint)
+        .order_by('pk').values_list('pk', 'email').iterator(chunk_size=batch_size * 10)
+    )
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def send_issue(digest, config=None, workers=None, batch_size=None):
+    """
+    Send ``digest`` to every active subscriber after its checkpoint.
+
+    Returns ``{'sent', 'failed', 'seconds', 'rate'}`` for this run; the
+    digest's own counters hold the totals of every run.
+    """
+    from django.utils import timezone
+    from .models import NewsletterDigest
+
+    config = config or get_config()
+    workers = workers or config['WORKERS']
+    batch_size = batch_size or config['BATCH_SIZE']
+    digests = NewsletterDigest.objects.filter(pk=digest.pk)
+    if digest.status == 'sent':
+        return {'sent': 0, 'failed': 0, 'seconds': 0.0, 'rate': 0.0}
+    if digest.started_at is None:
+        digest.started_at = timezone.now()
+    digest.status = 'sending'
+    digests.update(status='sending', started_at=digest.started_at)
+
+    sender = Sender(Issue(digest, config))
+    done = {}
+    pending = {}
+    totals = {'sent': 0, 'failed': 0}
+    next_index = 0
+    started = time.perf_counter()
+
+    def collect(futures):
+        nonlocal next_index
+        error = None
+        for future in futures:
+            index = pending.pop(future)
+            if future.exception() is None:
+                done[index] = future.result()
+            else:
+                error = error or future.exception()
+        checkpoint, sent, failed = None, 0, 0
+        while next_index in done:
+            checkpoint, batch_sent, batch_failed = done.pop(next_index)
+            sent, failed, next_index = sent + batch_sent, failed + batch_failed, next_index + 1
+        if checkpoint is not None:
+            digest.checkpoint = checkpoint
+            digests.update(checkpoint=checkpoint, sent_count=F('sent_count') + sent,
+                           failed_count=F('failed_count') + failed)
+            totals['sent'] += sent
+            totals['failed'] += failed
+        if error is not None:
+            raise error
+
+    try:
+        with ThreadPoolExecutor(workers, thread_name_prefix='digest') as pool:
+            try:
+                for index, batch in enumerate(_batches(digest, batch_size)):
+                    pending[pool.submit(sender.send_batch, batch)] = index
+                    if len(pending) >= workers * 2:
+                        collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                while pending:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+    finally:
+        sender.close()
+
+    digest.status, digest.finished_at = 'sent', timezone.now()
+    digests.update(status='sent', finished_at=digest.finished_at)
+    seconds = time.perf_counter() - started
+    return dict(totals, seconds=seconds, rate=totals['sent'] / seconds if seconds else 0.0)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from news import media
+from news.models import Article, Author
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored responsive image URLs of every article and author (e.g. after changing MEDIA_VARIANTS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        articles = media.backfill(Article, 'featured_image', 'featured_image_variants', media.article_variants,
+                                  chunk_size=options['chunk_size'])
+        authors = media.backfill(Author, 'avatar', 'avatar_variants', media.avatar_variants,
+                                 chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated image variants of {articles} articles and {authors} authors.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from news import richtext
+from news.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Reprocess the stored HTML, plain text and outline of every article body (e.g. after changing ARTICLE_CONTENT)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = richtext.backfill(Article, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated processed content of {updated} articles.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from news.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored word count and read time of every article'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        updated = 0
+        batch = []
+        articles = Article.objects.only('id', 'content').order_by('pk')
+        for article in articles.iterator(chunk_size=chunk_size):
+            article.update_reading_stats()
+            batch.append(article)
+            if len(batch) >= chunk_size:
+                updated += Article.objects.bulk_update(batch, ['word_count', 'read_time'])
+                batch = []
+        if batch:
+            updated += Article.objects.bulk_update(batch, ['word_count', 'read_time'])
+        self.stdout.write(self.style.SUCCESS(f'Updated reading stats for {updated} articles.'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news import publishing
+from news.models import Article
+
+ACTIONS = {
+    'publish': (publishing.publish, {}),
+    'unpublish': (publishing.unpublish, {}),
+    'archive': (publishing.unpublish, {'status': 'archived'}),
+    'feature': (publishing.feature, {}),
+    'unfeature': (publishing.feature, {'featured': False}),
+    'fix-dates': (publishing.fix_published_dates, {}),
+}
+
+
+class Command(BaseCommand):
+    help = 'Publish, unpublish, archive or (un)feature a batch of articles with set-based updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=sorted(ACTIONS))
+        parser.add_argument('--slug', action='append', default=[], help='Article slug (repeatable)')
+        parser.add_argument('--category', help='Category slug')
+        parser.add_argument('--author', type=int, help='Author id')
+        parser.add_argument('--status', choices=[value for value, _ in Article.STATUS_CHOICES])
+        parser.add_argument('--all', action='store_true', help='Act on every article when no filter is given')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many articles match')
+
+    def handle(self, *args, **options):
+        articles = Article.objects.all()
+        if options['slug']:
+            articles = articles.filter(slug__in=options['slug'])
+        if options['category']:
+            articles = articles.filter(category__slug=options['category'])
+        if options['author']:
+            articles = articles.filter(author_id=options['author'])
+        if options['status']:
+            articles = articles.filter(status=options['status'])
+        filtered = any(options[name] for name in ('slug', 'category', 'author', 'status'))
+        if not filtered and not options['all']:
+            raise CommandError('Select articles with --slug/--category/--author/--status, or pass --all')
+
+        if options['dry_run']:
+            self.stdout.write(f'{articles.count()} articles match.')
+            return
+        function, kwargs = ACTIONS[options['action']]
+        changed = function(articles, **kwargs)
+        self.stdout.write(self.style.SUCCESS(f'{options["action"]}: changed {changed} articles.'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from news import subscribers
+from news.models import Newsletter
+
+
+class Command(BaseCommand):
+    help = 'Write newsletter subscribers as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=sorted(subscribers.FORMATS), default='csv')
+        parser.add_argument('--output', default='-', help="Output file, or '-' for standard output")
+        parser.add_argument('--active', action='store_true', help='Only export active subscribers')
+        parser.add_argument('--chunk-size', type=int, default=subscribers.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = Newsletter.objects.all()
+        if options['active']:
+            queryset = queryset.filter(is_active=True)
+        lines = subscribers.export_subscribers(queryset, options['file_format'], options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = -1 if options['file_format'] == 'csv' else 0  # the CSV header
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line)
+                count += 1
+        self.stderr.write(f'Exported {count} subscribers to {options["output"]}.')
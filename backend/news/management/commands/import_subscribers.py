@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news import subscribers
+
+
+def guess_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+class Command(BaseCommand):
+    help = 'Subscribe every address of a CSV or NDJSON file to the newsletter, reactivating unsubscribed ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file, or '-' for standard input")
+        parser.add_argument('--format', dest='file_format', choices=sorted(subscribers.FORMATS),
+                            help='Input format (default: from the file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=subscribers.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or guess_format(path)
+        started = time.perf_counter()
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as error:
+            raise CommandError(error)
+        try:
+            result = subscribers.import_subscribers(stream, file_format, options['batch_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result.errors:
+            self.stderr.write(f'line {error["line"]}: {error["value"]!r}: {error["error"]}')
+        if result.invalid > len(result.errors):
+            self.stderr.write(f'... and {result.invalid - len(result.errors)} more invalid rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} subscribed, {result.reactivated} reactivated, {result.unchanged} unchanged, '
+            f'{result.invalid} invalid in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from news.counts import rebuild_published_counts, rebuild_tag_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored published article counts on categories, authors and tags'
+
+    def handle(self, *args, **options):
+        categories, authors = rebuild_published_counts()
+        tags = rebuild_tag_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt published article counts for {categories} categories, {authors} authors and {tags} tags.'
+        ))
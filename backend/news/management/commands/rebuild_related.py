@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news import related
+
+
+class Command(BaseCommand):
+    help = 'Recompute term statistics and the related-articles neighbour table for every published article'
+
+    def handle(self, *args, **options):
+        indexed = related.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt related articles for {indexed} articles.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from news import trending
+
+
+class Command(BaseCommand):
+    help = 'Prune expired trending buckets and leaderboard rows, optionally rebuilding the leaderboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every leaderboard row from the view buckets')
+        parser.add_argument('--seed', action='store_true',
+                            help='Before rebuilding, bucket the lifetime views of recent articles that have none')
+
+    def handle(self, *args, **options):
+        buckets, entries = trending.prune()
+        self.stdout.write(f'Pruned {buckets} view buckets and {entries} leaderboard rows.')
+        if options['seed']:
+            seeded = trending.seed_from_lifetime_views()
+            self.stdout.write(f'Seeded {seeded} articles from their lifetime views.')
+        if options['rebuild'] or options['seed']:
+            scored = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the leaderboard with {scored} articles.'))
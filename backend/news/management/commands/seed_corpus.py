@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from news.corpus import generate_corpus
+
+
+class Command(BaseCommand):
+    help = 'Seed a realistic synthetic corpus of categories, authors, tags and long HTML articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=8)
+        parser.add_argument('--authors', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--paragraphs', type=int, default=12, help='Approximate HTML blocks per article')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible corpora')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = generate_corpus(
+            articles=options['articles'],
+            categories=options['categories'],
+            authors=options['authors'],
+            tags=options['tags'],
+            paragraphs=options['paragraphs'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Seeded {created} articles.'))
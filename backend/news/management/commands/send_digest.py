@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news import digest
+from news.models import NewsletterDigest
+
+
+class Command(BaseCommand):
+    help = 'Build the next newsletter digest and send it, or resume the unfinished one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--digest', type=int, help='Resume this digest instead of the latest unfinished one')
+        parser.add_argument('--build-only', action='store_true', help='Build the next issue without sending it')
+        parser.add_argument('--workers', type=int, help='Sending threads (default: NEWSLETTER_DIGEST["WORKERS"])')
+        parser.add_argument('--batch-size', type=int,
+                            help='Messages per batch (default: NEWSLETTER_DIGEST["BATCH_SIZE"])')
+
+    def handle(self, *args, **options):
+        if options['digest']:
+            try:
+                issue = NewsletterDigest.objects.get(pk=options['digest'])
+            except NewsletterDigest.DoesNotExist:
+                raise CommandError(f'No digest {options["digest"]}')
+        else:
+            issue = None if options['build_only'] else (
+                NewsletterDigest.objects.exclude(status='sent').order_by('created_at').first()
+            )
+            if issue is None:
+                issue = digest.build_issue()
+                if issue is None:
+                    self.stdout.write('No articles were published since the last digest.')
+                    return
+                self.stdout.write(f'Built digest {issue.pk} "{issue.subject}" with {issue.article_count} articles.')
+            else:
+                self.stdout.write(f'Resuming digest {issue.pk} after subscriber {issue.checkpoint}.')
+        if options['build_only']:
+            return
+
+        result = digest.send_issue(issue, workers=options['workers'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {result["sent"]} messages ({result["failed"]} refused) in {result["seconds"]:.1f}s, '
+            f'{result["rate"]:.1f} messages/s.'
+        ))
@@ -0,0 +1,130 @@
+"""
+Responsive image URLs, computed once when an image is saved.
+
+Article and author images are Cloudinary resources, and Cloudinary
+transforms an image from parameters in its URL alone. image_variants()
+builds those URLs offline -- no API calls -- for every configured width
+with automatic format and quality, and the models store the result in
+a JSON column next to the image::
+
+    {'url': <original>, 'src': <default width>, 'srcset': '<url> 320w, <url> 640w, ...'}
+
+Serializers emit the stored dict, so rendering a list builds no URLs
+per row. Images given as full URLs outside Cloudinary cannot be
+transformed and get their original URL as ``src`` and no ``srcset``.
+"""
+import re
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ARTICLE_WIDTHS': (320, 640, 960, 1280, 1920),
+    'ARTICLE_DEFAULT_WIDTH': 960,
+    'AVATAR_WIDTHS': (64, 128, 256),
+    'AVATAR_DEFAULT_WIDTH': 128,
+    # Never upscale; let Cloudinary pick the format (WebP/AVIF) and quality per browser
+    'TRANSFORMATION': {'crop': 'limit', 'fetch_format': 'auto', 'quality': 'auto'},
+}
+
+# An untransformed delivery URL: .../<cloud>/image/upload/[v<version>/]<public id>[.<format>]
+CLOUDINARY_URL_RE = re.compile(
+    r'^https?://res\.cloudinary\.com/(?P<cloud_name>[^/]+)/image/upload/'
+    r'(?:v(?P<version>\d+)/)?(?P<public_id>[^?#]+?)(?:\.(?P<format>[A-Za-z0-9]+))?$'
+)
+# First path segment of a URL that already carries a transformation, e.g. c_fill,w_300
+TRANSFORMATION_RE = re.compile(r'^[a-z]{1,3}_[^/,]*(,[a-z]{1,3}_[^/,]*)*$')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'MEDIA_VARIANTS', {}))
+    return config
+
+
+def _source(image):
+    """
+    Return ``(options, url)`` for a CloudinaryField value.
+
+    ``options`` are the cloudinary_url() arguments of a transformable
+    image and None otherwise; ``url`` is set for external images.
+    """
+    if not image:
+        return None, None
+    if isinstance(image, str):
+        public_id, image_format, version = image, None, None
+    else:
+        public_id, image_format, version = image.public_id, image.format, image.version
+    if not public_id:
+        return None, None
+    if public_id.startswith(('http://', 'https://')):
+        # CloudinaryField splits the extension off full URLs as well
+        url = f'{public_id}.{image_format}' if image_format else public_id
+        match = CLOUDINARY_URL_RE.match(url)
+        if match is None or TRANSFORMATION_RE.match(match['public_id'].split('/', 1)[0]):
+            return None, url
+        return {key: value for key, value in match.groupdict().items() if value}, None
+    options = {'public_id': public_id}
+    if image_format:
+        options['format'] = image_format
+    if version:
+        options['version'] = version
+    return options, None
+
+
+def image_variants(image, widths, default_width, config=None):
+    """Variant URLs of a CloudinaryField value (resource, public id or URL); ``{}`` without an image"""
+    from cloudinary.utils import cloudinary_url
+
+    config = config or get_config()
+    options, url = _source(image)
+    if url is not None:
+        return {'url': url, 'src': url, 'srcset': ''}
+    if options is None:
+        return {}
+    public_id = options.pop('public_id')
+
+    def build(**transformation):
+        return cloudinary_url(public_id, secure=True, **options, **transformation)[0]
+
+    try:
+        variants = {
+            width: build(transformation=[dict(config['TRANSFORMATION'], width=width)])
+            for width in sorted(set(widths) | {default_width})
+        }
+        original = build()
+    except ValueError:
+        # No cloud name configured: serializers fall back to the field's own URL
+        return {}
+    return {
+        'url': original,
+        'src': variants[default_width],
+        'srcset': ', '.join(f'{variants[width]} {width}w' for width in sorted(widths)),
+    }
+
+
+def article_variants(image, config=None):
+    config = config or get_config()
+    return image_variants(image, config['ARTICLE_WIDTHS'], config['ARTICLE_DEFAULT_WIDTH'], config)
+
+
+def avatar_variants(image, config=None):
+    config = config or get_config()
+    return image_variants(image, config['AVATAR_WIDTHS'], config['AVATAR_DEFAULT_WIDTH'], config)
+
+
+def backfill(model, image_field, variants_field, build, chunk_size=500):
+    """Recompute ``variants_field`` of every row of ``model``; returns the number of rows changed"""
+    updated = 0
+    batch = []
+    rows = model.objects.only('pk', image_field, variants_field).order_by('pk')
+    for row in rows.iterator(chunk_size=chunk_size):
+        variants = build(getattr(row, image_field))
+        if variants != getattr(row, variants_field):
+            setattr(row, variants_field, variants)
+            batch.append(row)
+        if len(batch) >= chunk_size:
+            updated += model.objects.bulk_update(batch, [variants_field])
+            batch = []
+    if batch:
+        updated += model.objects.bulk_update(batch, [variants_field])
+    return updated
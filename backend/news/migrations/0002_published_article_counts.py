@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+import cloudinary.models
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_published_counts(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    for model_name, fk_name in (('Category', 'category'), ('Author', 'author')):
+        published = (
+            Article.objects.filter(status='published', **{fk_name: OuterRef('pk')})
+            .order_by()
+            .values(fk_name)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        apps.get_model('news', model_name).objects.update(
+            published_article_count=Coalesce(Subquery(published), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='published_article_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_article_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='featured_image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='featured_image'),
+        ),
+        migrations.AlterField(
+            model_name='author',
+            name='avatar',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='avatar'),
+        ),
+        migrations.RunPython(backfill_published_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import news.models
+
+from news.text import strip_html
+
+FTS_TABLE = 'news_article_fts'
+POSTGRES_DOCUMENT_SQL = (
+    "setweight(to_tsvector('english', %s), 'A') || "
+    "setweight(to_tsvector('english', %s), 'B') || "
+    "setweight(to_tsvector('english', %s), 'C') || "
+    "setweight(to_tsvector('english', %s), 'D')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE news_article ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            'CREATE INDEX news_article_search_vector_gin ON news_article USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "title, excerpt, body, meta, tokenize='porter unicode61')"
+        )
+        # Make the hidden rank column a weighted bm25: title > excerpt > body > meta
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 1.0)')"
+        )
+    else:
+        return
+
+    # Tags are picked up by the next `manage.py rebuild_search_index`
+    Article = apps.get_model('news', 'Article')
+    rows = Article.objects.select_related('author', 'category').order_by('pk')
+    with schema_editor.connection.cursor() as cursor:
+        for article in rows.iterator(chunk_size=500):
+            document = (
+                article.title,
+                article.excerpt,
+                strip_html(article.content),
+                f'{article.author.name} {article.category.name}',
+            )
+            if vendor == 'postgresql':
+                cursor.execute(
+                    f'UPDATE news_article SET search_vector = {POSTGRES_DOCUMENT_SQL} WHERE id = %s',
+                    [*document, article.pk],
+                )
+            else:
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, body, meta) VALUES (%s, %s, %s, %s, %s)',
+                    [article.pk, *document],
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS news_article_search_vector_gin')
+        schema_editor.execute('ALTER TABLE news_article DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_published_article_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.CreateModel(
+            name='ArticleSearchDocument',
+            fields=[
+                ('article', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='news.article')),
+                ('document', news.models.SearchDocumentField(db_column='news_article_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'news_article_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+from news.text import count_words, read_time_minutes
+
+
+def backfill_reading_stats(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    batch = []
+    for article in Article.objects.only('id', 'content').order_by('pk').iterator(chunk_size=500):
+        article.word_count = count_words(article.content)
+        article.read_time = read_time_minutes(article.word_count)
+        batch.append(article)
+        if len(batch) >= 500:
+            Article.objects.bulk_update(batch, ['word_count', 'read_time'])
+            batch = []
+    Article.objects.bulk_update(batch, ['word_count', 'read_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_article_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='read_time',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Estimated read time in minutes'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_reading_stats, migrations.RunPython.noop),
+    ]
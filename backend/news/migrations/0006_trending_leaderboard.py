@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_article_reading_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (see TRENDING["BUCKET_MINUTES"])')),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='news.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='article_view_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'bucket'), name='article_view_bucket_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='news.article')),
+                ('score', models.FloatField(default=0)),
+                ('scored_at', models.DateTimeField()),
+                ('rank', models.FloatField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='news.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-rank'], name='trending_rank_idx'), models.Index(fields=['category', '-rank'], name='trending_category_rank_idx')],
+            },
+        ),
+    ]
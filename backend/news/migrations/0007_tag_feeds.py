@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.deletion
+import taggit.managers
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _article_content_type(apps):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    return ContentType.objects.get_or_create(app_label='news', model='article')[0]
+
+
+def move_tags_to_tagged_article(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TaggedArticle = apps.get_model('news', 'TaggedArticle')
+    items = TaggedItem.objects.filter(content_type=_article_content_type(apps))
+    rows = items.filter(object_id__in=Article.objects.values('pk')).values_list('object_id', 'tag_id')
+    TaggedArticle.objects.bulk_create(
+        [TaggedArticle(content_object_id=article_id, tag_id=tag_id) for article_id, tag_id in rows.iterator()],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    items.delete()
+
+
+def move_tags_to_tagged_item(apps, schema_editor):
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TaggedArticle = apps.get_model('news', 'TaggedArticle')
+    content_type = _article_content_type(apps)
+    TaggedItem.objects.bulk_create(
+        [TaggedItem(content_type=content_type, object_id=article_id, tag_id=tag_id)
+         for article_id, tag_id in TaggedArticle.objects.values_list('content_object_id', 'tag_id').iterator()],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    TaggedArticle.objects.all().delete()
+
+
+def backfill_tag_stats(apps, schema_editor):
+    Tag = apps.get_model('taggit', 'Tag')
+    TagStats = apps.get_model('news', 'TagStats')
+    TaggedArticle = apps.get_model('news', 'TaggedArticle')
+    TagStats.objects.bulk_create([TagStats(tag_id=pk) for pk in Tag.objects.values_list('pk', flat=True)],
+                                 batch_size=1000, ignore_conflicts=True)
+    published = (
+        TaggedArticle.objects.filter(tag=OuterRef('pk'), content_object__status='published')
+        .order_by()
+        .values('tag')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    TagStats.objects.update(published_article_count=Coalesce(Subquery(published), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('news', '0006_trending_leaderboard'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaggedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagged_items', to='news.article')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_items', to='taggit.tag')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='tags',
+            field=taggit.managers.TaggableManager(blank=True, help_text='A comma-separated list of tags.', through='news.TaggedArticle', to='taggit.Tag', verbose_name='Tags'),
+        ),
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='taggit.tag')),
+                ('published_article_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'tag stats',
+                'indexes': [models.Index(fields=['-published_article_count'], name='tag_stats_count_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taggedarticle',
+            constraint=models.UniqueConstraint(fields=('tag', 'content_object'), name='tagged_article_unique'),
+        ),
+        migrations.RunPython(move_tags_to_tagged_article, move_tags_to_tagged_item),
+        migrations.RunPython(backfill_tag_stats, migrations.RunPython.noop),
+    ]
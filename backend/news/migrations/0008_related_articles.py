@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_tag_feeds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermStats',
+            fields=[
+                ('term', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('documents', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'term stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='news.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', '-weight'], name='article_term_weight_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'term'), name='article_term_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='news.article')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_from', to='news.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['article', 'rank'], name='related_article_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'related'), name='related_article_unique')],
+            },
+        ),
+    ]
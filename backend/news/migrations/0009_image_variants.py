@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+from news import media
+
+
+def backfill_image_variants(apps, schema_editor):
+    media.backfill(apps.get_model('news', 'Article'), 'featured_image', 'featured_image_variants',
+                   media.article_variants)
+    media.backfill(apps.get_model('news', 'Author'), 'avatar', 'avatar_variants', media.avatar_variants)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_related_articles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='featured_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(backfill_image_variants, migrations.RunPython.noop),
+    ]
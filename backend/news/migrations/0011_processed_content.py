@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+from news import richtext
+
+
+def backfill_processed_content(apps, schema_editor):
+    richtext.backfill(apps.get_model('news', 'Article'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_newsletter_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='content_outline',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='content_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(backfill_processed_content, migrations.RunPython.noop),
+    ]
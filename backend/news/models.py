@@ -3,20 +3,13 @@ from django.urls import reverse
 from django.utils.text import slugify
 from django.contrib.auth.models import User
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItemBase
 from ckeditor.fields import RichTextField
 from cloudinary.models import CloudinaryField
 from django.conf import settings
+from .text import count_words, read_time_minutes
+from . import media, richtext
 
-CLOUDINARY_BASE_URL = 'https://res.cloudinary.com/djytturna/'
-
-def ensure_full_cloudinary_url(url):
-    if not url:
-        return ''
-    if url.startswith('http://') or url.startswith('https://'):
-        return url
-    if url.startswith('image/upload/'):
-        return CLOUDINARY_BASE_URL + url
-    return url
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -25,6 +18,7 @@ class Category(models.Model):
     color = models.CharField(max_length=7, default="#C14444")
     order = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    published_article_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -45,18 +39,22 @@ class Category(models.Model):
     
     @property
     def article_count(self):
-        return self.articles.filter(status='published').count()
+        """Stored count of published articles, maintained by news.signals"""
+        return self.published_article_count
 
 class Author(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=200)
     bio = models.TextField()
     avatar = CloudinaryField('avatar', blank=True, null=True)
+    # Original and responsive variant URLs of the avatar, computed on save (news.media)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     email = models.EmailField()
     twitter_handle = models.CharField(max_length=50, blank=True)
     linkedin_url = models.URLField(blank=True)
     website = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
+    published_article_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -66,12 +64,40 @@ class Author(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'avatar' in update_fields:
+            self.avatar_variants = media.avatar_variants(self.avatar)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'avatar_variants'}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('author-detail', kwargs={'pk': self.pk})
     
     @property
     def article_count(self):
-        return self.articles.filter(status='published').count()
+        """Stored count of published articles, maintained by news.signals"""
+        return self.published_article_count
+
+
+PUBLISHED = models.Q(status='published')
+
+
+class ArticleQuerySet(models.QuerySet):
+    # Large columns that list endpoints never render
+    LISTING_DEFERRED_FIELDS = ('content', 'content_html', 'content_text', 'content_outline')
+    # The detail endpoint serves content_html; the editor's source is only read by the admin
+    DETAIL_DEFERRED_FIELDS = ('content', 'content_text')
+
+    def for_listing(self):
+        """Skip reading the article body for feeds, cards and search results"""
+        return self.defer(*self.LISTING_DEFERRED_FIELDS)
+
+    def for_detail(self):
+        """Read the processed body only"""
+        return self.defer(*self.DETAIL_DEFERRED_FIELDS)
+
 
 class Article(models.Model):
     STATUS_CHOICES = [
@@ -85,9 +111,11 @@ class Article(models.Model):
     excerpt = models.TextField()
     content = RichTextField()
     featured_image = CloudinaryField('featured_image', null=True, blank=True)
+    # Original and responsive variant URLs of the featured image, computed on save (news.media)
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='articles')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='articles')
-    tags = TaggableManager(blank=True)
+    tags = TaggableManager(blank=True, through='TaggedArticle')
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     is_featured = models.BooleanField(default=False)
@@ -103,9 +131,36 @@ class Article(models.Model):
     
     # Analytics
     views_count = models.PositiveIntegerField(default=0)
+
+    # Derived from content on save
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    read_time = models.PositiveIntegerField(default=1, editable=False, help_text='Estimated read time in minutes')
+    # Sanitized, minified body, its plain text and heading outline (news.richtext)
+    content_html = models.TextField(blank=True, editable=False)
+    content_text = models.TextField(blank=True, editable=False)
+    content_outline = models.JSONField(default=list, blank=True, editable=False)
+
+    objects = ArticleQuerySet.as_manager()
     
     class Meta:
         ordering = ['-published_date', '-created_at']
+        indexes = [
+            # Public feeds: every API queryset filters status='published' and
+            # orders by the default ordering, optionally narrowed by one flag/FK
+            models.Index(fields=['-published_date', '-created_at'], name='article_pub_date_idx',
+                         condition=PUBLISHED),
+            models.Index(fields=['category', '-published_date', '-created_at'], name='article_pub_category_idx',
+                         condition=PUBLISHED),
+            models.Index(fields=['author', '-published_date', '-created_at'], name='article_pub_author_idx',
+                         condition=PUBLISHED),
+            models.Index(fields=['-published_date', '-created_at'], name='article_pub_featured_idx',
+                         condition=PUBLISHED & models.Q(is_featured=True)),
+            models.Index(fields=['-published_date', '-created_at'], name='article_pub_breaking_idx',
+                         condition=PUBLISHED & models.Q(is_breaking=True)),
+            # Admin changelist: status filter, date_hierarchy and created_at filter
+            models.Index(fields=['status', '-published_date', '-created_at'], name='article_status_date_idx'),
+            models.Index(fields=['-created_at'], name='article_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -122,22 +177,199 @@ class Article(models.Model):
         if self.status == 'published' and not self.published_date:
             from django.utils import timezone
             self.published_date = timezone.now()
+
+        update_fields = kwargs.get('update_fields')
+        if 'content' not in self.get_deferred_fields() and (update_fields is None or 'content' in update_fields):
+            self.update_reading_stats()
+            self.update_processed_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'word_count', 'read_time', 'content_html', 'content_text', 'content_outline',
+                }
+        if 'featured_image' not in self.get_deferred_fields() and (
+            update_fields is None or 'featured_image' in update_fields
+        ):
+            self.featured_image_variants = media.article_variants(self.featured_image)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'featured_image_variants'}
         
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('article-detail', kwargs={'slug': self.slug})
 
-    @property
-    def read_time(self):
-        """Calculate estimated read time in minutes"""
-        words_per_minute = 200
-        word_count = len(self.content.split())
-        return max(1, round(word_count / words_per_minute))
+    def update_reading_stats(self):
+        """Recompute word_count and read_time from the HTML-stripped content"""
+        self.word_count = count_words(self.content)
+        self.read_time = read_time_minutes(self.word_count)
+
+    def update_processed_content(self):
+        """Recompute content_html, content_text and content_outline from content"""
+        self.content_html, self.content_text, self.content_outline = richtext.process(self.content)
 
     def increment_views(self):
+        """Atomically add one view; request paths should use news.view_counter"""
+        Article.objects.filter(pk=self.pk).update(views_count=models.F('views_count') + 1)
         self.views_count += 1
-        self.save(update_fields=['views_count'])
+
+
+class TaggedArticle(TaggedItemBase):
+    """
+    Tag assignment with a real foreign key to the article.
+
+    Replaces taggit's generic TaggedItem so tag feeds join through the
+    (tag, article) index instead of matching content type and object id.
+    """
+    content_object = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='tagged_items')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'content_object'], name='tagged_article_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_object_id}: {self.tag_id}'
+
+
+class TagStats(models.Model):
+    """Published article count of a tag, kept current by news.signals like Category's"""
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    published_article_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'tag stats'
+        indexes = [
+            models.Index(fields=['-published_article_count'], name='tag_stats_count_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.published_article_count}'
+
+class SearchDocumentField(models.TextField):
+    """The FTS5 table column of ArticleSearchDocument, queried with ``__match``"""
+
+
+@SearchDocumentField.register_lookup
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class ArticleSearchDocument(models.Model):
+    """
+    Read-only view of the SQLite FTS5 search index (see news.search).
+
+    The virtual table is created by migration only on SQLite; PostgreSQL
+    keeps its tsvector on news_article instead.
+    """
+    article = models.OneToOneField(
+        Article, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='search_document',
+    )
+    document = SearchDocumentField(db_column='news_article_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'news_article_fts'
+
+
+class ArticleViewBucket(models.Model):
+    """Views of one article within one time bucket; the raw input of trending scores"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='view_buckets')
+    bucket = models.DateTimeField(help_text='Start of the bucket (see TRENDING["BUCKET_MINUTES"])')
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'bucket'], name='article_view_bucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='article_view_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id} @ {self.bucket:%Y-%m-%d %H:%M}: {self.views}'
+
+
+class TrendingScore(models.Model):
+    """
+    Leaderboard entry holding an article's time-decayed view score.
+
+    ``score`` is decayed to ``scored_at``; ``rank`` is the forward-decayed
+    sort key maintained by news.trending, so ordering by it needs no
+    rewriting as time passes.
+    """
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    # Denormalized from the article so each category has its own leaderboard index
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(default=0)
+    scored_at = models.DateTimeField()
+    rank = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rank'], name='trending_rank_idx'),
+            models.Index(fields=['category', '-rank'], name='trending_category_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id}: {self.score:.1f}'
+
+
+class ArticleTerm(models.Model):
+    """One of a published article's strongest TF-IDF terms; the postings of news.related"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'term'], name='article_term_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['term', '-weight'], name='article_term_weight_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id}: {self.term} ({self.weight:.3f})'
+
+
+class TermStats(models.Model):
+    """Number of published articles containing a term, as of the last related-articles rebuild"""
+    term = models.CharField(max_length=64, primary_key=True)
+    documents = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name_plural = 'term stats'
+
+    def __str__(self):
+        return f'{self.term}: {self.documents}'
+
+
+class RelatedArticle(models.Model):
+    """A precomputed neighbour of an article, ``rank`` 0 being the most related"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='related_from')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'related'], name='related_article_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['article', 'rank'], name='related_article_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id} -> {self.related_id} ({self.score:.3f})'
+
 
 class Newsletter(models.Model):
     email = models.EmailField(unique=True)
@@ -151,6 +383,41 @@ class Newsletter(models.Model):
     def __str__(self):
         return self.email
 
+
+class NewsletterDigest(models.Model):
+    """
+    One digest issue: its bodies, rendered once, and the progress of sending it.
+
+    ``checkpoint`` is the Newsletter pk up to which every active
+    subscriber has been sent the issue; an interrupted run resumes after it.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+    ]
+
+    subject = models.CharField(max_length=200)
+    html_body = models.TextField()
+    text_body = models.TextField()
+    article_count = models.PositiveIntegerField(default=0)
+    period_start = models.DateTimeField(help_text='Articles published after this time are in the issue')
+    period_end = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    checkpoint = models.PositiveBigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.subject} ({self.status})'
+
+
 class Contact(models.Model):
     SUBJECT_CHOICES = [
         ('general', 'General Inquiry'),
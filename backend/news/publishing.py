@@ -0,0 +1,104 @@
+"""
+Set-based publishing workflow for batches of articles.
+
+Saving articles one by one fires the per-article signals in
+``news.signals`` for every row: counters, trending, search and related
+articles each cost a few queries per article. The functions here change
+a whole batch with a handful of UPDATE statements in one transaction,
+fill in the fields ``Article.save()`` would derive (published_date,
+meta_title, meta_description) in SQL, and then send ``articles_changed``
+once with every changed article id. The receivers in ``news.signals``
+bring the derived data up to date for the batch as a whole.
+
+Every function takes an Article queryset and returns the number of
+articles it changed; rows already in the requested state are skipped.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce, Substr
+from django.dispatch import Signal
+
+# Sent once per batch with ``article_ids`` (changed articles) and
+# ``fields`` (the columns that may have changed for them)
+articles_changed = Signal()
+
+BATCH_SIZE = 500
+
+
+def _update(article_ids, **values):
+    from .models import Article
+
+    ids = list(article_ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        Article.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).update(**values)
+
+
+def _changed(article_ids, fields):
+    from .models import Article
+
+    if article_ids:
+        articles_changed.send(sender=Article, article_ids=list(article_ids), fields=frozenset(fields))
+    return len(article_ids)
+
+
+@transaction.atomic
+def publish(queryset, now=None):
+    """Publish a batch, stamping missing published dates and meta fields like ``Article.save()``"""
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    article_ids = list(
+        queryset.select_for_update()
+        .filter(~Q(status='published') | Q(published_date__isnull=True))
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    _update(
+        article_ids,
+        status='published',
+        published_date=Coalesce(F('published_date'), Value(now)),
+        meta_title=Case(When(meta_title='', then=Substr('title', 1, 60)), default=F('meta_title')),
+        meta_description=Case(When(meta_description='', then=Substr('excerpt', 1, 160)),
+                              default=F('meta_description')),
+        updated_at=now,
+    )
+    return _changed(article_ids, {'status', 'published_date', 'meta_title', 'meta_description'})
+
+
+@transaction.atomic
+def unpublish(queryset, status='draft', now=None):
+    """Move a batch to ``status`` (draft or archived)"""
+    from django.utils import timezone
+
+    if status == 'published':
+        raise ValueError('Use publish() to publish articles')
+    article_ids = list(
+        queryset.select_for_update().exclude(status=status).order_by('pk').values_list('pk', flat=True)
+    )
+    _update(article_ids, status=status, updated_at=now or timezone.now())
+    return _changed(article_ids, {'status'})
+
+
+@transaction.atomic
+def feature(queryset, featured=True, now=None):
+    """Set or clear ``is_featured`` on a batch"""
+    from django.utils import timezone
+
+    article_ids = list(
+        queryset.select_for_update().exclude(is_featured=featured).order_by('pk').values_list('pk', flat=True)
+    )
+    _update(article_ids, is_featured=featured, updated_at=now or timezone.now())
+    return _changed(article_ids, {'is_featured'})
+
+
+@transaction.atomic
+def fix_published_dates(queryset, now=None):
+    """Give published articles without a published_date their creation time"""
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    article_ids = list(
+        queryset.select_for_update().filter(status='published', published_date__isnull=True)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    _update(article_ids, published_date=Coalesce(F('created_at'), Value(now)), updated_at=now)
+    return _changed(article_ids, {'published_date'})
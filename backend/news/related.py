@@ -0,0 +1,373 @@
+"""
+Precomputed related articles.
+
+Every published article keeps its ``TOP_K`` most related published
+articles in RelatedArticle, scored as::
+
+    TEXT_WEIGHT * text similarity + TAG_WEIGHT * tag overlap (Jaccard)
+
+Text similarity compares TF-IDF vectors of the title (counted three
+times), excerpt (twice) and HTML-stripped content. Each article stores
+only its ``TERMS_PER_ARTICLE`` strongest terms, L2-normalised, as
+ArticleTerm postings, and text similarity is the dot product of those
+truncated vectors. Instead of comparing all pairs, candidates are the top
+``POSTINGS_PER_TERM`` postings of the article's ``QUERY_TERMS`` strongest
+terms plus the most recent articles sharing a tag. Scores are symmetric,
+which lets refresh() merge a changed article into its neighbours' lists.
+
+rebuild() recomputes everything and snapshots document frequencies in
+TermStats. refresh() updates one article and the neighbour lists it
+enters or leaves, reusing that snapshot; terms unknown to it are ignored
+until the next rebuild, so run ``rebuild_related`` periodically.
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .search import TOKEN_RE
+from .text import strip_html
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TOP_K': 6,
+    'TERMS_PER_ARTICLE': 24,
+    'QUERY_TERMS': 8,
+    'POSTINGS_PER_TERM': 50,
+    'TEXT_WEIGHT': 0.6,
+    'TAG_WEIGHT': 0.4,
+    # Larger publishing batches are left to the next rebuild
+    'BATCH_REFRESH_LIMIT': 50,
+}
+FIELD_WEIGHTS = (('title', 3), ('excerpt', 2), ('content', 1))
+STOPWORDS = frozenset(
+    'about above after again against all also and any are because been before being below between both but '
+    'can could did does doing down during each few for from further had has have having her here hers herself '
+    'him himself his how into its itself just more most much must myself nor not now off once only other our '
+    'ours ourselves out over own said same she should some such than that the their theirs them themselves then '
+    'there these they this those through too under until very was were what when where which while who whom '
+    'why will with would you your yours yourself yourselves'.split()
+)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RELATED', {}))
+    return config
+
+
+def tokenize(text):
+    """Lower-cased words of three or more letters, without stopwords and numbers"""
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if 3 <= len(token) <= 64 and not token.isdigit() and token not in STOPWORDS
+    ]
+
+
+def term_counts(title, excerpt, content):
+    counts = Counter()
+    for text, (_, weight) in zip((title or '', excerpt or '', strip_html(content)), FIELD_WEIGHTS):
+        for token in tokenize(text):
+            counts[token] += weight
+    return counts
+
+
+def weigh(counts, documents, total, limit):
+    """
+    The ``limit`` strongest TF-IDF weights of ``counts``, L2-normalised.
+
+    ``documents`` maps terms to document frequencies; terms missing from
+    it are skipped.
+    """
+    weights = {}
+    for term, count in counts.items():
+        df = documents.get(term)
+        if not df:
+            continue
+        weights[term] = (1 + math.log(count)) * (math.log((1 + total) / (1 + df)) + 1)
+    strongest = heapq.nlargest(limit, weights.items(), key=lambda item: (item[1], item[0]))
+    norm = math.sqrt(sum(weight * weight for _, weight in strongest))
+    return {term: weight / norm for term, weight in strongest} if norm else {}
+
+
+def query_terms(vector, config):
+    return heapq.nlargest(config['QUERY_TERMS'], vector.items(), key=lambda item: (item[1], item[0]))
+
+
+def score_candidates(vector, tags, candidates, vectors, tags_of, config):
+    """
+    Score ``candidates`` against one article; returns ``{article_id: score}`` for positive scores.
+
+    ``vectors`` and ``tags_of`` hold the candidates' term vectors and tag sets.
+    """
+    text_weight, tag_weight = config['TEXT_WEIGHT'], config['TAG_WEIGHT']
+    scores = {}
+    for article_id in candidates:
+        score = 0.0
+        other = vectors.get(article_id)
+        if other and vector:
+            # Summed in term order so a pair scores bit-for-bit the same from either side
+            score = text_weight * sum(vector[term] * other[term] for term in sorted(vector.keys() & other.keys()))
+        other_tags = tags_of.get(article_id)
+        if tags and other_tags:
+            shared = len(tags & other_tags)
+            if shared:
+                score += tag_weight * shared / (len(tags) + len(other_tags) - shared)
+        if score > 0:
+            scores[article_id] = score
+    return scores
+
+
+def top_neighbours(scores, k):
+    """The ``k`` best ``(article_id, score)`` pairs; ties go to the newer article"""
+    return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+def _published_articles():
+    from .models import Article
+    return Article.objects.filter(status='published')
+
+
+def _links(article_id, neighbours):
+    from .models import RelatedArticle
+    return [
+        RelatedArticle(article_id=article_id, related_id=related_id, score=score, rank=rank)
+        for rank, (related_id, score) in enumerate(neighbours)
+    ]
+
+
+@transaction.atomic
+def rebuild(batch_size=1000):
+    """Recompute term statistics, postings and every neighbour list; returns the articles indexed"""
+    from .models import ArticleTerm, RelatedArticle, TaggedArticle, TermStats
+
+    config = get_config()
+    counts = {}
+    rows = _published_articles().order_by('pk').values_list('pk', 'title', 'excerpt', 'content')
+    for pk, title, excerpt, content in rows.iterator(chunk_size=batch_size):
+        counts[pk] = term_counts(title, excerpt, content)
+    documents = Counter(term for article_counts in counts.values() for term in article_counts)
+    vectors = {
+        pk: weigh(article_counts, documents, len(counts), config['TERMS_PER_ARTICLE'])
+        for pk, article_counts in counts.items()
+    }
+    del counts
+
+    tags_of = defaultdict(set)
+    tagged = TaggedArticle.objects.filter(content_object__status='published').values_list(
+        'content_object_id', 'tag_id'
+    )
+    for article_id, tag_id in tagged.iterator(chunk_size=batch_size * 5):
+        tags_of[article_id].add(tag_id)
+
+    # Impact-ordered postings: the strongest articles per term, the newest per tag
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((weight, pk))
+    for term, entries in postings.items():
+        postings[term] = heapq.nlargest(config['POSTINGS_PER_TERM'], entries)
+    by_tag = defaultdict(list)
+    for pk in sorted(tags_of, reverse=True):
+        for tag_id in tags_of[pk]:
+            if len(by_tag[tag_id]) < config['POSTINGS_PER_TERM']:
+                by_tag[tag_id].append(pk)
+
+    links = []
+    for pk, vector in vectors.items():
+        tags = tags_of.get(pk, set())
+        candidates = {other for term, _ in query_terms(vector, config) for _, other in postings[term]}
+        candidates.update(other for tag_id in tags for other in by_tag[tag_id])
+        candidates.discard(pk)
+        scores = score_candidates(vector, tags, candidates, vectors, tags_of, config)
+        links.extend(_links(pk, top_neighbours(scores, config['TOP_K'])))
+
+    RelatedArticle.objects.all().delete()
+    ArticleTerm.objects.all().delete()
+    TermStats.objects.all().delete()
+    TermStats.objects.bulk_create(
+        [TermStats(term=term, documents=count) for term, count in documents.items()], batch_size=batch_size
+    )
+    ArticleTerm.objects.bulk_create(
+        [ArticleTerm(article_id=pk, term=term, weight=weight) for pk, vector in vectors.items()
+         for term, weight in vector.items()],
+        batch_size=batch_size,
+    )
+    RelatedArticle.objects.bulk_create(links, batch_size=batch_size)
+    return len(vectors)
+
+
+def _score(article_id, vector, tags, config, extra=()):
+    """Score one article's candidates (plus ``extra`` articles) from the stored postings"""
+    from .models import ArticleTerm, TaggedArticle
+
+    candidates = set(extra)
+    for term, _ in query_terms(vector, config):
+        candidates.update(
+            ArticleTerm.objects.filter(term=term)
+            .order_by('-weight').values_list('article_id', flat=True)[:config['POSTINGS_PER_TERM']]
+        )
+    for tag_id in tags:
+        candidates.update(
+            TaggedArticle.objects.filter(tag_id=tag_id, content_object__status='published')
+            .order_by('-content_object_id')
+            .values_list('content_object_id', flat=True)[:config['POSTINGS_PER_TERM']]
+        )
+    candidates.discard(article_id)
+    if not candidates:
+        return {}
+
+    vectors, tags_of = defaultdict(dict), defaultdict(set)
+    terms = ArticleTerm.objects.filter(article_id__in=list(candidates))
+    for other, term, weight in terms.values_list('article_id', 'term', 'weight'):
+        vectors[other][term] = weight
+    if tags:
+        shared = TaggedArticle.objects.filter(content_object_id__in=list(candidates))
+        for other, tag_id in shared.values_list('content_object_id', 'tag_id'):
+            tags_of[other].add(tag_id)
+    return score_candidates(vector, tags, candidates, vectors, tags_of, config)
+
+
+def _tags(article_id):
+    from .models import TaggedArticle
+    return set(TaggedArticle.objects.filter(content_object_id=article_id).values_list('tag_id', flat=True))
+
+
+def _replace_lists(lists):
+    """Store ``{article_id: [(related_id, score), ...]}`` as the complete neighbour lists of those articles"""
+    from .models import RelatedArticle
+
+    if not lists:
+        return
+    RelatedArticle.objects.filter(article_id__in=list(lists)).delete()
+    RelatedArticle.objects.bulk_create(
+        [link for article_id, neighbours in lists.items() for link in _links(article_id, neighbours)]
+    )
+
+
+def recompute(article_id, config=None):
+    """Recompute one published article's neighbour list from its stored terms"""
+    from .models import ArticleTerm
+
+    config = config or get_config()
+    vector = dict(ArticleTerm.objects.filter(article_id=article_id).values_list('term', 'weight'))
+    scores = _score(article_id, vector, _tags(article_id), config)
+    _replace_lists({article_id: top_neighbours(scores, config['TOP_K'])})
+
+
+@transaction.atomic
+def remove(article_id):
+    """Drop an article from the index and refill the neighbour lists it was part of"""
+    from .models import ArticleTerm, RelatedArticle
+
+    config = get_config()
+    referrers = set(RelatedArticle.objects.filter(related_id=article_id).values_list('article_id', flat=True))
+    RelatedArticle.objects.filter(article_id=article_id).delete()
+    RelatedArticle.objects.filter(related_id=article_id).delete()
+    ArticleTerm.objects.filter(article_id=article_id).delete()
+    for referrer in sorted(referrers):
+        recompute(referrer, config)
+
+
+@transaction.atomic
+def refresh(article_id):
+    """
+    Re-index one article and update only the neighbourhoods it affects.
+
+    The article's own list is recomputed; every candidate it now beats,
+    or used to appear in, gets the article merged into its list, and
+    lists that would fall short of TOP_K are recomputed in full.
+    """
+    from .models import Article, ArticleTerm, RelatedArticle, TermStats
+
+    article = _published_articles().filter(pk=article_id).values('title', 'excerpt', 'content').first()
+    if article is None:
+        if Article.objects.filter(pk=article_id).exists():
+            remove(article_id)
+        return
+
+    config = get_config()
+    counts = term_counts(article['title'], article['excerpt'], article['content'])
+    documents = dict(TermStats.objects.filter(term__in=list(counts)).values_list('term', 'documents'))
+    vector = weigh(counts, documents, _published_articles().count(), config['TERMS_PER_ARTICLE'])
+    ArticleTerm.objects.filter(article_id=article_id).delete()
+    ArticleTerm.objects.bulk_create(
+        [ArticleTerm(article_id=article_id, term=term, weight=weight) for term, weight in vector.items()]
+    )
+
+    # Lists that contain the article are rescored even when they are not its candidates
+    referrers = set(RelatedArticle.objects.filter(related_id=article_id).values_list('article_id', flat=True))
+    scores = _score(article_id, vector, _tags(article_id), config, extra=referrers)
+    lists = {article_id: top_neighbours(scores, config['TOP_K'])}
+
+    current = defaultdict(dict)
+    affected = set(scores) | referrers
+    links = RelatedArticle.objects.filter(article_id__in=list(affected))
+    for other, related_id, score in links.values_list('article_id', 'related_id', 'score'):
+        current[other][related_id] = score
+
+    refill = []
+    for other in affected:
+        neighbours = current[other]
+        listed = article_id in neighbours
+        merged = {related_id: score for related_id, score in neighbours.items() if related_id != article_id}
+        if other in scores:
+            merged[article_id] = scores[other]
+        top = top_neighbours(merged, config['TOP_K'])
+        if listed and len(top) < config['TOP_K'] and article_id not in dict(top):
+            refill.append(other)
+        elif top != top_neighbours(neighbours, config['TOP_K']):
+            lists[other] = top
+    _replace_lists(lists)
+    for other in refill:
+        recompute(other, config)
+
+
+def schedule_refresh(*article_ids):
+    """Refresh the articles' neighbourhoods once the current transaction commits"""
+    if get_config()['ENABLED']:
+        for article_id in sorted(set(article_ids)):
+            transaction.on_commit(partial(refresh, article_id), robust=True)
+
+
+def schedule_recompute(article_ids):
+    """Refill the neighbour lists of ``article_ids`` once the current transaction commits"""
+    if get_config()['ENABLED']:
+        for article_id in sorted(set(article_ids)):
+            transaction.on_commit(partial(_recompute_if_published, article_id), robust=True)
+
+
+def schedule_batch_refresh(article_ids):
+    """
+    Refresh the neighbourhoods of a batch of articles whose status changed.
+
+    Batches over ``BATCH_REFRESH_LIMIT`` would hold the request for minutes,
+    so only the unpublished articles' rows are dropped; the affected lists
+    stay short and new articles have none until the next rebuild.
+    """
+    from .models import Article, ArticleTerm, RelatedArticle
+
+    config = get_config()
+    if not config['ENABLED']:
+        return
+    if len(set(article_ids)) <= config['BATCH_REFRESH_LIMIT']:
+        schedule_refresh(*article_ids)
+        return
+    unpublished = list(
+        Article.objects.filter(pk__in=list(article_ids)).exclude(status='published').values_list('pk', flat=True)
+    )
+    RelatedArticle.objects.filter(Q(article_id__in=unpublished) | Q(related_id__in=unpublished)).delete()
+    ArticleTerm.objects.filter(article_id__in=unpublished).delete()
+    logger.info('Related articles of %d articles are left to the next rebuild_related run', len(set(article_ids)))
+
+
+def _recompute_if_published(article_id):
+    if _published_articles().filter(pk=article_id).exists():
+        recompute(article_id)
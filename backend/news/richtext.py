@@ -0,0 +1,347 @@
+"""
+Save-time processing of article bodies.
+
+``Article.content`` is whatever CKEditor (``allowedContent: True``) or
+the Source button produced. process() runs it once, on save, through a
+single HTMLParser pass that:
+
+- keeps an allowlist of tags and attributes (``TAGS``/``ATTRIBUTES``),
+  unwraps other tags and drops ``DROPPED_TAGS`` with their content;
+  ``style`` keeps only the ``STYLES`` properties and links only the
+  ``URL_SCHEMES``
+- removes empty paragraphs and inline elements, comments and the
+  whitespace HTML does not render (``<pre>`` is left alone)
+- gives images ``loading="lazy"``, ``decoding="async"``, width/height
+  when the source states them (attributes or inline ``px`` styles),
+  and a Cloudinary ``srcset`` (news.media) when the image is one
+- gives headings an ``id`` anchor
+
+and returns the HTML with its plain text (one line per block) and the
+heading outline, which Article stores in ``content_html``,
+``content_text`` and ``content_outline``. The API serves those columns
+as they are. The editor keeps working on ``content`` itself.
+
+There is no parser dependency: browsers re-parse whatever is served,
+so the sanitizer only has to emit well-formed markup from the allowed
+set, which it does by closing every element it opens.
+"""
+import re
+from collections import namedtuple
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils.text import slugify
+
+from . import media
+
+DEFAULTS = {
+    'TAGS': (
+        'a', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3',
+        'h4', 'h5', 'h6', 'hr', 'iframe', 'img', 'li', 'ol', 'p', 'pre', 's', 'strong', 'sub', 'sup', 'table',
+        'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+    ),
+    'ATTRIBUTES': {
+        'a': ('href', 'title', 'target'),
+        'img': ('src', 'alt', 'title'),
+        'iframe': ('src', 'title', 'width', 'height', 'allow', 'allowfullscreen'),
+        'ol': ('start',),
+        'td': ('colspan', 'rowspan'),
+        'th': ('colspan', 'rowspan', 'scope'),
+    },
+    # CSS properties kept from style attributes, on any tag
+    'STYLES': ('text-align',),
+    'URL_SCHEMES': ('http', 'https', 'mailto', 'tel'),
+    # Embeds are dropped unless they come from one of these hosts
+    'IFRAME_HOSTS': ('www.youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com'),
+    # sizes attribute of images given a srcset; the article column is at most 768px wide
+    'IMAGE_SIZES': '(min-width: 768px) 768px, 100vw',
+}
+
+# Removed together with their content
+DROPPED_TAGS = {
+    'applet', 'form', 'head', 'math', 'noscript', 'object', 'script', 'select', 'style', 'svg', 'template',
+    'textarea', 'title',
+}
+# Void elements that are removed; they have no content or end tag, so nothing after them is skipped
+DROPPED_VOID_TAGS = {'base', 'embed', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+RENAMED_TAGS = {'b': 'strong', 'i': 'em', 'strike': 's', 'del': 's'}
+VOID_TAGS = {'br', 'hr', 'img'}
+BLOCK_TAGS = {
+    'blockquote', 'br', 'caption', 'div', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'iframe', 'li', 'ol', 'p', 'pre', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul',
+}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# Removed when they hold no text, image or embed
+REMOVED_IF_EMPTY = HEADING_TAGS | {'a', 'blockquote', 'div', 'em', 'p', 's', 'strong', 'sub', 'sup', 'u'}
+# Elements that count as content on their own
+CONTENT_TAGS = {'hr', 'iframe', 'img'}
+
+# Runs of rendered whitespace, keeping a single &nbsp; (as in "10&nbsp;km")
+COLLAPSE_RE = re.compile(r'[ \t\n\r\f\xa0]{2,}|[\t\n\r\f]')
+BLANK_RE = re.compile(r'^[ \t\n\r\f\xa0]*$')
+# Browsers ignore these inside a URL scheme ("java\tscript:")
+URL_IGNORED_RE = re.compile(r'[\x00-\x20]')
+PIXELS_RE = re.compile(r'^\s*(\d+)(?:px)?\s*$')
+
+Processed = namedtuple('Processed', ['html', 'text', 'outline'])
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'ARTICLE_CONTENT', {}))
+    return config
+
+
+def _safe_url(value, schemes):
+    value = (value or '').strip()
+    if not value:
+        return None
+    scheme = urlsplit(URL_IGNORED_RE.sub('', value)).scheme.lower()
+    return value if not scheme or scheme in schemes else None
+
+
+def _styles(value):
+    """``{property: value}`` of a style attribute"""
+    styles = {}
+    for declaration in (value or '').split(';'):
+        name, colon, rule = declaration.partition(':')
+        if colon and name.strip() and rule.strip():
+            styles[name.strip().lower()] = rule.strip()
+    return styles
+
+
+def _pixels(value):
+    match = PIXELS_RE.match(value or '')
+    return int(match[1]) if match and int(match[1]) else None
+
+
+class _Element:
+    __slots__ = ('tag', 'start', 'has_content', 'text')
+
+    def __init__(self, tag, start):
+        self.tag = tag
+        self.start = start
+        self.has_content = False
+        self.text = []
+
+
+class _Processor(HTMLParser):
+    def __init__(self, config):
+        super().__init__(convert_charrefs=True)
+        self.config = config
+        self.tags = set(config['TAGS'])
+        self.output = []
+        self.text = []
+        self.outline = []
+        self.anchors = set()
+        self.stack = []
+        self.dropping = 0
+        self.pre = 0
+        # The last output was a block boundary: leading whitespace of the next text is not rendered
+        self.at_boundary = True
+
+    # Output
+
+    def boundary(self):
+        """Trim the whitespace before a block tag"""
+        if self.output and self.output[-1][0] == 'text' and not self.pre:
+            text = self.output[-1][1].rstrip(' ')
+            if text:
+                self.output[-1] = ('text', text)
+            else:
+                self.output.pop()
+        self.text.append('\n')
+        self.at_boundary = True
+
+    def mark_content(self):
+        for element in self.stack:
+            element.has_content = True
+
+    def attributes(self, tag, attrs):
+        allowed = self.config['ATTRIBUTES'].get(tag, ())
+        kept = {}
+        styles = {}
+        for name, value in attrs:
+            name = name.lower()
+            if name == 'style':
+                styles = _styles(value)
+            elif name in allowed and name not in kept:
+                kept[name] = value
+        for name in ('href', 'src'):
+            if name in kept:
+                kept[name] = _safe_url(kept[name], self.config['URL_SCHEMES'])
+                if kept[name] is None:
+                    del kept[name]
+        if tag == 'a' and kept.get('target') == '_blank':
+            kept['rel'] = 'noopener noreferrer'
+        if tag == 'img':
+            self.image(kept, attrs, styles)
+        if tag == 'iframe':
+            kept['loading'] = 'lazy'
+        style = ';'.join(f'{name}:{styles[name]}' for name in self.config['STYLES'] if name in styles)
+        if style:
+            kept['style'] = style
+        return kept
+
+    def image(self, kept, attrs, styles):
+        original = dict((name.lower(), value) for name, value in attrs)
+        width = _pixels(styles.get('width')) or _pixels(original.get('width'))
+        height = _pixels(styles.get('height')) or _pixels(original.get('height'))
+        kept.setdefault('alt', '')
+        # Only absolute URLs can be Cloudinary ones; anything else would be taken for a public id
+        src = kept.get('src', '')
+        variants = media.article_variants(src) if src.startswith(('http://', 'https://')) else {}
+        if variants.get('srcset'):
+            kept['src'] = variants['src']
+            kept['srcset'] = variants['srcset']
+            kept['sizes'] = self.config['IMAGE_SIZES']
+        if width and height:
+            kept['width'], kept['height'] = str(width), str(height)
+        kept['loading'] = 'lazy'
+        kept['decoding'] = 'async'
+
+    def start_tag(self, tag, attributes):
+        parts = [tag]
+        for name, value in attributes.items():
+            parts.append(name if value is None else f'{name}="{escape(value)}"')
+        return '<' + ' '.join(parts) + '>'
+
+    # Parser callbacks
+
+    def handle_starttag(self, tag, attrs):
+        tag = RENAMED_TAGS.get(tag, tag)
+        if tag in DROPPED_VOID_TAGS:
+            return
+        if tag in DROPPED_TAGS or (tag == 'iframe' and self.dropping):
+            self.dropping += 1
+            return
+        if self.dropping or tag not in self.tags:
+            return
+        attributes = self.attributes(tag, attrs)
+        if tag in ('a', 'img') and not attributes.keys() & {'href', 'src'}:
+            return  # a link or image whose URL was unsafe: keep the text, drop the element
+        if tag == 'iframe' and urlsplit(attributes.get('src', '')).hostname not in self.config['IFRAME_HOSTS']:
+            self.dropping += 1
+            return
+        if tag in BLOCK_TAGS:
+            self.boundary()
+        if tag == 'br':
+            self.text.append('\n')
+        if tag in CONTENT_TAGS:
+            self.mark_content()
+        self.output.append(('tag', self.start_tag(tag, attributes)))
+        if tag in CONTENT_TAGS and tag not in BLOCK_TAGS:
+            self.at_boundary = False
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(_Element(tag, len(self.output) - 1))
+        if tag == 'pre':
+            self.pre += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if RENAMED_TAGS.get(tag, tag) not in VOID_TAGS | DROPPED_VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        tag = RENAMED_TAGS.get(tag, tag)
+        if tag in DROPPED_VOID_TAGS:
+            return  # a stray </embed> closes nothing
+        if tag in DROPPED_TAGS or (tag == 'iframe' and self.dropping):
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag in VOID_TAGS:
+            return
+        if not any(element.tag == tag for element in self.stack):
+            return
+        while self.stack:
+            element = self.stack.pop()
+            self.close_element(element)
+            if element.tag == tag:
+                return
+
+    def close_element(self, element):
+        tag = element.tag
+        if tag in BLOCK_TAGS:
+            self.boundary()
+        if tag == 'pre':
+            self.pre -= 1
+        if tag in REMOVED_IF_EMPTY and not element.has_content:
+            del self.output[element.start:]
+            return
+        if tag in HEADING_TAGS:
+            self.heading(element)
+        self.output.append(('tag', f'</{tag}>'))
+
+    def heading(self, element):
+        text = COLLAPSE_RE.sub(' ', ''.join(element.text)).replace('\xa0', ' ').strip()
+        anchor = base = slugify(text) or 'section'
+        number = 1
+        while anchor in self.anchors:
+            number += 1
+            anchor = f'{base}-{number}'
+        self.anchors.add(anchor)
+        start = self.output[element.start][1]
+        self.output[element.start] = ('tag', f'{start[:-1]} id="{anchor}">')
+        self.outline.append({'level': int(element.tag[1]), 'text': text, 'id': anchor})
+
+    def handle_data(self, data):
+        if self.dropping or not data:
+            return
+        if not self.pre:
+            data = COLLAPSE_RE.sub(' ', data)
+            if self.at_boundary:
+                data = data.lstrip(' ')
+            if not data:
+                return
+        if not BLANK_RE.match(data):
+            self.mark_content()
+        for element in self.stack:
+            if element.tag in HEADING_TAGS:
+                element.text.append(data)
+        self.text.append(data)
+        self.output.append(('text', escape(data, quote=False)))
+        self.at_boundary = False
+
+    def result(self):
+        self.close_all()
+        lines = (COLLAPSE_RE.sub(' ', line).replace('\xa0', ' ').strip() for line in ''.join(self.text).split('\n'))
+        return Processed(
+            html=''.join(value for _, value in self.output).strip(),
+            text='\n'.join(line for line in lines if line),
+            outline=self.outline,
+        )
+
+    def close_all(self):
+        while self.stack:
+            self.close_element(self.stack.pop())
+
+
+def process(html, config=None):
+    """Sanitized, minified HTML, plain text and heading outline of an article body"""
+    processor = _Processor(config or get_config())
+    processor.feed(html or '')
+    processor.close()
+    return processor.result()
+
+
+def backfill(model, chunk_size=500):
+    """Reprocess the body of every row of ``model`` (Article); returns the number of rows changed"""
+    config = get_config()
+    fields = ['content_html', 'content_text', 'content_outline']
+    updated = 0
+    batch = []
+    rows = model.objects.only('pk', 'content', *fields).order_by('pk')
+    for row in rows.iterator(chunk_size=chunk_size):
+        processed = process(row.content, config)
+        if (processed.html, processed.text, processed.outline) != tuple(getattr(row, field) for field in fields):
+            row.content_html, row.content_text, row.content_outline = processed
+            batch.append(row)
+        if len(batch) >= chunk_size:
+            updated += model.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        updated += model.objects.bulk_update(batch, fields)
+    return updated
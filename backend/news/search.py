@@ -0,0 +1,160 @@
+"""
+Ranked full-text search over articles.
+
+Each article gets a precomputed search document made of four weighted
+parts: title > excerpt > content (its stored plain text) > author/category/tags.
+On PostgreSQL the document is a ``search_vector`` tsvector column on
+``news_article`` with a GIN index; on SQLite it lives in the
+``news_article_fts`` FTS5 table keyed by article id, exposed to the ORM
+as ``ArticleSearchDocument``. Both structures are created by migration
+0003; any other database falls back to the old ``icontains`` scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'news_article_fts'
+SEARCH_CONFIG = 'english'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+POSTGRES_DOCUMENT_SQL = (
+    "setweight(to_tsvector('{config}', %s), 'A') || "
+    "setweight(to_tsvector('{config}', %s), 'B') || "
+    "setweight(to_tsvector('{config}', %s), 'C') || "
+    "setweight(to_tsvector('{config}', %s), 'D')"
+).format(config=SEARCH_CONFIG)
+
+
+def search_backend(using=None):
+    vendor = (using or connection).vendor
+    if vendor in ('postgresql', 'sqlite'):
+        return vendor
+    return None
+
+
+def _article_table():
+    from .models import Article
+    return Article._meta.db_table
+
+
+def search_document(article):
+    """Return the (title, excerpt, body, meta) parts indexed for an article"""
+    meta = [article.author.name if article.author_id else '',
+            article.category.name if article.category_id else '']
+    meta.extend(tag.name for tag in article.tags.all())
+    return (
+        article.title or '',
+        article.excerpt or '',
+        article.content_text,
+        ' '.join(part for part in meta if part),
+    )
+
+
+def _write_documents(rows):
+    """Store ``(article_id, (title, excerpt, body, meta))`` rows in the index"""
+    backend = search_backend()
+    rows = list(rows)
+    if not rows or backend is None:
+        return
+    with connection.cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.executemany(
+                f'UPDATE {_article_table()} SET search_vector = {POSTGRES_DOCUMENT_SQL} WHERE id = %s',
+                [(*document, article_id) for article_id, document in rows],
+            )
+        else:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(article_id,) for article_id, _ in rows],
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, body, meta) VALUES (%s, %s, %s, %s, %s)',
+                [(article_id, *document) for article_id, document in rows],
+            )
+
+
+def index_article(article):
+    """Refresh the search document of a single saved article"""
+    _write_documents([(article.pk, search_document(article))])
+
+
+def remove_article(article_id):
+    if search_backend() == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article_id])
+
+
+def rebuild_index(queryset=None, chunk_size=500):
+    """Recompute search documents for ``queryset`` (default: every article)"""
+    from .models import Article
+
+    if queryset is None:
+        queryset = Article.objects.all()
+        if search_backend() == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    queryset = queryset.select_related('author', 'category').prefetch_related('tags').order_by('pk')
+
+    indexed = 0
+    batch = []
+    for article in queryset.iterator(chunk_size=chunk_size):
+        batch.append((article.pk, search_document(article)))
+        if len(batch) >= chunk_size:
+            _write_documents(batch)
+            indexed += len(batch)
+            batch = []
+    _write_documents(batch)
+    return indexed + len(batch)
+
+
+def fts_match_expression(query):
+    """Turn free text into an FTS5 MATCH expression of quoted prefix terms"""
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def search_articles(queryset, query):
+    """
+    Filter ``queryset`` to articles matching ``query`` and order them by rank.
+
+    The queryset gains a ``search_rank`` annotation where the backend
+    supports ranking (higher is better).
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset.none()
+
+    backend = search_backend(connection)
+    table = _article_table()
+    if backend == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.alias(
+            search_match=RawSQL(f'{table}.search_vector @@ {tsquery}', [query], output_field=BooleanField()),
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(f'ts_rank_cd({table}.search_vector, {tsquery})', [query], output_field=FloatField()),
+        ).order_by('-search_rank', '-published_date')
+
+    if backend == 'sqlite':
+        match = fts_match_expression(query)
+        if not match:
+            return queryset.none()
+        # Joining the FTS table lets SQLite drive the query from the MATCH;
+        # its rank column is bm25() with per-column weights, lower-is-better
+        return queryset.filter(search_document__document__match=match).annotate(
+            search_rank=F('search_document__rank') * -1,
+        ).order_by('-search_rank', '-published_date')
+
+    return legacy_search(queryset, query)
+
+
+def legacy_search(queryset, query):
+    """The unindexed icontains scan, kept for other databases and benchmarks"""
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(excerpt__icontains=query) |
+        Q(content__icontains=query) |
+        Q(author__name__icontains=query) |
+        Q(category__name__icontains=query)
+    )
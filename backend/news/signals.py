@@ -1,25 +1,369 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.db.models.functions import Now
 from django.dispatch import receiver
-from .models import Article, Category, Author
+from django.urls import reverse
+from taggit.models import Tag
+from .models import Article, Category, Author, RelatedArticle, TaggedArticle, TagStats, TrendingScore
+from .counts import adjust_published_count, adjust_tag_counts, rebuild_counts_for_articles
+from .publishing import articles_changed
+from . import related, search
+
+COUNT_FIELDS = {'status', 'category', 'category_id', 'author', 'author_id'}
+SEARCH_FIELDS = {'title', 'excerpt', 'content', 'category', 'category_id', 'author', 'author_id'}
+RELATED_FIELDS = {'title', 'excerpt', 'content', 'status'}
+# Saves of these fields alone change no published page, feed or snapshot
+DERIVED_ONLY_FIELDS = {'views_count'}
+
+
+@receiver(pre_save, sender=Article)
+def remember_counted_state(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Snapshot the stored status/category/author/slug/date before an article is saved.
+
+    One read serves both ``_counted_state`` (False when no published count
+    can change) and ``_published_state``, which the snapshot and
+    syndication receivers key on (None for views_count-only saves).
+    """
+    instance._counted_state = instance._published_state = None
+    if raw or instance.pk is None:
+        return
+    counts_may_change = update_fields is None or COUNT_FIELDS.intersection(update_fields)
+    pages_may_change = update_fields is None or not set(update_fields) <= DERIVED_ONLY_FIELDS
+    if not counts_may_change:
+        # e.g. views_count-only saves cannot change any published counts
+        instance._counted_state = False
+    if not pages_may_change:
+        return
+    stored = (
+        Article.objects.filter(pk=instance.pk)
+        .values_list('status', 'category_id', 'author_id', 'slug', 'published_date')
+        .first()
+    )
+    instance._published_state = stored
+    if counts_may_change:
+        instance._counted_state = stored
 
 
 @receiver(post_save, sender=Article)
-def update_article_counts(sender, instance, created, **kwargs):
+def update_article_counts(sender, instance, created, raw=False, **kwargs):
     """Update article counts when articles are created/updated"""
-    if created or instance.status == 'published':
-        # Update category article count
-        if instance.category:
-            instance.category.save()
-        
-        # Update author article count
-        if instance.author:
-            instance.author.save()
+    previous = getattr(instance, '_counted_state', None)
+    if raw or previous is False:
+        return
+
+    deltas = {}
+    if previous and previous[0] == 'published':
+        deltas[(Category, previous[1])] = -1
+        deltas[(Author, previous[2])] = -1
+    if instance.status == 'published':
+        for key in ((Category, instance.category_id), (Author, instance.author_id)):
+            deltas[key] = deltas.get(key, 0) + 1
+
+    # Unchanged published articles net out to zero and cost no writes
+    for (model, pk), delta in deltas.items():
+        adjust_published_count(model, pk, delta)
+
+
+@receiver(post_save, sender=Article)
+def sync_trending_entry(sender, instance, created, raw=False, **kwargs):
+    """Drop unpublished articles from the leaderboard and keep its category in step"""
+    previous = getattr(instance, '_counted_state', None)
+    if raw or created or not previous:
+        return
+    entry = TrendingScore.objects.filter(article_id=instance.pk)
+    if instance.status != 'published':
+        entry.delete()
+    elif previous[1] != instance.category_id:
+        entry.update(category_id=instance.category_id)
+
+
+@receiver(post_save, sender=Article)
+def update_tag_counts(sender, instance, created, raw=False, **kwargs):
+    """Move the article's tags in or out of the published tag counts when its status flips"""
+    previous = getattr(instance, '_counted_state', None)
+    if raw or created or not previous:
+        return
+    was_published = previous[0] == 'published'
+    if was_published == (instance.status == 'published'):
+        return
+    tag_ids = TaggedArticle.objects.filter(content_object=instance).values_list('tag_id', flat=True)
+    adjust_tag_counts(list(tag_ids), -1 if was_published else 1)
+
+
+@receiver(post_save, sender=Article)
+def refresh_related_articles(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Recompute the related-articles neighbourhood of a published, unpublished or edited article"""
+    if raw or (update_fields is not None and not RELATED_FIELDS.intersection(update_fields)):
+        return
+    previous = getattr(instance, '_counted_state', None)
+    was_published = bool(previous) and previous[0] == 'published'
+    if instance.status == 'published' or was_published:
+        related.schedule_refresh(instance.pk)
+
+
+@receiver(pre_delete, sender=Article)
+def remember_related_referrers(sender, instance, **kwargs):
+    """Neighbour rows are cascade-deleted, so note whose lists need refilling first"""
+    instance._related_referrers = list(
+        RelatedArticle.objects.filter(related_id=instance.pk).values_list('article_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Article)
+def refill_related_articles(sender, instance, **kwargs):
+    related.schedule_recompute(getattr(instance, '_related_referrers', []))
+
+
+@receiver(pre_delete, sender=Article)
+def remember_deleted_tags(sender, instance, **kwargs):
+    """Tag assignments are cascade-deleted before post_delete, so note them first"""
+    instance._deleted_tag_ids = []
+    if instance.status == 'published':
+        instance._deleted_tag_ids = list(
+            TaggedArticle.objects.filter(content_object=instance).values_list('tag_id', flat=True)
+        )
 
 
 @receiver(post_delete, sender=Article)
 def update_counts_on_delete(sender, instance, **kwargs):
     """Update counts when articles are deleted"""
-    if instance.category:
-        instance.category.save()
-    if instance.author:
-        instance.author.save() 
\ No newline at end of file
+    if instance.status == 'published':
+        adjust_published_count(Category, instance.category_id, -1)
+        adjust_published_count(Author, instance.author_id, -1)
+        adjust_tag_counts(getattr(instance, '_deleted_tag_ids', []), -1)
+
+
+@receiver(post_save, sender=Article)
+def update_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the article's full-text search document current"""
+    if raw or (update_fields is not None and not SEARCH_FIELDS.intersection(update_fields)):
+        return
+    search.index_article(instance)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_search_document_on_tags(sender, instance, action, **kwargs):
+    """Tags are saved after the article, so reindex once they change"""
+    if isinstance(instance, Article) and action in ('post_add', 'post_remove', 'post_clear'):
+        search.index_article(instance)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_counts_on_tags(sender, instance, action, pk_set=None, **kwargs):
+    """Count tags added to or removed from a published article"""
+    if not isinstance(instance, Article) or instance.status != 'published':
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_ids = list(
+            TaggedArticle.objects.filter(content_object=instance).values_list('tag_id', flat=True)
+        )
+    elif action == 'post_clear':
+        adjust_tag_counts(getattr(instance, '_cleared_tag_ids', []), -1)
+    elif action in ('post_add', 'post_remove'):
+        adjust_tag_counts(pk_set or [], 1 if action == 'post_add' else -1)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def refresh_related_on_tags(sender, instance, action, **kwargs):
+    """Tag overlap is part of the related-articles score"""
+    if isinstance(instance, Article) and instance.status == 'published' and action in (
+        'post_add', 'post_remove', 'post_clear'
+    ):
+        related.schedule_refresh(instance.pk)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def touch_article_on_tags(sender, instance, action, **kwargs):
+    """Tags are part of the article payload, so a tag change counts as a modification"""
+    if isinstance(instance, Article) and action in ('post_add', 'post_remove', 'post_clear'):
+        from django.utils import timezone
+        instance.updated_at = timezone.now()
+        Article.objects.filter(pk=instance.pk).update(updated_at=instance.updated_at)
+
+
+@receiver(post_delete, sender=Article)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove_article(instance.pk)
+
+
+@receiver(articles_changed, sender=Article)
+def update_counts_for_batch(sender, article_ids, fields, **kwargs):
+    """Recount the categories, authors and tags of a batch whose status changed (news.publishing)"""
+    if 'status' in fields:
+        rebuild_counts_for_articles(Article.objects.filter(pk__in=article_ids))
+
+
+@receiver(articles_changed, sender=Article)
+def sync_trending_for_batch(sender, article_ids, fields, **kwargs):
+    if 'status' in fields:
+        TrendingScore.objects.filter(article_id__in=article_ids).exclude(article__status='published').delete()
+
+
+@receiver(articles_changed, sender=Article)
+def refresh_related_for_batch(sender, article_ids, fields, **kwargs):
+    if 'status' in fields:
+        related.schedule_batch_refresh(article_ids)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Author)
+@receiver(pre_save, sender=Tag)
+def remember_indexed_name(sender, instance, raw=False, **kwargs):
+    """Snapshot the name that is part of every related article's search document"""
+    instance._indexed_name = None
+    if not raw and instance.pk is not None:
+        instance._indexed_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Author)
+def reindex_renamed_articles(sender, instance, created, raw=False, **kwargs):
+    """Reindex the articles of a category or author whose name changed"""
+    previous = getattr(instance, '_indexed_name', None)
+    if raw or created or previous is None or previous == instance.name:
+        return
+    search.rebuild_index(instance.articles.all())
+
+
+@receiver(post_save, sender=Tag)
+def refresh_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    """A tag's name is part of the tag list and of its articles' payloads and search documents"""
+    previous = getattr(instance, '_indexed_name', None)
+    if raw or created or previous is None or previous == instance.name:
+        return
+    articles = Article.objects.filter(tagged_items__tag=instance)
+    TagStats.objects.filter(pk=instance.pk).update(updated_at=Now())
+    articles.update(updated_at=Now())
+    search.rebuild_index(articles)
+
+
+def _was_published(instance):
+    # _published_state is filled in by remember_counted_state
+    previous = getattr(instance, '_published_state', None)
+    return bool(previous) and previous[0] == 'published'
+
+
+@receiver(post_save, sender=Article)
+def export_article_snapshot(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Re-export the static files a published, unpublished or edited article appears in"""
+    from api import snapshots
+
+    if raw or (update_fields is not None and set(update_fields) <= DERIVED_ONLY_FIELDS):
+        return
+    if instance.status != 'published' and not _was_published(instance):
+        return
+    previous = getattr(instance, '_published_state', None)
+    paths = []
+    if previous and previous[3] != instance.slug:
+        paths.append(reverse('article-detail', kwargs={'slug': previous[3]}))
+    snapshots.schedule(
+        article_ids=[instance.pk],
+        category_ids=[previous[1]] if previous else [],
+        author_ids=[previous[2]] if previous else [],
+        paths=paths,
+    )
+
+
+@receiver(post_save, sender=Article)
+def invalidate_article_syndication(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Drop the sitemap month and feeds the article was or now is part of"""
+    from api import syndication
+
+    if raw or (update_fields is not None and set(update_fields) <= DERIVED_ONLY_FIELDS):
+        return
+    if instance.status != 'published' and not _was_published(instance):
+        return
+    months = [syndication.month_of(instance.published_date)]
+    category_ids, author_ids = [instance.category_id], [instance.author_id]
+    previous = getattr(instance, '_published_state', None)
+    if previous:
+        months.append(syndication.month_of(previous[4]))
+        category_ids.append(previous[1])
+        author_ids.append(previous[2])
+    syndication.schedule_invalidation(months, category_ids, author_ids)
+
+
+@receiver(post_delete, sender=Article)
+def remove_article_snapshot(sender, instance, **kwargs):
+    from api import snapshots, syndication
+
+    if instance.status == 'published':
+        snapshots.schedule(
+            category_ids=[instance.category_id], author_ids=[instance.author_id],
+            paths=[reverse('article-detail', kwargs={'slug': instance.slug})],
+        )
+        syndication.schedule_invalidation(
+            [syndication.month_of(instance.published_date)], [instance.category_id], [instance.author_id]
+        )
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def export_snapshot_on_tags(sender, instance, action, **kwargs):
+    from api import snapshots
+
+    if isinstance(instance, Article) and instance.status == 'published' and action in (
+        'post_add', 'post_remove', 'post_clear'
+    ):
+        snapshots.schedule(article_ids=[instance.pk])
+
+
+@receiver(articles_changed, sender=Article)
+def export_snapshot_for_batch(sender, article_ids, fields, **kwargs):
+    from api import snapshots
+
+    snapshots.schedule(article_ids=article_ids)
+
+
+@receiver(articles_changed, sender=Article)
+def invalidate_syndication_for_batch(sender, article_ids, fields, **kwargs):
+    from api import syndication
+
+    syndication.schedule_article_invalidation(article_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Author)
+def export_snapshot_on_save(sender, instance, created, raw=False, **kwargs):
+    """Re-export a category's or author's files, and its articles' when its name is part of them"""
+    from api import snapshots, syndication
+
+    if raw:
+        return
+    previous = getattr(instance, '_indexed_name', None)
+    article_ids = []
+    if previous is not None and previous != instance.name:
+        article_ids = instance.articles.filter(status='published').values_list('pk', flat=True)
+    if sender is Category:
+        snapshots.schedule(category_ids=[instance.pk], article_ids=article_ids)
+        syndication.schedule_invalidation(category_ids=[instance.pk], pages=True)
+    else:
+        snapshots.schedule(author_ids=[instance.pk], article_ids=article_ids)
+        syndication.schedule_invalidation(author_ids=[instance.pk], pages=True)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_snapshot(sender, instance, **kwargs):
+    from api import snapshots, syndication
+
+    snapshots.schedule(paths=snapshots.category_paths([instance.slug]))
+    syndication.schedule_invalidation(category_ids=[instance.pk], pages=True)
+
+
+@receiver(post_delete, sender=Author)
+def remove_author_snapshot(sender, instance, **kwargs):
+    from api import snapshots, syndication
+
+    snapshots.schedule(paths=snapshots.author_paths([instance.pk]))
+    syndication.schedule_invalidation(author_ids=[instance.pk], pages=True)
+
+
+@receiver(post_save, sender=Tag)
+def export_snapshot_on_tag_rename(sender, instance, created, raw=False, **kwargs):
+    from api import snapshots
+
+    previous = getattr(instance, '_indexed_name', None)
+    if raw or created or previous is None or previous == instance.name:
+        return
+    snapshots.schedule(
+        article_ids=Article.objects.filter(tagged_items__tag=instance, status='published').values_list('pk', flat=True)
+    )
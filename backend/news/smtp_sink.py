@@ -0,0 +1,111 @@
+"""
+A local SMTP server that accepts and counts messages without delivering them.
+
+Used by the digest tests and benchmark_digest as a stand-in for the
+real relay::
+
+    with SMTPSink(latency=0.002) as sink:
+        with override_settings(EMAIL_HOST='127.0.0.1', EMAIL_PORT=sink.port, ...):
+            ...
+    sink.messages, sink.connections
+
+``latency`` is added to every accepted message, like a relay's round
+trip; recipients in ``reject`` are refused with a 550.
+"""
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        sink.record(connections=1)
+        self.reply('220 localhost SMTP sink')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.partition(':')[2].strip().strip('<>').lower()
+                if address in sink.reject:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data in iter(self.rfile.readline, b''):
+                    if data == b'.\r\n':
+                        break
+                    size += len(data)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.record(messages=1, recipients=recipients, size=size)
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, latency=0.0, reject=()):
+        self.latency = latency
+        self.reject = {address.lower() for address in reject}
+        self.messages = 0
+        self.connections = 0
+        self.bytes = 0
+        self.recipients = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def record(self, messages=0, connections=0, recipients=(), size=0):
+        with self._lock:
+            self.messages += messages
+            self.connections += connections
+            self.recipients.extend(recipients)
+            self.bytes += size
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.sink = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,194 @@
+"""
+Bulk import and export of newsletter subscribers.
+
+import_subscribers() reads CSV (an ``email`` column, or the first
+column when there is no header) or NDJSON (``{"email": ...}`` per line)
+from a text stream, normalizes and validates the addresses and applies
+them ``BATCH_SIZE`` at a time: one query finds the batch's existing
+rows, one bulk INSERT adds the new ones and one UPDATE reactivates the
+unsubscribed ones. Memory stays bounded by the batch however long the
+file is.
+
+export_subscribers() yields CSV or NDJSON lines from a streaming
+``iterator()`` for StreamingHttpResponse or a file.
+
+unsubscribe_token() signs an address for the unsubscribe link of
+emails; unsubscribe() accepts it back.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_FIELDS = ('email', 'is_active', 'subscribed_at', 'unsubscribed_at')
+BATCH_SIZE = 1000
+# Invalid rows reported back in detail; the rest are only counted
+MAX_ERRORS = 100
+UNSUBSCRIBE_SALT = 'news.subscribers.unsubscribe'
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.reactivated = 0
+        self.unchanged = 0
+        self.invalid = 0
+        self.errors = []
+
+    def error(self, line, value, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'value': value, 'error': message})
+
+    def as_dict(self):
+        return {
+            'created': self.created, 'reactivated': self.reactivated, 'unchanged': self.unchanged,
+            'invalid': self.invalid, 'errors': self.errors,
+        }
+
+
+def normalize_email(value):
+    """Stripped address with a lower-cased domain; raises ValidationError for invalid addresses"""
+    from .models import Newsletter
+
+    email = str(value or '').strip()
+    local, at, domain = email.rpartition('@')
+    if at:
+        email = f'{local}@{domain.lower()}'
+    if len(email) > Newsletter._meta.get_field('email').max_length:
+        raise ValidationError('Address is too long')
+    validate_email(email)
+    return email
+
+
+def read_csv(stream):
+    """Yield ``(line, email)``; a first row without an ``email`` column is data, not a header"""
+    reader = csv.reader(stream)
+    column = 0
+    for row in reader:
+        if reader.line_num == 1:
+            header = [cell.strip().lower() for cell in row]
+            if 'email' in header:
+                column = header.index('email')
+                continue
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, row[column] if column < len(row) else ''
+
+
+def read_ndjson(stream):
+    """Yield ``(line, email)``; lines that are not JSON objects yield None"""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record.get('email') if isinstance(record, dict) else None
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def _apply(batch, result):
+    """Insert new and reactivate unsubscribed addresses of ``{email: line}``"""
+    from .models import Newsletter
+
+    with transaction.atomic():
+        existing = dict(Newsletter.objects.filter(email__in=list(batch)).values_list('email', 'is_active'))
+        inactive = [email for email, is_active in existing.items() if not is_active]
+        # ignore_conflicts: a concurrent subscribe of the same address is not an error
+        Newsletter.objects.bulk_create(
+            [Newsletter(email=email) for email in batch if email not in existing], ignore_conflicts=True
+        )
+        if inactive:
+            Newsletter.objects.filter(email__in=inactive, is_active=False).update(
+                is_active=True, unsubscribed_at=None
+            )
+    result.created += len(batch) - len(existing)
+    result.reactivated += len(inactive)
+    result.unchanged += len(existing) - len(inactive)
+
+
+def import_subscribers(stream, file_format='csv', batch_size=BATCH_SIZE):
+    """Subscribe every address in the text ``stream``; returns an ImportResult"""
+    result = ImportResult()
+    rows = READERS[file_format](stream)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return result
+        batch = {}
+        for line, value in chunk:
+            try:
+                email = normalize_email(value)
+            except ValidationError as error:
+                result.error(line, value, error.messages[0])
+                continue
+            if email in batch:
+                result.unchanged += 1
+            else:
+                batch[email] = line
+        if batch:
+            _apply(batch, result)
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+def export_subscribers(queryset=None, file_format='csv', chunk_size=BATCH_SIZE):
+    """Yield the subscribers of ``queryset`` (all by default) as CSV or NDJSON lines"""
+    from .models import Newsletter
+
+    if queryset is None:
+        queryset = Newsletter.objects.all()
+    rows = queryset.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if file_format == 'ndjson':
+        for email, is_active, subscribed_at, unsubscribed_at in rows:
+            yield json.dumps({
+                'email': email, 'is_active': is_active, 'subscribed_at': _timestamp(subscribed_at),
+                'unsubscribed_at': _timestamp(unsubscribed_at),
+            }) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(EXPORT_FIELDS)
+    for email, is_active, subscribed_at, unsubscribed_at in rows:
+        yield line((email, 'true' if is_active else 'false', _timestamp(subscribed_at) or '',
+                    _timestamp(unsubscribed_at) or ''))
+
+
+def unsubscribe_token(email):
+    return signing.dumps(email, salt=UNSUBSCRIBE_SALT, compress=True)
+
+
+def unsubscribe(token):
+    """Deactivate the subscriber of a signed ``token``; False if the token is invalid"""
+    from django.utils import timezone
+    from .models import Newsletter
+
+    try:
+        email = signing.loads(token, salt=UNSUBSCRIBE_SALT)
+    except signing.BadSignature:
+        return False
+    Newsletter.objects.filter(email=email, is_active=True).update(is_active=False, unsubscribed_at=timezone.now())
+    return True
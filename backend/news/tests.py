@@ -1,3 +1,749 @@
-from django.test import TestCase
+import json
+import os
+import smtplib
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import digest, media, publishing, related, richtext, subscribers, trending
+from .counts import rebuild_tag_counts
+from .models import (
+    Article, ArticleViewBucket, Author, Category, Newsletter, NewsletterDigest, RelatedArticle, TagStats,
+    TrendingScore,
+)
+from .smtp_sink import SMTPSink
+from .view_counter import ViewCountBuffer
+
+
+def create_author(name='Alice', **fields):
+    """An author with the fields a test doesn't care about filled in"""
+    fields.setdefault('bio', '')
+    fields.setdefault('email', f'{name.lower()}@example.com')
+    return Author.objects.create(name=name, **fields)
+
+
+def create_author_and_category(category='Politics', **author_fields):
+    """The author and category most article fixtures need, as ``(author, category)``"""
+    return create_author(**author_fields), Category.objects.create(name=category)
+
+
+class PublishedArticleCountTests(TestCase):
+    def setUp(self):
+        self.politics = Category.objects.create(name='Politics')
+        self.alice, self.sports = create_author_and_category('Sports')
+        self.bob = create_author('Bob')
+
+    def make_article(self, title, **kwargs):
+        kwargs.setdefault('author', self.alice)
+        kwargs.setdefault('category', self.politics)
+        kwargs.setdefault('status', 'published')
+        return Article.objects.create(title=title, excerpt='Excerpt', content='<p>Body</p>', **kwargs)
+
+    def assertCounts(self, politics, sports, alice, bob):
+        counts = (
+            Category.objects.get(pk=self.politics.pk).published_article_count,
+            Category.objects.get(pk=self.sports.pk).published_article_count,
+            Author.objects.get(pk=self.alice.pk).published_article_count,
+            Author.objects.get(pk=self.bob.pk).published_article_count,
+        )
+        self.assertEqual(counts, (politics, sports, alice, bob))
+
+    def test_publish_and_unpublish(self):
+        article = self.make_article('Draft story', status='draft')
+        self.assertCounts(0, 0, 0, 0)
+        article.status = 'published'
+        article.save()
+        self.assertCounts(1, 0, 1, 0)
+        article.save()
+        self.assertCounts(1, 0, 1, 0)
+        article.status = 'archived'
+        article.save()
+        self.assertCounts(0, 0, 0, 0)
+
+    def test_recategorize_and_reassign(self):
+        article = self.make_article('Moving story')
+        article.category = self.sports
+        article.author = self.bob
+        article.save()
+        self.assertCounts(0, 1, 0, 1)
+
+    def test_delete(self):
+        self.make_article('Kept story')
+        self.make_article('Deleted story').delete()
+        self.assertCounts(1, 0, 1, 0)
+
+    def test_views_only_save_skips_count_lookup(self):
+        article = self.make_article('Popular story')
+        with self.assertNumQueries(1):
+            article.save(update_fields=['views_count'])
+
+    def test_save_reads_the_stored_row_once(self):
+        article = self.make_article('Edited story')
+        article.title = 'Edited story, updated'
+        with CaptureQueriesContext(connection) as queries:
+            article.save()
+        own_row = f'FROM "news_article" WHERE "news_article"."id" = {article.pk}'
+        own_row_reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and own_row in query['sql']
+        ]
+        self.assertEqual(len(own_row_reads), 1, own_row_reads)
+
+    def test_rebuild_command(self):
+        self.make_article('First story')
+        self.make_article('Second story', category=self.sports, author=self.bob)
+        Category.objects.update(published_article_count=42)
+        Author.objects.update(published_article_count=0)
+        call_command('rebuild_article_counts', stdout=StringIO())
+        self.assertCounts(1, 1, 1, 1)
+
+
+class TagCountTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_author_and_category('Politics')
+
+    def make_article(self, title, status='published'):
+        return Article.objects.create(title=title, excerpt='', content='', status=status,
+                                      author=self.author, category=self.category)
+
+    def counts(self):
+        return dict(TagStats.objects.values_list('tag__slug', 'published_article_count'))
+
+    def test_tagging_published_and_draft_articles(self):
+        published = self.make_article('Published story')
+        draft = self.make_article('Draft story', status='draft')
+        published.tags.add('election', 'economy')
+        draft.tags.add('election')
+        self.assertEqual(self.counts(), {'election': 1, 'economy': 1})
+        published.tags.set(['election', 'budget'])
+        self.assertEqual(self.counts(), {'election': 1, 'economy': 0, 'budget': 1})
+        published.tags.clear()
+        self.assertEqual(self.counts(), {'election': 0, 'economy': 0, 'budget': 0})
+
+    def test_status_changes_and_delete(self):
+        article = self.make_article('Story', status='draft')
+        article.tags.add('election')
+        self.assertEqual(self.counts().get('election', 0), 0)
+        article.status = 'published'
+        article.save()
+        self.assertEqual(self.counts(), {'election': 1})
+        article.delete()
+        self.assertEqual(self.counts(), {'election': 0})
+
+    def test_rebuild_matches_incremental_counts(self):
+        for index in range(3):
+            self.make_article(f'Story {index}', status='published' if index else 'draft').tags.add('election')
+        incremental = self.counts()
+        Article.objects.filter(status='draft').update(status='published')
+        self.assertEqual(rebuild_tag_counts(), 1)
+        self.assertEqual(self.counts(), {'election': incremental['election'] + 1})
+
+
+class RelatedArticlesTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_author_and_category('World')
+        self.volcano = self.make_article('Volcano erupts near the coast', '<p>Lava and ash from the volcano eruption.</p>')
+        self.eruption = self.make_article('Eruption forces evacuation', '<p>The volcano sent ash over villages.</p>')
+        self.budget = self.make_article('Parliament passes the budget', '<p>The budget vote raised taxes.</p>')
+        self.football = self.make_article('Cup final ends in a draw', '<p>Both teams scored twice.</p>')
+        related.rebuild()
+
+    def make_article(self, title, content, status='published'):
+        return Article.objects.create(title=title, excerpt='', content=content, status=status,
+                                      author=self.author, category=self.category)
+
+    def related_ids(self, article):
+        return list(RelatedArticle.objects.filter(article=article).order_by('rank').values_list('related_id', flat=True))
+
+    def test_rebuild_ranks_by_text_and_tags(self):
+        self.assertEqual(self.related_ids(self.volcano), [self.eruption.pk])
+        self.assertEqual(self.related_ids(self.football), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.football.tags.add('weekend')
+            self.budget.tags.add('weekend')
+        self.assertEqual(self.related_ids(self.football), [self.budget.pk])
+        self.assertEqual(self.related_ids(self.budget), [self.football.pk])
+
+    def test_publishing_and_editing_refresh_neighbour_lists(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ash = self.make_article('Ash cloud grounds flights', '<p>Volcano ash and lava again.</p>')
+        self.assertIn(ash.pk, self.related_ids(self.volcano))
+        self.assertIn(self.volcano.pk, self.related_ids(ash))
+        # Scores shift once rebuild refreshes document frequencies, the neighbours do not
+        incremental = {pk: set(self.related_ids(pk)) for pk in (self.volcano.pk, self.eruption.pk, ash.pk)}
+        related.rebuild()
+        self.assertEqual({pk: set(self.related_ids(pk)) for pk in incremental}, incremental)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ash.title, ash.content = 'Budget talks continue', '<p>Taxes and the parliament vote.</p>'
+            ash.save()
+        self.assertNotIn(ash.pk, self.related_ids(self.volcano))
+        self.assertEqual(self.related_ids(ash), [self.budget.pk])
+
+    def test_unpublish_and_delete_remove_the_article(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eruption.status = 'draft'
+            self.eruption.save()
+        self.assertEqual(self.related_ids(self.volcano), [])
+        self.assertEqual(self.related_ids(self.eruption), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eruption.status = 'published'
+            self.eruption.save()
+        self.assertEqual(self.related_ids(self.volcano), [self.eruption.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eruption.delete()
+        self.assertEqual(self.related_ids(self.volcano), [])
+
+
+class PublishingTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_author_and_category('Politics')
+        self.drafts = [
+            Article.objects.create(title=f'Imported story {index}', excerpt='Imported excerpt', content='<p>Body</p>',
+                                   status='draft', author=self.author, category=self.category)
+            for index in range(4)
+        ]
+        for article in self.drafts:
+            article.tags.add('import')
+        Article.objects.update(meta_title='', meta_description='')
+        self.notifications = []
+        publishing.articles_changed.connect(self.notify)
+        self.addCleanup(publishing.articles_changed.disconnect, self.notify)
+
+    def notify(self, sender, article_ids, fields, **kwargs):
+        self.notifications.append((sorted(article_ids), fields))
+
+    def counts(self):
+        return (
+            Category.objects.get(pk=self.category.pk).published_article_count,
+            Author.objects.get(pk=self.author.pk).published_article_count,
+            TagStats.objects.get(tag__slug='import').published_article_count,
+        )
+
+    def test_publish_batch(self):
+        dated = timezone.now() - timedelta(days=2)
+        Article.objects.filter(pk=self.drafts[0].pk).update(published_date=dated)
+        self.assertEqual(publishing.publish(Article.objects.filter(status='draft')), 4)
+        self.assertEqual(self.counts(), (4, 4, 4))
+        article = Article.objects.get(pk=self.drafts[0].pk)
+        self.assertEqual((article.status, article.published_date), ('published', dated))
+        self.assertEqual((article.meta_title, article.meta_description), ('Imported story 0', 'Imported excerpt'))
+        self.assertFalse(Article.objects.filter(published_date__isnull=True).exists())
+        self.assertEqual(len(self.notifications), 1)
+        self.assertEqual(self.notifications[0][0], [article.pk for article in self.drafts])
+        # Already published rows are skipped
+        self.assertEqual(publishing.publish(Article.objects.all()), 0)
+        self.assertEqual(len(self.notifications), 1)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            publishing.publish(Article.objects.filter(pk=self.drafts[0].pk))
+        with CaptureQueriesContext(connection) as large:
+            publishing.publish(Article.objects.filter(status='draft'))
+        self.assertEqual(len(large), len(small))
+
+    def test_unpublish_and_feature(self):
+        publishing.publish(Article.objects.all())
+        TrendingScore.objects.bulk_create(
+            [TrendingScore(article=article, category=self.category, score=1, rank=1, scored_at=timezone.now())
+             for article in self.drafts]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(publishing.unpublish(Article.objects.filter(pk__in=[a.pk for a in self.drafts[:3]])), 3)
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.assertEqual(list(TrendingScore.objects.values_list('article_id', flat=True)), [self.drafts[3].pk])
+
+        before = Article.objects.get(pk=self.drafts[3].pk).updated_at
+        self.assertEqual(publishing.feature(Article.objects.all()), 4)
+        self.assertEqual(publishing.feature(Article.objects.all()), 0)
+        self.assertGreater(Article.objects.get(pk=self.drafts[3].pk).updated_at, before)
+        self.assertEqual(self.notifications[-1][1], frozenset({'is_featured'}))
+
+    @override_settings(RELATED={'BATCH_REFRESH_LIMIT': 2})
+    def test_large_batches_leave_related_articles_to_rebuild(self):
+        publishing.publish(Article.objects.all())
+        related.rebuild()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            publishing.unpublish(Article.objects.filter(pk__in=[a.pk for a in self.drafts[:3]]))
+        self.assertEqual([callback for callback in callbacks if getattr(callback, 'func', None) is related.refresh], [])
+        self.assertEqual(list(RelatedArticle.objects.all()), [])
+
+    def test_command(self):
+        Article.objects.filter(pk=self.drafts[0].pk).update(status='published')
+        out = StringIO()
+        call_command('bulk_articles', 'fix-dates', '--status', 'published', stdout=out)
+        self.assertIn('changed 1 articles', out.getvalue())
+        self.assertIsNotNone(Article.objects.get(pk=self.drafts[0].pk).published_date)
+        call_command('bulk_articles', 'publish', '--category', 'politics', stdout=out)
+        self.assertEqual(self.counts(), (4, 4, 4))
+        with self.assertRaises(CommandError):
+            call_command('bulk_articles', 'unpublish', stdout=out)
+
+
+class ViewCountBufferTests(TestCase):
+    def setUp(self):
+        author, category = create_author_and_category('Politics')
+        self.first, self.second = (
+            Article.objects.create(
+                title=title, excerpt='Excerpt', content='<p>Body</p>',
+                author=author, category=category, status='published',
+            )
+            for title in ('First story', 'Second story')
+        )
+
+    def views(self, article):
+        return Article.objects.get(pk=article.pk).views_count
+
+    def test_record_does_not_write(self):
+        buffer = ViewCountBuffer(flush_interval=3600, max_pending=100, background=False)
+        with self.assertNumQueries(0):
+            self.assertEqual(buffer.record(self.first.pk), 1)
+            self.assertEqual(buffer.record(self.first.pk), 2)
+        self.assertEqual(self.views(self.first), 0)
+
+    def test_flush_applies_increments(self):
+        buffer = ViewCountBuffer(flush_interval=3600, max_pending=100, background=False)
+        for _ in range(3):
+            buffer.record(self.first.pk)
+        buffer.record(self.second.pk)
+        Article.objects.filter(pk=self.first.pk).update(views_count=10)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual((self.views(self.first), self.views(self.second)), (13, 1))
+        self.assertEqual(buffer.pending(self.first.pk), 0)
+
+    def test_size_threshold_triggers_flush(self):
+        buffer = ViewCountBuffer(flush_interval=3600, max_pending=2, background=False)
+        buffer.record(self.first.pk)
+        self.assertEqual(self.views(self.first), 0)
+        buffer.record(self.second.pk)
+        self.assertEqual((self.views(self.first), self.views(self.second)), (1, 1))
+
+    def test_flush_feeds_trending(self):
+        buffer = ViewCountBuffer(flush_interval=3600, max_pending=100, background=False)
+        for _ in range(3):
+            buffer.record(self.first.pk)
+        buffer.record(self.second.pk)
+        buffer.flush()
+        self.assertEqual(
+            dict(ArticleViewBucket.objects.values_list('article_id', 'views')),
+            {self.first.pk: 3, self.second.pk: 1},
+        )
+        self.assertEqual(
+            list(TrendingScore.objects.order_by('-rank').values_list('article_id', flat=True)),
+            [self.first.pk, self.second.pk],
+        )
+
+
+class ReadingStatsTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_author_and_category('Politics')
+
+    def test_stats_ignore_markup(self):
+        content = '<p style="text-align:justify">' + 'word ' * 450 + '</p><p>&nbsp;</p>'
+        article = Article.objects.create(
+            title='Long read', excerpt='Excerpt', content=content,
+            author=self.author, category=self.category,
+        )
+        article.refresh_from_db()
+        self.assertEqual((article.word_count, article.read_time), (450, 2))
+
+    def test_partial_saves(self):
+        article = Article.objects.create(
+            title='Short read', excerpt='Excerpt', content='<p>one two</p>',
+            author=self.author, category=self.category,
+        )
+        article.content = '<p>' + 'word ' * 1000 + '</p>'
+        article.save(update_fields=['content'])
+        self.assertEqual(Article.objects.get(pk=article.pk).read_time, 5)
+
+        listed = Article.objects.for_listing().get(pk=article.pk)
+        listed.title = 'Renamed'
+        listed.save()
+        # Saving an instance loaded without its body must not reset the stats
+        self.assertEqual(Article.objects.get(pk=article.pk).word_count, 1000)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.politics = Category.objects.create(name='Politics')
+        author, self.sports = create_author_and_category('Sports')
+        self.viral, self.fresh, self.match = (
+            Article.objects.create(
+                title=title, excerpt='Excerpt', content='<p>Body</p>',
+                author=author, category=category, status='published',
+            )
+            for title, category in (('Viral', self.politics), ('Fresh', self.politics), ('Match', self.sports))
+        )
+        # Aligned to a bucket start so incremental and rebuilt scores agree exactly
+        self.now = trending.bucket_start(timezone.now(), 60)
+
+    def ranking(self, category=None):
+        entries = TrendingScore.objects.order_by('-rank')
+        if category is not None:
+            entries = entries.filter(category=category)
+        return list(entries.values_list('article_id', flat=True))
+
+    def test_old_spikes_decay(self):
+        trending.record_views({self.viral.pk: 1000}, now=self.now - timedelta(days=5))
+        trending.record_views({self.fresh.pk: 20, self.match.pk: 5}, now=self.now)
+        self.assertEqual(self.ranking(), [self.fresh.pk, self.match.pk, self.viral.pk])
+        # 10 half-lives later the 1000 views are worth about one view
+        viral = TrendingScore.objects.get(pk=self.viral.pk)
+        self.assertAlmostEqual(trending.decay(viral.score, viral.scored_at, self.now, 12 * 3600), 1000 / 2 ** 10)
+
+    def test_incremental_scores_match_rebuild(self):
+        for hours, counts in ((30, {self.viral.pk: 40}), (6, {self.fresh.pk: 10, self.viral.pk: 2}),
+                              (0, {self.match.pk: 8, self.fresh.pk: 1})):
+            trending.record_views(counts, now=self.now - timedelta(hours=hours))
+        incremental = {entry.pk: entry.rank for entry in TrendingScore.objects.all()}
+        self.assertEqual(trending.rebuild(now=self.now), 3)
+        for entry in TrendingScore.objects.all():
+            self.assertAlmostEqual(entry.rank, incremental[entry.pk])
+
+    def test_category_leaderboards_follow_articles(self):
+        trending.record_views({self.viral.pk: 5, self.fresh.pk: 3, self.match.pk: 4}, now=self.now)
+        self.assertEqual(self.ranking(self.politics), [self.viral.pk, self.fresh.pk])
+        self.viral.category = self.sports
+        self.viral.save()
+        self.assertEqual(self.ranking(self.sports), [self.viral.pk, self.match.pk])
+
+    def test_prune_and_seed(self):
+        trending.record_views({self.viral.pk: 5}, now=self.now - timedelta(days=8))
+        trending.record_views({self.fresh.pk: 5}, now=self.now)
+        Article.objects.filter(pk=self.match.pk).update(views_count=7)
+        out = StringIO()
+        call_command('refresh_trending', '--seed', stdout=out)
+        self.assertIn('Pruned 1 view buckets and 1 leaderboard rows.', out.getvalue())
+        self.assertEqual(set(self.ranking()), {self.fresh.pk, self.match.pk})
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        import cloudinary
+
+        cloudinary.reset_config()
+        self.addCleanup(cloudinary.reset_config)
+        cloudinary.config(cloud_name='demo')
+        self.author, self.category = create_author_and_category('Politics', avatar='people/alice')
+
+    def article(self, image):
+        return Article.objects.create(
+            title='Title', excerpt='Excerpt', content='<p>Body</p>', author=self.author,
+            category=self.category, status='published', featured_image=image,
+        )
+
+    def test_variants_are_stored_on_save(self):
+        article = self.article('news/photo.jpg')
+        variants = Article.objects.get(pk=article.pk).featured_image_variants
+        self.assertEqual(variants['url'], 'https://res.cloudinary.com/demo/image/upload/v1/news/photo.jpg')
+        self.assertIn('c_limit,f_auto,q_auto,w_960/v1/news/photo.jpg', variants['src'])
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in variants['srcset'].split(', ')],
+                         ['320w', '640w', '960w', '1280w', '1920w'])
+        self.assertIn('w_128/v1/people/alice', self.author.avatar_variants['src'])
+
+        article.featured_image = 'news/other.png'
+        article.save(update_fields=['featured_image'])
+        self.assertIn('/news/other.png', Article.objects.get(pk=article.pk).featured_image_variants['url'])
+
+    def test_cloudinary_urls_are_transformed_and_external_urls_kept(self):
+        versioned = media.article_variants('https://res.cloudinary.com/demo/image/upload/v12/news/photo.jpg')
+        self.assertIn('/w_320/v12/news/photo.jpg 320w', versioned['srcset'].replace('c_limit,f_auto,q_auto,', ''))
+        external = media.article_variants('https://example.com/photo.jpg')
+        self.assertEqual(external, {'url': 'https://example.com/photo.jpg', 'src': 'https://example.com/photo.jpg',
+                                    'srcset': ''})
+        self.assertEqual(media.article_variants(None), {})
+
+    def test_backfill_command(self):
+        article = self.article('news/photo.jpg')
+        Article.objects.filter(pk=article.pk).update(featured_image_variants={})
+        out = StringIO()
+        with override_settings(MEDIA_VARIANTS={'ARTICLE_WIDTHS': (480,), 'ARTICLE_DEFAULT_WIDTH': 480}):
+            call_command('backfill_image_variants', stdout=out)
+        self.assertIn('Updated image variants of 1 articles and 0 authors.', out.getvalue())
+        srcset = Article.objects.get(pk=article.pk).featured_image_variants['srcset']
+        self.assertTrue(srcset.endswith('w_480/v1/news/photo.jpg 480w'))
+
+
+class SubscriberImportTests(TestCase):
+    def setUp(self):
+        Newsletter.objects.create(email='active@example.com')
+        Newsletter.objects.create(email='gone@example.com', is_active=False, unsubscribed_at=timezone.now())
+
+    def test_batched_upsert(self):
+        rows = StringIO(
+            'name,email\nA,new@Example.COM\nB,gone@example.com\nC,active@example.com\n'
+            'D,not-an-email\nE, new@example.com \n,\n'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = subscribers.import_subscribers(rows, 'csv', batch_size=100)
+        self.assertEqual(result.as_dict(), {
+            'created': 1, 'reactivated': 1, 'unchanged': 2, 'invalid': 1,
+            'errors': [{'line': 5, 'value': 'not-an-email', 'error': 'Enter a valid email address.'}],
+        })
+        # Savepoint, lookup, insert, update, release: the same five for 100 rows or one
+        self.assertEqual(len(queries), 5)
+        self.assertEqual(sorted(Newsletter.objects.filter(is_active=True).values_list('email', flat=True)),
+                         ['active@example.com', 'gone@example.com', 'new@example.com'])
+        self.assertIsNone(Newsletter.objects.get(email='gone@example.com').unsubscribed_at)
+
+    def test_ndjson_round_trip(self):
+        rows = StringIO('{"email": "one@example.com"}\n\n["two@example.com"]\n{"email": "two@example.com"}\n')
+        result = subscribers.import_subscribers(rows, 'ndjson', batch_size=1)
+        self.assertEqual((result.created, result.invalid), (2, 1))
+        exported = [json.loads(line) for line in subscribers.export_subscribers(file_format='ndjson', chunk_size=2)]
+        self.assertEqual([row['email'] for row in exported],
+                         ['active@example.com', 'gone@example.com', 'one@example.com', 'two@example.com'])
+        self.assertFalse(exported[1]['is_active'])
+
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'list.csv')
+            with open(source, 'w') as output:
+                output.write('first@example.com\nsecond@example.com\n')
+            out = StringIO()
+            call_command('import_subscribers', source, stdout=out)
+            self.assertIn('2 subscribed, 0 reactivated, 0 unchanged, 0 invalid', out.getvalue())
+        out = StringIO()
+        call_command('export_subscribers', '--active', stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0], 'email,is_active,subscribed_at,unsubscribed_at')
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+
+class FlakyBackend(locmem.EmailBackend):
+    """Drops the connection on every message to an address in ``failing``; rejects those to ``rejected``"""
+    failing = set()
+    rejected = set()
+    opened = 0
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        addresses = {address for message in messages for address in message.to}
+        if addresses & self.failing:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        if addresses & self.rejected:
+            raise smtplib.SMTPDataError(554, b'Message rejected')
+        return super().send_messages(messages)
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        author, category = create_author_and_category('Politics')
+        for title in ('Budget passes', 'Court rules'):
+            Article.objects.create(title=title, excerpt=f'{title} <today>', content='<p>Body</p>', author=author,
+                                   category=category, status='published')
+        self.subscribers = [Newsletter.objects.create(email=f'reader{n}@example.com') for n in range(5)]
+        Newsletter.objects.create(email='former@example.com', is_active=False)
+        self.issue = digest.build_issue()
+
+    def test_issue_is_rendered_once(self):
+        self.assertEqual(self.issue.article_count, 2)
+        self.assertIn('Budget passes &lt;today&gt;', self.issue.html_body)
+        self.assertIn('Court rules <today>', self.issue.text_body)
+        self.assertIn(digest.UNSUBSCRIBE_PLACEHOLDER, self.issue.html_body)
+        # The next issue starts where this one ended
+        self.assertIsNone(digest.build_issue())
+
+    def test_sends_over_reused_smtp_connections(self):
+        with SMTPSink(reject={'reader3@example.com'}) as sink, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=sink.port, EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            result = digest.send_issue(self.issue, workers=2, batch_size=2)
+        self.assertEqual((result['sent'], result['failed']), (4, 1))
+        self.assertEqual(sink.messages, 4)
+        self.assertLessEqual(sink.connections, 2)
+        self.assertNotIn('former@example.com', sink.recipients)
+        issue = NewsletterDigest.objects.get(pk=self.issue.pk)
+        self.assertEqual((issue.status, issue.sent_count, issue.failed_count), ('sent', 4, 1))
+        self.assertEqual(issue.checkpoint, self.subscribers[-1].pk)
+
+    @override_settings(EMAIL_BACKEND='news.tests.FlakyBackend')
+    def test_interrupted_run_resumes_after_checkpoint(self):
+        FlakyBackend.failing = {'reader3@example.com'}
+        self.addCleanup(setattr, FlakyBackend, 'failing', set())
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            digest.send_issue(self.issue, workers=1, batch_size=2)
+        issue = NewsletterDigest.objects.get(pk=self.issue.pk)
+        self.assertEqual((issue.status, issue.checkpoint, issue.sent_count), ('sending', self.subscribers[1].pk, 2))
+
+        self.assertNotIn('reader3@example.com', [message.to[0] for message in mail.outbox])
+
+        FlakyBackend.failing = set()
+        mail.outbox = []
+        out = StringIO()
+        call_command('send_digest', stdout=out)
+        self.assertIn(f'Resuming digest {issue.pk} after subscriber {self.subscribers[1].pk}', out.getvalue())
+        self.assertIn('Sent 3 messages (0 refused)', out.getvalue())
+        # reader2 was sent in the failed batch, before reader3, and is sent again: delivery is at least once
+        self.assertEqual([message.to[0] for message in mail.outbox],
+                         [f'reader{n}@example.com' for n in (2, 3, 4)])
+        self.assertEqual(NewsletterDigest.objects.get(pk=issue.pk).status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='news.tests.FlakyBackend')
+    def test_rejected_message_fails_alone(self):
+        FlakyBackend.rejected, FlakyBackend.opened = {'reader1@example.com'}, 0
+        self.addCleanup(setattr, FlakyBackend, 'rejected', set())
+        result = digest.send_issue(self.issue, workers=1, batch_size=2)
+        self.assertEqual((result['sent'], result['failed']), (4, 1))
+        self.assertEqual(FlakyBackend.opened, 1)
+        self.assertEqual(NewsletterDigest.objects.get(pk=self.issue.pk).status, 'sent')
+
+    def test_unsubscribe_link(self):
+        digest.send_issue(self.issue, workers=1)
+        message = mail.outbox[0]
+        url = message.extra_headers['List-Unsubscribe'].strip('<>')
+        self.assertIn(url, message.body)
+        self.assertIn(url, message.alternatives[0][0])
+        path = '/api/newsletter/unsubscribe/?' + url.partition('?')[2]
+        self.assertEqual(self.client.get(path).status_code, 200)
+        self.assertTrue(Newsletter.objects.get(email=message.to[0]).is_active)
+        self.assertEqual(self.client.post(path).status_code, 200)
+        self.assertFalse(Newsletter.objects.get(email=message.to[0]).is_active)
+        self.assertEqual(self.client.post('/api/newsletter/unsubscribe/', {'token': 'forged'}).status_code, 400)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        self.authors = [Author.objects.create(name=f'Author {n}', bio='', email=f'a{n}@example.com') for n in range(3)]
+        self.categories = [Category.objects.create(name=f'Category {n}') for n in range(3)]
+
+    def add_rows(self, count):
+        start = Article.objects.count()
+        for n in range(start, start + count):
+            Article.objects.create(
+                title=f'Story {n}', excerpt='Excerpt', content=f'<p>Body {n} election</p>',
+                author=self.authors[n % 3], category=self.categories[n % 3], status='published',
+            )
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for url in ('/admin/news/article/', '/admin/news/article/?q=election',
+                    '/admin/news/category/', '/admin/news/author/'):
+            with self.subTest(url=url):
+                Article.objects.all().delete()
+                self.add_rows(3)
+                few = len(self.queries(url))
+                self.add_rows(30)
+                self.assertEqual(len(self.queries(url)), few)
+
+    def test_article_changelist_does_not_load_bodies(self):
+        self.add_rows(3)
+        queries = self.queries('/admin/news/article/')
+        listing = [query['sql'] for query in queries.captured_queries if 'FROM "news_article"' in query['sql']]
+        self.assertTrue(listing)
+        self.assertFalse([sql for sql in listing if '"news_article"."content"' in sql])
+
+    def test_search_uses_full_text_index(self):
+        self.add_rows(3)
+        Article.objects.create(
+            title='Budget', excerpt='', content='<p>Parliament debated the budget</p>',
+            author=self.authors[0], category=self.categories[0], status='draft',
+        )
+        response = self.client.get('/admin/news/article/', {'q': 'parliament'})
+        self.assertEqual([article.title for article in response.context['cl'].result_list], ['Budget'])
+
+    def test_autocomplete_widgets(self):
+        response = self.client.get('/admin/news/article/add/')
+        self.assertContains(response, 'data-field-name="author"')
+        self.assertContains(response, 'data-field-name="category"')
+        # Options come from the autocomplete endpoint, not from every row rendered into the page
+        self.assertNotContains(response, 'Author 2')
+        self.assertNotContains(response, 'Category 2')
+
+
+class RichTextTests(TestCase):
+    def setUp(self):
+        import cloudinary
+
+        cloudinary.reset_config()
+        self.addCleanup(cloudinary.reset_config)
+        cloudinary.config(cloud_name='demo')
+        self.author, self.category = create_author_and_category('Politics')
+
+    def test_sanitizes_and_minifies(self):
+        processed = richtext.process(
+            '<p style="text-align: center; color: red" onclick="x()"><span style="font-size: 18px">Hello</span>\n'
+            '  <b>big</b>&nbsp;world</p>\n<p>&nbsp;</p>\n<p><br></p><!-- note -->\n'
+            '<script>alert(1)</script><style>p {}</style>'
+            '<p><a href="javascript:alert(1)">bad</a> <a href="https://example.com" target="_blank">ok</a></p>'
+            '<iframe src="https://evil.example.com/"></iframe><iframe src="https://www.youtube.com/embed/1"></iframe>'
+            '<pre>  a\n  b</pre><ul>\n  <li>one</li>\n  <li>two</li>\n</ul>'
+        )
+        self.assertEqual(processed.html, (
+            '<p style="text-align:center">Hello <strong>big</strong>\xa0world</p>'
+            '<p>bad <a href="https://example.com" target="_blank" rel="noopener noreferrer">ok</a></p>'
+            '<iframe src="https://www.youtube.com/embed/1" loading="lazy"></iframe>'
+            '<pre>  a\n  b</pre><ul><li>one</li><li>two</li></ul>'
+        ))
+        self.assertEqual(processed.text, 'Hello big world\nbad ok\na\nb\none\ntwo')
+
+    def test_void_elements_do_not_swallow_what_follows(self):
+        for html in (
+            '<p>Intro</p><embed src="x.swf"><p>Rest</p>',
+            '<p>Intro</p><embed src="x.swf"/><p>Rest</p>',
+            '<p>Intro</p><object data="x.swf"><param name="a" value="b"><embed src="x.swf">fallback</object><p>Rest</p>',
+            '<p>Intro</p><embed src="x.swf"></embed><link rel="x"><p>Rest</p>',
+        ):
+            with self.subTest(html=html):
+                self.assertEqual(richtext.process(html).html, '<p>Intro</p><p>Rest</p>')
+
+    def test_images_are_lazy_with_dimensions_and_srcset(self):
+        html = richtext.process(
+            '<p><img src="https://res.cloudinary.com/demo/image/upload/v1/news/a.jpg" style="width: 600px; height: 400px">'
+            ' caption</p><p><img src="/media/uploads/b.png" width="300" alt="B"></p><p><img src="javascript:x"></p>'
+        ).html
+        self.assertIn('src="https://res.cloudinary.com/demo/image/upload/c_limit,f_auto,q_auto,w_960/v1/news/a.jpg"', html)
+        self.assertIn('w_320/v1/news/a.jpg 320w', html)
+        self.assertIn('alt="" srcset=', html)
+        self.assertIn('width="600" height="400" loading="lazy" decoding="async"> caption</p>', html)
+        # One known dimension is no aspect ratio: none are emitted
+        self.assertIn('<p><img src="/media/uploads/b.png" alt="B" loading="lazy" decoding="async"></p>', html)
+        self.assertEqual(html.count('<img'), 2)
+
+    def test_outline_anchors_are_unique(self):
+        processed = richtext.process('<h2>Background</h2><h3>The <em>vote</em></h3><h2>Background</h2><h2> </h2>')
+        self.assertEqual(processed.outline, [
+            {'level': 2, 'text': 'Background', 'id': 'background'},
+            {'level': 3, 'text': 'The vote', 'id': 'the-vote'},
+            {'level': 2, 'text': 'Background', 'id': 'background-2'},
+        ])
+        self.assertTrue(processed.html.startswith('<h2 id="background">Background</h2><h3 id="the-vote">'))
+
+    def test_stored_on_save_and_backfilled(self):
+        article = Article.objects.create(
+            title='Title', excerpt='Excerpt', content='<h2>Lede</h2>\n<p>Body</p>', author=self.author,
+            category=self.category, status='published',
+        )
+        self.assertEqual((article.content_html, article.content_text), ('<h2 id="lede">Lede</h2><p>Body</p>', 'Lede\nBody'))
+        article.content = '<p>New body</p>'
+        article.save(update_fields=['content'])
+        stored = Article.objects.get(pk=article.pk)
+        self.assertEqual((stored.content_html, stored.content_outline), ('<p>New body</p>', []))
+
+        Article.objects.filter(pk=article.pk).update(content_html='', content_text='', content_outline=[])
+        out = StringIO()
+        call_command('backfill_processed_content', stdout=out)
+        self.assertIn('Updated processed content of 1 articles', out.getvalue())
+        self.assertEqual(Article.objects.get(pk=article.pk).content_text, 'New body')
+        call_command('backfill_processed_content', stdout=out)
+        self.assertIn('Updated processed content of 0 articles', out.getvalue())
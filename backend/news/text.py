@@ -0,0 +1,27 @@
+import html
+import re
+
+from django.utils.html import strip_tags
+
+WHITESPACE_RE = re.compile(r'\s+')
+WORDS_PER_MINUTE = 200
+BLOCK_TAG_RE = re.compile(r'</?(p|div|br|li|h[1-6]|blockquote|tr|td|th)\b[^>]*>', re.IGNORECASE)
+
+
+def strip_html(value):
+    """Convert rich-text HTML to a single line of plain text"""
+    if not value:
+        return ''
+    # Keep words in adjacent blocks apart before the tags disappear
+    text = strip_tags(BLOCK_TAG_RE.sub(' ', value))
+    return WHITESPACE_RE.sub(' ', html.unescape(text)).strip()
+
+
+def count_words(value):
+    """Number of words in rich-text HTML, ignoring markup"""
+    return len(strip_html(value).split())
+
+
+def read_time_minutes(word_count):
+    """Estimated read time in minutes for a word count"""
+    return max(1, round(word_count / WORDS_PER_MINUTE))
@@ -0,0 +1,214 @@
+"""
+Time-decayed trending leaderboard.
+
+Views are added to per-article time buckets (ArticleViewBucket) and folded
+into one TrendingScore row per article whose score halves every
+``HALF_LIFE_HOURS``. Rather than re-decaying every row as time passes, each
+row also stores a forward-decayed key::
+
+    rank = log2(score) + (scored_at - EPOCH) / half_life
+
+Decay multiplies every score by the same factor, so ordering by ``rank``
+is always the same as ordering by the current score. Recording views only
+rewrites the rows that got views, and reading the top N is an index scan
+over ``rank``.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+DEFAULTS = {
+    'HALF_LIFE_HOURS': 12,
+    'BUCKET_MINUTES': 60,
+    'WINDOW_DAYS': 7,
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'TRENDING', {}))
+    return config
+
+
+def half_life_seconds(config=None):
+    return (config or get_config())['HALF_LIFE_HOURS'] * 3600
+
+
+def bucket_start(moment, minutes):
+    """Floor ``moment`` to its ``minutes``-wide bucket"""
+    elapsed = (moment - EPOCH).total_seconds()
+    return EPOCH + timedelta(seconds=elapsed - elapsed % (minutes * 60))
+
+
+def decay(score, since, until, half_life):
+    """Decay a score measured at ``since`` to ``until``"""
+    return score * 2 ** (-(until - since).total_seconds() / half_life)
+
+
+def rank_key(score, at, half_life):
+    """Forward-decayed sort key of ``score`` measured at ``at``"""
+    return math.log2(score) + (at - EPOCH).total_seconds() / half_life
+
+
+def parse_limit(value, config=None):
+    """``?limit=`` as a positive int capped at MAX_LIMIT; invalid values fall back to the default"""
+    config = config or get_config()
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return config['DEFAULT_LIMIT']
+    if limit < 1:
+        return config['DEFAULT_LIMIT']
+    return min(limit, config['MAX_LIMIT'])
+
+
+@transaction.atomic
+def record_views(counts, now=None):
+    """
+    Add ``{article_id: views}`` to the current time bucket and the leaderboard.
+
+    Bucket counters are bumped with ``F()`` updates and leaderboard rows are
+    locked before being rescored, so concurrent workers never lose views.
+    Returns the number of articles scored.
+    """
+    from django.utils import timezone
+    from .models import Article, ArticleViewBucket, TrendingScore
+
+    counts = {pk: views for pk, views in counts.items() if views > 0}
+    if not counts:
+        return 0
+    now = now or timezone.now()
+    config = get_config()
+    half_life = half_life_seconds(config)
+    bucket = bucket_start(now, config['BUCKET_MINUTES'])
+
+    # Articles deleted since the views were buffered are skipped
+    categories = dict(Article.objects.filter(pk__in=list(counts)).values_list('pk', 'category_id'))
+    if not categories:
+        return 0
+
+    ArticleViewBucket.objects.bulk_create(
+        [ArticleViewBucket(article_id=pk, bucket=bucket) for pk in categories], ignore_conflicts=True
+    )
+    by_increment = defaultdict(list)
+    for pk in categories:
+        by_increment[counts[pk]].append(pk)
+    for views, article_ids in by_increment.items():
+        ArticleViewBucket.objects.filter(article_id__in=article_ids, bucket=bucket).update(
+            views=F('views') + views
+        )
+
+    TrendingScore.objects.bulk_create(
+        [TrendingScore(article_id=pk, category_id=category_id, scored_at=now)
+         for pk, category_id in categories.items()],
+        ignore_conflicts=True,
+    )
+    entries = list(TrendingScore.objects.select_for_update().filter(article_id__in=list(categories)))
+    for entry in entries:
+        entry.score = decay(entry.score, entry.scored_at, now, half_life) + counts[entry.article_id]
+        entry.scored_at = max(entry.scored_at, now)
+        entry.rank = rank_key(entry.score, entry.scored_at, half_life)
+    TrendingScore.objects.bulk_update(entries, ['score', 'scored_at', 'rank'])
+    return len(entries)
+
+
+def trending_articles(queryset, limit, category_slug=None, now=None):
+    """
+    Order ``queryset`` by trending rank; callers slice the result to ``limit``.
+
+    The leaderboard is cut to a couple of times ``limit`` rows in a subquery
+    first, so the read is an index range scan over ``rank`` (or category,
+    rank) however many articles have views. Only articles viewed within the
+    last WINDOW_DAYS are included.
+    """
+    from django.utils import timezone
+    from .models import TrendingScore
+
+    now = now or timezone.now()
+    entries = TrendingScore.objects.filter(scored_at__gte=now - timedelta(days=get_config()['WINDOW_DAYS']))
+    if category_slug:
+        entries = entries.filter(category__slug=category_slug)
+    # Headroom for entries of articles unpublished by bulk updates, which bypass
+    # the signal that removes them; ``queryset`` filters those out
+    top = entries.order_by('-rank').values('article_id')[:limit * 2]
+    return queryset.filter(pk__in=top).order_by('-trending__rank')
+
+
+def prune(now=None):
+    """Drop buckets and leaderboard rows older than the window; returns (buckets, entries) deleted"""
+    from django.utils import timezone
+    from .models import ArticleViewBucket, TrendingScore
+
+    now = now or timezone.now()
+    since = now - timedelta(days=get_config()['WINDOW_DAYS'])
+    buckets = ArticleViewBucket.objects.filter(bucket__lt=since).delete()[0]
+    entries = TrendingScore.objects.filter(scored_at__lt=since).delete()[0]
+    return buckets, entries
+
+
+def seed_from_lifetime_views(now=None):
+    """
+    Give articles published within the window and never bucketed one bucket of their lifetime views.
+
+    Bootstraps the leaderboard when trending is first deployed. Returns
+    the number of buckets created.
+    """
+    from django.utils import timezone
+    from .models import Article, ArticleViewBucket
+
+    now = now or timezone.now()
+    config = get_config()
+    since = now - timedelta(days=config['WINDOW_DAYS'])
+    articles = (
+        Article.objects.filter(status='published', published_date__gte=since, views_count__gt=0)
+        .filter(view_buckets__isnull=True)
+        .values_list('pk', 'published_date', 'views_count')
+    )
+    created = ArticleViewBucket.objects.bulk_create([
+        ArticleViewBucket(
+            article_id=pk, bucket=bucket_start(min(published_date, now), config['BUCKET_MINUTES']), views=views,
+        )
+        for pk, published_date, views in articles
+    ], ignore_conflicts=True)
+    return len(created)
+
+
+@transaction.atomic
+def rebuild(now=None):
+    """Recompute every leaderboard row from the buckets inside the window; returns the row count"""
+    from django.utils import timezone
+    from .models import ArticleViewBucket, TrendingScore
+
+    now = now or timezone.now()
+    config = get_config()
+    half_life = half_life_seconds(config)
+    since = now - timedelta(days=config['WINDOW_DAYS'])
+
+    scores, categories, latest = defaultdict(float), {}, {}
+    buckets = ArticleViewBucket.objects.filter(bucket__gte=since, views__gt=0).values_list(
+        'article_id', 'article__category_id', 'bucket', 'views'
+    )
+    for article_id, category_id, bucket, views in buckets.iterator(chunk_size=5000):
+        scores[article_id] += decay(views, bucket, now, half_life)
+        categories[article_id] = category_id
+        latest[article_id] = max(latest.get(article_id, bucket), bucket)
+
+    TrendingScore.objects.all().delete()
+    entries = []
+    for article_id, score in scores.items():
+        # Score as of the newest views, so the window filter keeps its meaning
+        scored_at = latest[article_id]
+        score = decay(score, now, scored_at, half_life)
+        entries.append(TrendingScore(
+            article_id=article_id, category_id=categories[article_id], score=score,
+            scored_at=scored_at, rank=rank_key(score, scored_at, half_life),
+        ))
+    TrendingScore.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
@@ -0,0 +1,162 @@
+"""
+Buffered article view counting.
+
+Detail requests only bump an in-memory counter; pending increments are
+written back as set-based ``F()`` updates once the buffer is old or large
+enough, together with the trending leaderboard (news.trending). Every
+gunicorn worker keeps its own buffer, which is safe because each flush adds
+to the stored value instead of overwriting it.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+
+from . import trending
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 10,
+    'MAX_PENDING': 500,
+    # Flush from a daemon thread; off, the request that finds the buffer due flushes it
+    'BACKGROUND': True,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'VIEW_COUNTER', {}))
+    return config
+
+
+class ViewCountBuffer:
+    def __init__(self, flush_interval=10, max_pending=500, background=True):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.background = background
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_flush = time.monotonic()
+
+    def record(self, article_id, count=1):
+        """Buffer a view and return the number of views pending for the article"""
+        with self._lock:
+            self._pending[article_id] += count
+            pending = self._pending[article_id]
+            due = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if self.background:
+            self._ensure_thread()
+            if due:
+                self._wakeup.set()
+        elif due:
+            self.flush()
+        return pending
+
+    def pending(self, article_id):
+        with self._lock:
+            return self._pending.get(article_id, 0)
+
+    def flush(self):
+        """Write all buffered views to the database; returns the number of articles touched"""
+        from .models import Article
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(int)
+                self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+
+            # One UPDATE per distinct increment keeps the flush set-based
+            by_increment = defaultdict(list)
+            for article_id, count in batch.items():
+                by_increment[count].append(article_id)
+            try:
+                with transaction.atomic():
+                    for count, article_ids in by_increment.items():
+                        Article.objects.filter(pk__in=article_ids).update(
+                            views_count=F('views_count') + count
+                        )
+                    trending.record_views(batch)
+            except Exception:
+                logger.exception('Failed to flush %d buffered article views', sum(batch.values()))
+                with self._lock:
+                    for article_id, count in batch.items():
+                        self._pending[article_id] += count
+                return 0
+            return len(batch)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='view-count-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                # The flusher owns its own connection; don't leave it idle in the pool
+                connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_config()
+                _buffer = ViewCountBuffer(
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_pending=config['MAX_PENDING'],
+                    background=config['BACKGROUND'],
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def record_view(article):
+    """
+    Count a view of ``article`` and reflect it on the instance.
+
+    Falls back to an immediate atomic update when buffering is disabled.
+    """
+    if not get_config()['ENABLED']:  # off under manage.py test (central_report.test_runner)
+        with transaction.atomic():
+            article.increment_views()
+            trending.record_views({article.pk: 1})
+        return
+    article.views_count += get_buffer().record(article.pk)
+
+
+def flush_views():
+    """Flush this process's buffered views, e.g. from a gunicorn worker_exit hook"""
+    if _buffer is None:
+        return 0
+    return _buffer.flush()
@@ -38,6 +38,10 @@ export const metadata: Metadata = {
   metadataBase: new URL('https://centralsreport.com'),
   alternates: {
     canonical: '/',
+    types: {
+      'application/rss+xml': '/feeds/rss.xml',
+      'application/atom+xml': '/feeds/atom.xml',
+    },
   },
   openGraph: {
     type: 'website',
@@ -25,6 +25,17 @@ const nextConfig = {
     deviceSizes: [640, 750, 828, 1080, 1200, 1920, 2048, 3840],
     imageSizes: [16, 32, 48, 64, 96, 128, 256, 384],
   },
+  // Sitemaps and feeds are generated and cached by the backend (api/syndication.py)
+  async rewrites() {
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api'
+    return [
+      { source: '/sitemap.xml', destination: `${apiUrl}/sitemap.xml` },
+      { source: '/sitemaps/:partition', destination: `${apiUrl}/sitemaps/:partition` },
+      { source: '/feeds/:path*', destination: `${apiUrl}/feeds/:path*` },
+      // Unsubscribe links of newsletter emails (news/digest.py)
+      { source: '/newsletter/unsubscribe', destination: `${apiUrl}/newsletter/unsubscribe/` },
+    ]
+  },
   async headers() {
     return [
       {
@@ -3,8 +3,11 @@ export interface Article {
   title: string
   slug: string
   excerpt: string
+  // Sanitized and minified on the server; safe to render as is
   content: string
+  outline?: OutlineEntry[]
   featured_image: string
+  featured_image_variants?: ImageVariants | null
   published_date: string
   author: Author
   category: Category
@@ -15,11 +18,25 @@ export interface Article {
   updated_at: string
 }
 
+// A heading of the article body; id is its anchor in content
+export interface OutlineEntry {
+  level: number
+  text: string
+  id: string
+}
+
+// Precomputed responsive URLs for <img src srcSet>; srcset is empty for external images
+export interface ImageVariants {
+  src: string
+  srcset: string
+}
+
 export interface Author {
   id: number
   name: string
   bio: string
   avatar?: string
+  avatar_variants?: ImageVariants | null
   email: string
   twitter_handle?: string
 }